@@ -0,0 +1,114 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional
+
+from .suite import CASES, format_metric, higher_is_better, run
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def size(value: str) -> int:
+    # 1k, 250k, 1m
+    value = value.strip().lower()
+    for suffix, factor in (("k", 1_000), ("m", 1_000_000)):
+        if value.endswith(suffix):
+            return int(float(value[:-1]) * factor)
+    return int(value)
+
+
+def commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "HEAD"], cwd=ROOT, text=True, stderr=subprocess.DEVNULL
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(old: Dict, new: Dict, threshold: float) -> int:
+    # Prints new/old per metric; returns how many got worse than threshold
+    before = {(r["case"], r["size"]): r["metrics"] for r in old["results"]}
+    regressions = 0
+
+    print("\ncompared to {}".format(old["meta"].get("commit") or "baseline"))
+    for result in new["results"]:
+        metrics = before.get((result["case"], result["size"]))
+        if metrics is None:
+            continue
+        for name, value in result["metrics"].items():
+            if name not in metrics or not metrics[name]:
+                continue
+            ratio = value / metrics[name]
+            worse = ratio < 1 - threshold if higher_is_better(name) else ratio > 1 + threshold
+            regressions += worse
+            print(
+                "{:<11} {:>8} {:<20} {:>12} -> {:>12}  {:>6.2f}x{}".format(
+                    result["case"],
+                    result["size"],
+                    name,
+                    format_metric(name, metrics[name]),
+                    format_metric(name, value),
+                    ratio,
+                    "  REGRESSION" if worse else "",
+                )
+            )
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks")
+    parser.add_argument("--sizes", default="1k,10k,100k", help="e.g. 1k,10k,100k,1m")
+    parser.add_argument("--cases", default=",".join(CASES), help=",".join(CASES))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--sources", type=int, default=8)
+    parser.add_argument("--depth", type=int, default=4)
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--compare", help="results file of an earlier run")
+    parser.add_argument("--threshold", type=float, default=0.10)
+    args = parser.parse_args(argv)
+
+    cases = args.cases.split(",")
+    unknown = set(cases) - set(CASES)
+    if unknown:
+        parser.error("unknown cases: {}".format(", ".join(sorted(unknown))))
+
+    report = {
+        "meta": {
+            "commit": commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "seed": args.seed,
+            "sources": args.sources,
+            "depth": args.depth,
+            "repeat": args.repeat,
+        },
+        "results": run(
+            list(map(size, args.sizes.split(","))),
+            cases,
+            args.repeat,
+            args.seed,
+            args.sources,
+            args.depth,
+        ),
+    }
+
+    if args.json:
+        with open(args.json, "w") as file:
+            json.dump(report, file, indent=2)
+
+    if args.compare:
+        with open(args.compare) as file:
+            return 1 if compare(json.load(file), report, args.threshold) else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
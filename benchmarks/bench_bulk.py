@@ -0,0 +1,39 @@
+import os
+import tempfile
+import time
+
+from hyprparser import Config, Setting
+
+FILLER = 20_000
+OPTIONS = 2_000
+
+
+def write_config(directory: str) -> str:
+    path = os.path.join(directory, "hyprland.conf")
+    with open(path, "w") as file:
+        file.write("general {\n    gaps_in = 5\n}\n")
+        file.writelines("$filler_{} = {}\n".format(i, i) for i in range(FILLER))
+    return path
+
+
+def settings():
+    return [Setting("general:option_{}".format(i), i) for i in range(OPTIONS)]
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as directory:
+        path = write_config(directory)
+
+        config = Config.load(path)
+        start = time.perf_counter()
+        for setting in settings():
+            config.new_option(setting)
+        one_by_one = time.perf_counter() - start
+
+        config = Config.load(path)
+        start = time.perf_counter()
+        config.apply(settings())
+        bulk = time.perf_counter() - start
+
+    print("new_option x{}: {:>8.2f} ms".format(OPTIONS, one_by_one * 1000))
+    print("apply():        {:>8.2f} ms ({:.1f}x)".format(bulk * 1000, one_by_one / bulk))
@@ -0,0 +1,79 @@
+import argparse
+import timeit
+from typing import Callable, Dict, List
+
+from hyprparser.src.classes import TypeParser
+
+from .common import best_of, run_baseline
+
+COUNT = 20_000
+REPEAT = 5
+
+KINDS = {
+    'bool': lambda i: ['true', 'false', 'on', 'off', 'yes', 'no'][i % 6],
+    'int': lambda i: str(i - COUNT // 2),
+    'float': lambda i: '{}.{}'.format(i, i % 7),
+    'color': lambda i: 'rgba({:08x})'.format(i * 2654435761 & 0xFFFFFFFF),
+    'gradient': lambda i: 'rgba({:08x}) rgba(33ccffee) {}deg'.format(i, i % 360),
+    'string': lambda i: 'hello-{}'.format(i),
+}
+
+# The is_* / to_* chain parse_setting ran before decode, in the baseline tree
+BASELINE = '''
+import json, sys, time
+from typing import Callable
+from hyprparser.src.classes.structures import TypeParser
+
+{timing}
+
+def chain(value):
+    if TypeParser.is_bool(value):
+        return TypeParser.to_bool(value)
+    elif TypeParser.is_int(value):
+        return TypeParser.to_int(value)
+    elif TypeParser.is_float(value):
+        return TypeParser.to_float(value)
+    elif TypeParser.is_color(value):
+        return TypeParser.to_color(value)
+    elif TypeParser.is_gradient(value):
+        return TypeParser.to_gradient(value)
+    return value
+
+print(json.dumps({
+    kind: best_of(lambda: list(map(chain, values)), 5)
+    / len(values)
+    for kind, values in json.load(open(sys.argv[1])).items()
+}))
+'''
+
+
+def uncached(func: Callable[[str], object], values: List[str]) -> float:
+    # Distinct literals, and a cold cache on every run
+    def run() -> None:
+        TypeParser.classify.cache_clear()
+        list(map(func, values))
+
+    return best_of(run, REPEAT) / len(values)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--baseline', default=None, help='git revision, default: the root commit')
+    args = parser.parse_args()
+
+    distinct: Dict[str, List[str]] = {
+        kind: [make(i) for i in range(COUNT)] for kind, make in KINDS.items()
+    }
+    old = run_baseline(BASELINE, distinct, args.baseline)
+
+    print('{:<9} {:>12} {:>12} {:>8} {:>12}'.format(
+        'kind', 'baseline', 'decode', '', 'cached'
+    ))
+    for kind, values in distinct.items():
+        new = uncached(TypeParser.decode, values)
+        # One repeated literal hits the cache
+        repeated = [values[1]] * COUNT
+        cached = timeit.timeit(lambda: list(map(TypeParser.decode, repeated)), number=1) / COUNT
+        print('{:<9} {:>9.0f} ns {:>9.0f} ns {:>7.2f}x {:>9.0f} ns'.format(
+            kind, old[kind] * 1e9, new * 1e9, old[kind] / new, cached * 1e9
+        ))
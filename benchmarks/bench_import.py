@@ -0,0 +1,49 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from typing import List, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SNIPPET = """
+import json, sys, time
+before = set(sys.modules)
+start = time.perf_counter()
+import hyprparser
+elapsed = time.perf_counter() - start
+assert not hyprparser.HyprData.loaded
+print(json.dumps([elapsed, sorted(set(sys.modules) - before)]))
+"""
+
+# What importing may cost. The time has headroom for slow machines; the
+# module count is exact enough to catch an eager import of anything big.
+MAX_MS = 50.0
+MAX_MODULES = 100
+# Only imported where they are used: each costs more than the package itself
+HEAVY = ["asyncio", "ctypes", "pickle", "concurrent.futures", "multiprocessing", "socket", "uuid"]
+
+
+def run(repeat: int = 10) -> Tuple[float, List[str]]:
+    # Empty $HOME: importing must not need (or touch) a hyprland.conf
+    with tempfile.TemporaryDirectory() as home:
+        env = dict(os.environ, HOME=home, PYTHONPATH=ROOT)
+        # Time imports, not compiles: the first run writes the bytecode
+        env.pop("PYTHONDONTWRITEBYTECODE", None)
+        runs = [
+            json.loads(
+                subprocess.check_output([sys.executable, "-c", SNIPPET], env=env, text=True)
+            )
+            for _ in range(repeat + 1)
+        ][1:]
+    return min(elapsed for elapsed, _ in runs), runs[0][1]
+
+
+if __name__ == "__main__":
+    elapsed, modules = run()
+    print("import hyprparser: {:.2f} ms, {} modules".format(elapsed * 1000, len(modules)))
+
+    heavy = [module for module in modules if module.split(".")[0] in HEAVY or module in HEAVY]
+    assert not heavy, "imported eagerly: {}".format(", ".join(heavy))
+    assert len(modules) <= MAX_MODULES, "{} modules, limit {}".format(len(modules), MAX_MODULES)
+    assert elapsed * 1000 <= MAX_MS, "{:.2f} ms, limit {} ms".format(elapsed * 1000, MAX_MS)
@@ -0,0 +1,113 @@
+import os
+import socket
+import tempfile
+import threading
+from typing import List
+
+from hyprparser import Config
+from hyprparser.src.classes import SocketTransport
+
+from .common import timed
+from .generator import generate
+
+EDITS = 200
+
+
+class StandIn:
+    # Answers like Hyprland's request socket: one request per connection,
+    # "ok" per command, then close. Records every request it gets.
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.requests: List[str] = []
+        self.server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.server.bind(path)
+        self.server.listen(16)
+        self.thread = threading.Thread(target=self.serve, daemon=True)
+        self.thread.start()
+
+    def serve(self) -> None:
+        while True:
+            try:
+                conn, _ = self.server.accept()
+            except OSError:
+                return
+            with conn:
+                request = conn.recv(1 << 20).decode()
+                self.requests.append(request)
+                commands = request.removeprefix("[[BATCH]]").split(";")
+                conn.sendall(b"ok" * len(commands))
+
+    def close(self) -> None:
+        self.server.close()
+
+
+VARIABLES = """\
+$mod = SUPER
+$term = kitty
+env = TERMINAL,$term
+bind = $mod, Q, exec, $term
+bind = $mod, Q, killactive,
+bind = SUPER, W, exec, $term
+windowrulev2 = float, class:^($term)$
+"""
+
+
+def variable_resend(directory: str, server: StandIn) -> None:
+    # Hyprland has no $variables at runtime: everything using one is sent
+    # again, and a bind's old combo is unbound first
+    root = os.path.join(directory, "variables.conf")
+    with open(root, "w") as file:
+        file.write(VARIABLES)
+    config = Config.load(root)
+    config.insta_save = False
+    config.live_apply(SocketTransport(server.path))
+
+    sent = len(server.requests)
+    config.set_variable("mod", "ALT")
+    config.set_variable("term", "foot")
+    assert server.requests[sent:] == [
+        "[[BATCH]]keyword unbind SUPER, Q"
+        ";keyword bind ALT, Q, exec, kitty"
+        ";keyword bind ALT, Q, killactive, ",
+        "[[BATCH]]keyword env TERMINAL,foot"
+        ";keyword unbind ALT, Q"
+        ";keyword unbind SUPER, W"
+        ";keyword bind ALT, Q, exec, foot"
+        ";keyword bind ALT, Q, killactive, "
+        ";keyword bind SUPER, W, exec, foot"
+        ";keyword windowrulev2 float, class:^(foot)$",
+    ], server.requests[sent:]
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as directory:
+        generated = generate(os.path.join(directory, "config"), 10_000)
+        server = StandIn(os.path.join(directory, ".socket.sock"))
+        # The generator repeats options; each edit should be a different one
+        general = (o for o in generated.options if o.startswith("general:"))
+        options = list(dict.fromkeys(general))[:EDITS]
+
+        config = Config.load(generated.root)
+        config.live_apply(SocketTransport(server.path))
+
+        one_by_one = timed(lambda: [config.set_option(o, 1) for o in options])
+        sent = len(server.requests)
+        batched = timed(lambda: config.set_options({o: 2 for o in options}))
+        batches = len(server.requests) - sent
+
+        # One request per edit, then every edit in a single batch
+        assert len(options) == EDITS, len(options)
+        assert server.requests[:sent] == ["keyword {} 1".format(o) for o in options]
+        assert batches == 1, batches
+        assert server.requests[sent] == "[[BATCH]]" + ";".join(
+            "keyword {} 2".format(o) for o in options
+        ), server.requests[sent][:200]
+
+        variable_resend(directory, server)
+        server.close()
+        print("set_option x{}:  {:>8.2f} ms, {} requests".format(
+            len(options), one_by_one * 1000, sent
+        ))
+        print("set_options x{}: {:>8.2f} ms, {} request".format(
+            len(options), batched * 1000, batches
+        ))
@@ -0,0 +1,90 @@
+import argparse
+import time
+from typing import Dict, List, Optional
+
+from hyprparser.src.classes.lexer import Lexer
+from hyprparser.src.classes.parser import Config, Helper
+
+from .common import best_of, run_baseline
+
+SAMPLE = """\
+# comment
+general {
+    gaps_in = 5
+    col.active_border = rgba(33ccffee) rgba(00ff99ee) 45deg # inline
+    input {
+        sensitivity = -0.5
+    }
+}
+
+bind = SUPER SHIFT, Q, killactive,
+env = XCURSOR_SIZE,24
+exec-once = waybar
+$mainMod = SUPER
+""".splitlines()
+
+# A line the old single-regex lexer backtracked on quadratically
+SPACES = "a" + " " * 2000 + "b"
+
+
+# Run against the baseline tree: its own skip/format_line/get_linetype
+# classification, and its read_lines, which classifies and parses into
+# the global HyprData
+BASELINE = """
+import json, sys, time
+from typing import Callable
+from hyprparser.src.classes.parser import Helper, LineParser
+
+{timing}
+lines = json.load(open(sys.argv[1]))
+
+def classify():
+    for line in lines:
+        if LineParser.skip(line):
+            continue
+        line = LineParser.format_line(line)
+        LineParser.get_linetype(line)
+
+print(json.dumps({
+    "tokenize": best_of(classify, 5),
+    "parse": best_of(lambda: Helper.read_lines(lines), 5),
+}))
+"""
+
+
+def run_old(revision: Optional[str], lines: List[str]) -> Dict[str, float]:
+    return run_baseline(BASELINE, lines, revision)
+
+
+def run_current(lines: List[str]) -> Dict[str, float]:
+    def tokenize() -> None:
+        for _ in Lexer.tokenize_lines(lines):
+            pass
+
+    return {
+        "tokenize": best_of(tokenize, 5),
+        "parse": best_of(lambda: Helper.read_lines(lines, None, Config("")), 5),
+    }
+
+
+def report(name: str, old: float, new: float, count: int) -> None:
+    print("{:<9} baseline {:>10,.0f} lines/s   now {:>10,.0f} lines/s   {:.2f}x".format(
+        name, count / old, count / new, old / new
+    ))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--baseline", default=None, help="git revision, default: the root commit")
+    parser.add_argument("--lines", type=int, default=50_000)
+    args = parser.parse_args()
+
+    lines = (SAMPLE * (args.lines // len(SAMPLE) + 1))[: args.lines]
+    old = run_old(args.baseline, lines)
+    new = run_current(lines)
+    for name in ("tokenize", "parse"):
+        report(name, old[name], new[name], len(lines))
+
+    start = time.perf_counter()
+    Lexer.tokenize(SPACES)
+    print("{} spaces in one line: {:.3f} ms".format(len(SPACES) - 2, (time.perf_counter() - start) * 1000))
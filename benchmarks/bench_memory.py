@@ -0,0 +1,73 @@
+import gc
+import sys
+import tracemalloc
+from dataclasses import dataclass
+from typing import List
+
+from hyprparser import Binding, Color, Gradient, Setting
+
+COUNT = 100_000
+
+
+# The record types as they were before __slots__ and the packed Color,
+# kept here only as the baseline to measure against
+@dataclass
+class DictColor:
+    r: str
+    g: str
+    b: str
+    a: str = 'ff'
+
+
+@dataclass
+class DictGradient:
+    angle: int
+    colors: List[DictColor]
+
+
+@dataclass
+class DictSetting:
+    option: str
+    value: object
+
+
+@dataclass
+class DictBinding:
+    mods: List[str]
+    key: str
+    dispatcher: str
+    params: List[str]
+    bindtype: str = 'bind'
+
+
+def build(setting, gradient, color, binding, intern: bool) -> list:
+    records = []
+    for i in range(COUNT):
+        # Paths come out of str.join while parsing, so each is a new object
+        option = ':'.join(['general', 'col.active_border'])
+        if intern:
+            option = sys.intern(option)
+        channel = '{:02x}'.format(i % 256)
+        colors = [color(channel, '11', '22', 'ff'), color('33', channel, '55')]
+        records.append(setting(option, gradient(45, colors)))
+        records.append(binding(['SUPER'], str(i % 10), 'exec', ['app']))
+    return records
+
+
+def measure(*args) -> int:
+    gc.collect()
+    tracemalloc.start()
+    records = build(*args)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del records
+    return current
+
+
+if __name__ == '__main__':
+    before = measure(DictSetting, DictGradient, DictColor, DictBinding, False)
+    after = measure(Setting, Gradient, Color, Binding, True)
+
+    print('{} settings with a two-color gradient, {} binds'.format(COUNT, COUNT))
+    print('dict records:    {:>8.1f} MiB'.format(before / 2**20))
+    print('slotted records: {:>8.1f} MiB  ({:.0%})'.format(after / 2**20, after / before))
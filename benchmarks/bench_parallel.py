@@ -0,0 +1,170 @@
+import asyncio
+import contextlib
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Awaitable, Iterator
+
+from hyprparser import Config
+from hyprparser.src.classes.parser import Helper
+
+from .common import timed
+
+# Every file sources WIDTH others, DEPTH levels down: 1 + 6 + 36 + 216 files
+WIDTH = 6
+DEPTH = 3
+LINES = 400
+WORKERS = 8
+# Per-read delay for the slow-filesystem runs, like an NFS home directory
+LATENCY = 0.005
+# Reads slow enough that one on the event loop shows up as a stall
+STALL_LATENCY = 0.2
+
+
+def write_tree(directory: str) -> str:
+    def write(name: str, depth: int) -> str:
+        path = os.path.join(directory, name + ".conf")
+        with open(path, "w") as file:
+            file.write("decoration {\n")
+            for i in range(LINES // 4):
+                file.write("    option_{}_{} = {}\n".format(name, i, i))
+            file.write("}\n")
+            for i in range(LINES // 4):
+                file.write("bind = SUPER, {}, exec, {}-{}\n".format(i, name, i))
+                file.write("env = VAR_{}_{},{}\n".format(name, i, i))
+                file.write("$var_{}_{} = rgba(11223344)\n".format(name, i))
+
+            if depth < DEPTH:
+                for i in range(WIDTH):
+                    child = write("{}_{}".format(name, i), depth + 1)
+                    # Same option in every file: the last one sourced must win
+                    file.write("general {\n    gaps_in = " + name + "\n")
+                    file.write("    source = {}\n}}\n".format(child))
+        return path
+
+    return write("root", 0)
+
+
+@contextlib.contextmanager
+def slow_reads(latency: float) -> Iterator[None]:
+    read_file = Helper.read_file
+
+    def read(path: str):
+        time.sleep(latency)
+        return read_file(path)
+
+    Helper.read_file = staticmethod(read)  # type: ignore
+    try:
+        yield
+    finally:
+        Helper.read_file = staticmethod(read_file)  # type: ignore
+
+
+async def longest_stall(work: Awaitable[None]) -> float:
+    # The longest the loop went without getting to another task while work ran
+    stall = 0.0
+
+    async def tick() -> None:
+        nonlocal stall
+        last = time.perf_counter()
+        while True:
+            await asyncio.sleep(0)
+            now = time.perf_counter()
+            stall, last = max(stall, now - last), now
+
+    ticker = asyncio.create_task(tick())
+    await asyncio.sleep(0)
+    try:
+        await work
+    finally:
+        ticker.cancel()
+    return stall
+
+
+async def check_not_blocking(directory: str) -> None:
+    # With reads this slow, a rebase on save and a reload that pulls in a
+    # new file must leave the loop free in the meantime
+    root = os.path.join(directory, "stall.conf")
+    sourced = os.path.join(directory, "stall_sourced.conf")
+    new = os.path.join(directory, "stall_new.conf")
+    with open(root, "w") as file:
+        file.write("general {\n    gaps_in = 1\n}\nsource = " + sourced + "\n")
+    with open(sourced, "w") as file:
+        file.write("input {\n    kb_layout = us\n}\n")
+    with open(new, "w") as file:
+        file.write("misc {\n    vfr = true\n}\n")
+
+    config = await Config.aload(root)
+    config.set_option("general:gaps_in", 2)
+    with open(root, "a") as file:
+        file.write("decoration {\n    rounding = 3\n}\n")
+
+    with slow_reads(STALL_LATENCY):
+        stall = await longest_stall(config.asave_all())
+        assert stall < STALL_LATENCY / 2, "asave_all stalled {:.0f} ms".format(stall * 1000)
+        assert config.get_option("general:gaps_in").value == 2
+        assert config.get_option("decoration:rounding").value == 3
+
+        with open(sourced, "a") as file:
+            file.write("source = " + new + "\n")
+        stall = await longest_stall(config.areload(changed=[sourced]))
+        assert stall < STALL_LATENCY / 2, "areload stalled {:.0f} ms".format(stall * 1000)
+        assert config.get_option("misc:vfr").value is True
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as directory:
+        root = write_tree(directory)
+
+        results = {}
+        for name, workers, pool in [
+            ("serial", 0, ThreadPoolExecutor),
+            ("threads", WORKERS, ThreadPoolExecutor),
+            ("processes", WORKERS, ProcessPoolExecutor),
+        ]:
+            config = Config.load(root, workers=workers, pool=pool)
+            results[name] = [f.path for f in config.files], dict(config.config)
+            print("{:<10} {:>8.2f} ms".format(name, timed(config.reload) * 1000))
+
+        config = asyncio.run(Config.aload(root))
+        results["areload"] = [f.path for f in config.files], dict(config.config)
+        print(
+            "{:<10} {:>8.2f} ms".format(
+                "areload", timed(lambda: asyncio.run(config.areload())) * 1000
+            )
+        )
+
+        assert (
+            results["serial"]
+            == results["threads"]
+            == results["processes"]
+            == results["areload"]
+        )
+
+        with slow_reads(LATENCY):
+            for name, workers in [("serial", 0), ("threads", WORKERS)]:
+                config = Config.load(root, workers=workers)
+                print(
+                    "{:<10} {:>8.2f} ms  ({:.0f} ms per read)".format(
+                        name, timed(config.reload) * 1000, LATENCY * 1000
+                    )
+                )
+
+            config = asyncio.run(Config.aload(root))
+            print(
+                "{:<10} {:>8.2f} ms  ({:.0f} ms per read)".format(
+                    "areload",
+                    timed(lambda: asyncio.run(config.areload())) * 1000,
+                    LATENCY * 1000,
+                )
+            )
+
+        asyncio.run(check_not_blocking(directory))
+        print("asave_all and areload left the loop free during slow reads")
+
+        print(
+            "{} files, {} lines each, {} CPUs".format(
+                len(results["serial"][0]), LINES, os.cpu_count()
+            )
+        )
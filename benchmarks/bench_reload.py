@@ -0,0 +1,166 @@
+import os
+import random
+import tempfile
+from typing import Any, Dict, List, Tuple
+
+from hyprparser import Config
+
+from .common import timed
+
+ROOT_LINES = 50_000
+SOURCED = 20
+
+# A small tree for the equivalence check: which files source which
+CHILDREN = {"root": ["a", "b"], "a": ["c"], "b": ["d"], "c": [], "d": []}
+STEPS = 50
+
+
+def write_tree(directory: str) -> str:
+    root = os.path.join(directory, "hyprland.conf")
+    with open(root, "w") as file:
+        file.write("general {\n")
+        file.writelines("    option_{} = {}\n".format(i, i) for i in range(ROOT_LINES))
+        file.write("}\n")
+        for i in range(SOURCED):
+            file.write("source = {}\n".format(os.path.join(directory, "{}.conf".format(i))))
+
+    for i in range(SOURCED):
+        with open(os.path.join(directory, "{}.conf".format(i)), "w") as file:
+            file.write("bind = SUPER, {}, exec, app{}\n".format(i, i))
+    return root
+
+
+def write_random(directory: str, name: str, rng: random.Random) -> None:
+    # Options, envs and beziers that other files also define, $variables
+    # binds use, and `source` lines both bare and inside a section
+    children = list(CHILDREN[name])
+    rng.shuffle(children)
+    lines: List[str] = []
+    for i in range(rng.randint(3, 12)):
+        roll = rng.random()
+        if children and roll < 0.2:
+            source = "source = {}".format(os.path.join(directory, children.pop() + ".conf"))
+            lines += ["general {", source, "}"] if rng.random() < 0.3 else [source]
+        elif roll < 0.45:
+            option = "    k{} = {}".format(rng.randint(0, 5), rng.randint(0, 99))
+            lines += ["general {", option, "}"]
+        elif roll < 0.55:
+            lines.append("bind = SUPER, {}, exec, {}".format(rng.choice("abc"), name))
+        elif roll < 0.65:
+            lines.append("$v{} = {}".format(rng.randint(0, 2), rng.choice(["SUPER", "ALT"])))
+        elif roll < 0.7:
+            lines.append("bind = $v{}, x, exec, {}".format(rng.randint(0, 2), name))
+        elif roll < 0.8:
+            lines.append("env = E{},{}".format(rng.randint(0, 3), name))
+        elif roll < 0.85:
+            bezier = "b{}, 0, 0, 1, {}".format(rng.randint(0, 2), rng.randint(0, 9))
+            lines.append("bezier = " + bezier)
+        elif roll < 0.9:
+            lines.append("exec-once = {}{}".format(name, i))
+        else:
+            lines.append("k{} = {}".format(rng.randint(0, 5), rng.randint(0, 99)))
+    for child in children:
+        lines.append("source = {}".format(os.path.join(directory, child + ".conf")))
+
+    with open(os.path.join(directory, name + ".conf"), "w") as file:
+        file.write("\n".join(lines) + "\n")
+
+
+def anchors(index: Dict[str, Any]) -> List[Tuple[str, str, Tuple[int, ...], int]]:
+    return sorted((key, a.file.path, a.file.origin, a.line) for key, a in index.items())
+
+
+def state(config: Config) -> Dict[str, object]:
+    # Everything a reload rebuilds, models in their iteration order
+    index = config.index
+    return {
+        "config": list(config.config.items()),
+        "env": list(config.env.items()),
+        "beziers": list(config.beziers.items()),
+        "lists": [config.binds, config.variables, config.exec, config.monitors],
+        "files": [(f.path, f.origin, f.sections) for f in config.files],
+        "index": [
+            anchors(table)
+            for table in (index.options, index.envs, index.beziers, index.variables)
+        ],
+        "combos": [
+            config.get_binds("{}, {}".format(" ".join(b.mods), b.key)) for b in config.binds
+        ],
+        "conflicts": config.bind_conflicts(),
+    }
+
+
+def check_equivalent(directory: str, seed: int = 0) -> None:
+    # Random edits to sourced files: reload(changed=...) must leave the
+    # same model as reading the whole tree again
+    rng = random.Random(seed)
+    for name in CHILDREN:
+        write_random(directory, name, rng)
+    config = Config.load(os.path.join(directory, "root.conf"))
+
+    sourced = [name for name in CHILDREN if name != "root"]
+    for step in range(STEPS):
+        names = rng.sample(sourced, rng.randint(1, 2))
+        for name in names:
+            write_random(directory, name, rng)
+        config.reload(changed=[os.path.join(directory, name + ".conf") for name in names])
+        incremental = state(config)
+        config.reload()
+        full = state(config)
+        for key in full:
+            message = "seed {} step {}: {} differ, {} edited".format(seed, step, key, names)
+            assert incremental[key] == full[key], message
+
+
+def check_set_variable(directory: str) -> None:
+    # The last definition is the one in effect, so that is the line to edit
+    root = os.path.join(directory, "variables.conf")
+    sourced = os.path.join(directory, "mods.conf")
+    with open(root, "w") as file:
+        file.write("$mod = SUPER\nsource = {}\nbind = $mod, Q, killactive,\n".format(sourced))
+    with open(sourced, "w") as file:
+        file.write("$mod = ALT\n")
+
+    config = Config.load(root)
+    config.set_variable("mod", "CTRL")
+    config.save_all()
+    assert open(root).readline() == "$mod = SUPER\n"
+    assert open(sourced).read() == "$mod = CTRL\n"
+
+    config.reload()
+    assert config.get_variable("mod").value == "CTRL"
+    assert config.get_binds("CTRL, Q")
+
+    # And after the sourced file alone was read again
+    with open(sourced, "a") as file:
+        file.write("$mod = SHIFT\n")
+    config.reload(changed=[sourced])
+    config.set_variable("mod", "SUPER SHIFT")
+    config.save_all()
+    assert open(sourced).read() == "$mod = CTRL\n$mod = SUPER SHIFT\n"
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as directory:
+        check_set_variable(directory)
+
+    for seed in range(5):
+        with tempfile.TemporaryDirectory() as directory:
+            check_equivalent(directory, seed)
+    print("reload(changed=...) matches a full reload, {} edits".format(5 * STEPS))
+
+    with tempfile.TemporaryDirectory() as directory:
+        config = Config.load(write_tree(directory))
+        changed = os.path.join(directory, "7.conf")
+
+        # Warm up the splice tables, which are built on first use
+        config.reload(changed=[changed])
+
+        with open(changed, "a") as file:
+            file.write("bind = SUPER SHIFT, 7, exec, other\n")
+
+        incremental = timed(lambda: config.reload(changed=[changed]))
+        full = timed(config.reload)
+
+    print("full reload:        {:>8.2f} ms".format(full * 1000))
+    print("reload(changed=..): {:>8.2f} ms".format(incremental * 1000))
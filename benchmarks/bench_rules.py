@@ -0,0 +1,87 @@
+import os
+import random
+import re
+import tempfile
+from typing import Dict, List
+
+from hyprparser import Config
+
+from .common import best_of, timed
+
+RULES = 5_000
+QUERIES = 1_000
+# The scan recompiles past re's cache on every query, so it gets a sample
+SCANNED = 20
+APPS = ["kitty", "foot", "firefox", "org.gnome.Nautilus", "Alacritty", "mpv", "steam"]
+
+
+def write_rules(path: str, rng: random.Random) -> None:
+    lines = []
+    for n in range(RULES):
+        app = "{}{}".format(rng.choice(APPS), n)
+        match n % 10:
+            case 0:
+                lines.append("windowrulev2 = float, title:^(.*{}.*)$".format(n))
+            case 1:
+                lines.append("windowrule = opacity 0.9, ^({})$".format(app))
+            case 2:
+                lines.append("windowrulev2 = workspace 2, class:^({}|{}-x)$, floating:1".format(app, app))
+            case _:
+                lines.append("windowrulev2 = float, class:^({})$, title:^(Dialog {})$".format(app, n))
+    with open(path, "w") as file:
+        file.write("\n".join(lines) + "\n")
+
+
+def linear(config: Config, window: Dict[str, str]) -> List[object]:
+    # What a query costs without the index: every rule's regexes, every time
+    rules = []
+    for rule in config.windowrules:
+        for prop, value in rule.props.items():
+            negative = value.startswith("negative:")
+            value = value.removeprefix("negative:")
+            have = window.get(prop)
+            hit = have is not None and re.fullmatch(value, have) is not None
+            if hit == negative:
+                break
+        else:
+            rules.append(rule)
+    return rules
+
+
+if __name__ == "__main__":
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "rules.conf")
+        write_rules(path, rng)
+        config = Config.load(path)
+
+        windows = []
+        for _ in range(QUERIES):
+            n = rng.randrange(RULES)
+            windows.append({
+                "class": "{}{}".format(rng.choice(APPS), n),
+                "title": rng.choice(["Dialog {}".format(n), "untitled"]),
+            })
+
+        build = timed(lambda: config.rule_index)
+        indexed = best_of(
+            lambda: [config.get_windowrules(w["class"], w["title"]) for w in windows], 3
+        )
+        index = config.rule_index
+        compiled = best_of(
+            lambda: [
+                [rule for rule, matchers in index.windowrules if all(m.test(w) for m in matchers)]
+                for w in windows
+            ],
+            3,
+        )
+        scan = timed(lambda: [linear(config, w) for w in windows[:SCANNED]])
+
+        for window in windows[:SCANNED]:
+            assert config.get_windowrules(window["class"], window["title"]) == linear(config, window)
+
+        print("{} rules, {} queries".format(len(config.windowrules), QUERIES))
+        print("index build:   {:>8.2f} ms".format(build * 1000))
+        print("indexed:       {:>8.2f} us/query".format(indexed / QUERIES * 1e6))
+        print("compiled scan: {:>8.2f} us/query".format(compiled / QUERIES * 1e6))
+        print("linear scan:   {:>8.2f} us/query".format(scan / SCANNED * 1e6))
@@ -0,0 +1,57 @@
+import os
+import random
+import tempfile
+
+from hyprparser import Config, Env, Setting
+from hyprparser.src.classes import SnapshotFile
+
+from .common import timed
+from .generator import generate
+
+LINES = 100_000
+LOOKUPS = 10_000
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as directory:
+        generated = generate(os.path.join(directory, "config"), LINES)
+        with open(generated.root, "a") as file:
+            file.write("bind = SUPER, F1, killactive,\nbind = SUPER, F2, killactive\n")
+            file.write("env = PATH,/usr/bin:/bin\nenv = EMPTY\n")
+            file.write("general {\n    big = 99999999999999999999\n}\n")
+        path = os.path.join(directory, "config.snap")
+        options = random.Random(1).sample(generated.options, LOOKUPS)
+
+        load = timed(lambda: Config.load(generated.root))
+        config = Config.load(generated.root)
+        write = timed(lambda: config.write_snapshot(path))
+
+        # What a second process pays to answer its first query
+        first = timed(lambda: SnapshotFile(path).get_option(options[0]))
+        snapshot = SnapshotFile(path)
+        lookups = timed(lambda: [snapshot.get_option(option) for option in options])
+
+        # Everything comes back as the config has it: ':' inside an env
+        # value, an env without one, ints past 64 bits, a trailing empty
+        # bind param
+        assert snapshot.get_env("PATH") == Env("PATH", ["/usr/bin:/bin"])
+        assert snapshot.get_env("EMPTY") == Env("EMPTY", [])
+        assert snapshot.get_option("general:big") == Setting("general:big", 10**20 - 1)
+        for name, env in config.env.items():
+            assert snapshot.get_env(name) == env, name
+        for name, setting in config.config.items():
+            assert snapshot.get_option(name) == setting, name
+        assert list(snapshot.binds()) == config.binds
+        for bind in config.binds[:LOOKUPS]:
+            combo = "{}, {}".format(" ".join(bind.mods), bind.key)
+            if "$" not in combo:
+                assert snapshot.get_binds(combo) == config.get_binds(combo), combo
+                assert snapshot.get_binds(combo, bind.bindtype) == config.get_binds(
+                    combo, bind.bindtype
+                ), combo
+
+        print("Config.load:           {:>8.2f} ms".format(load * 1000))
+        print("write_snapshot:        {:>8.2f} ms".format(write * 1000))
+        print("open + first query:    {:>8.2f} ms".format(first * 1000))
+        print("get_option (snapshot): {:>8.2f} us".format(lookups / LOOKUPS * 1e6))
+        print("snapshot size:         {:>8.2f} MiB".format(os.path.getsize(path) / 2**20))
+        snapshot.close()
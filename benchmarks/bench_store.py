@@ -0,0 +1,58 @@
+import os
+import random
+import tempfile
+import time
+
+from hyprparser import Config, Setting
+from hyprparser.src.classes.rope import LineRope
+
+SECTIONS = 1_000
+OPTIONS = 98  # lines per section, ~100k lines in total
+EDITS = 1_000
+
+
+def write_config(directory: str) -> str:
+    path = os.path.join(directory, "hyprland.conf")
+    with open(path, "w") as file:
+        for section in range(SECTIONS):
+            file.write("section_{} {{\n".format(section))
+            file.writelines(
+                "    option_{} = {}\n".format(i, i) for i in range(OPTIONS)
+            )
+            file.write("}\n")
+    return path
+
+
+def edit(config: Config, seed: int) -> None:
+    rng = random.Random(seed)
+    for i in range(EDITS):
+        section = rng.randrange(SECTIONS)
+        if i % 2:
+            config.new_option(Setting("section_{}:new_{}".format(section, i), i))
+        else:
+            option = "section_{}:option_{}".format(section, rng.randrange(OPTIONS))
+            config.set_option(option, i)
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as directory:
+        path = write_config(directory)
+
+        for store in (list, LineRope):
+            start = time.perf_counter()
+            config = Config.load(path, store)
+            loaded = time.perf_counter() - start
+
+            start = time.perf_counter()
+            edit(config, seed=0)
+            edited = time.perf_counter() - start
+
+            print(
+                "{:<8} {:,} lines: load {:>8.1f} ms, {} edits {:>8.1f} ms".format(
+                    store.__name__,
+                    len(config.files[0].content),
+                    loaded * 1000,
+                    EDITS,
+                    edited * 1000,
+                )
+            )
@@ -0,0 +1,45 @@
+import os
+import tempfile
+import time
+import tracemalloc
+
+from hyprparser import Config, iter_entries
+
+
+def write_config(directory: str, lines: int) -> str:
+    path = os.path.join(directory, "{}.conf".format(lines))
+    with open(path, "w") as file:
+        for i in range(lines // 4):
+            file.write("general {{\n    option_{} = {}\n}}\n".format(i, i))
+            file.write("exec-once = app{}\n".format(i))
+    return path
+
+
+def measure(func) -> tuple:
+    tracemalloc.start()
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def count_execs(path: str) -> int:
+    return sum(1 for record in iter_entries(path) if record.kind == "exec")
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as directory:
+        for lines in [10_000, 100_000, 400_000]:
+            path = write_config(directory, lines)
+            for name, func in [
+                ("Config.load", lambda: Config.load(path)),
+                ("iter_entries", lambda: count_execs(path)),
+            ]:
+                elapsed, peak = measure(func)
+                print(
+                    "{:>7} lines  {:<13} {:>9.2f} ms  peak {:>8.1f} KiB".format(
+                        lines, name, elapsed * 1000, peak / 1024
+                    )
+                )
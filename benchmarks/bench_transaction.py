@@ -0,0 +1,63 @@
+import os
+import tempfile
+import time
+
+from hyprparser import Config
+from hyprparser.src.classes.parser import Helper
+
+SETTINGS = 50
+
+
+def write_config(directory: str) -> str:
+    path = os.path.join(directory, "hyprland.conf")
+    with open(path, "w") as file:
+        file.write("general {\n")
+        file.writelines(
+            "    option_{} = 0\n".format(i) for i in range(SETTINGS)
+        )
+        file.write("}\n")
+    return path
+
+
+def theme_switch(config: Config, value: int) -> None:
+    for i in range(SETTINGS):
+        config.set_option("general:option_{}".format(i), value)
+
+
+def measure(config: Config, transaction: bool, value: int):
+    writes = 0
+    save_file = Helper.save_file
+
+    def counting_save_file(*args, **kwargs):
+        nonlocal writes
+        writes += 1
+        return save_file(*args, **kwargs)
+
+    Helper.save_file = counting_save_file  # type: ignore
+    try:
+        start = time.perf_counter()
+        if transaction:
+            with config.transaction():
+                theme_switch(config, value)
+        else:
+            theme_switch(config, value)
+        return writes, time.perf_counter() - start
+    finally:
+        Helper.save_file = save_file  # type: ignore
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as directory:
+        config = Config.load(write_config(directory))
+        config.insta_save = True
+
+        for value, transaction in [(1, False), (2, True)]:
+            writes, elapsed = measure(config, transaction, value)
+            print(
+                "{:<12} {} settings: {:>3} writes per transaction, {:.2f} ms".format(
+                    "transaction" if transaction else "insta_save",
+                    SETTINGS,
+                    writes,
+                    elapsed * 1000,
+                )
+            )
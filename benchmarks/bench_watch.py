@@ -0,0 +1,85 @@
+import asyncio
+import os
+import tempfile
+import time
+
+from hyprparser import Config
+from hyprparser.src.classes import ConfigWatcher
+
+
+def write(path: str, text: str) -> None:
+    with open(path, "w") as file:
+        file.write(text)
+
+
+async def unsaved_edit_survives(directory: str, inotify: bool) -> float:
+    # An unsaved edit in one file, someone else's edit in another: the
+    # watcher must report theirs and keep ours
+    root = os.path.join(directory, "hyprland.conf")
+    sourced = os.path.join(directory, "input.conf")
+    write(root, "general {\n    gaps_in = 5\n}\nsource = " + sourced + "\n")
+    write(sourced, "input {\n    kb_layout = us\n}\n")
+
+    config = Config.load(root)
+    config.set_option("general:gaps_in", 77)
+
+    async with ConfigWatcher(config, debounce=0.05, poll_interval=0.05, inotify=inotify) as watcher:
+        changes = watcher.subscribe()
+        await asyncio.sleep(0.1)  # polling needs a first look at the files
+        start = time.perf_counter()
+        write(sourced, "input {\n    kb_layout = de\n}\n")
+        change = await asyncio.wait_for(changes.__anext__(), 5)
+        elapsed = time.perf_counter() - start
+
+        assert (change.name, change.old, change.new) == ("input:kb_layout", "us", "de"), change
+        assert changes.queue.empty(), changes.queue.get_nowait()
+
+    assert config.get_option("general:gaps_in").value == 77
+    assert config.files[0].is_dirty()
+    assert "    gaps_in = 77" in config.files[0].content
+    assert config.get_option("input:kb_layout").value == "de"
+
+    # Both edits to the same file: ours merged onto theirs
+    write(root, open(root).read().replace("gaps_in = 5", "gaps_in = 5\n    border_size = 3"))
+    config.refresh([root])
+    assert config.get_option("general:gaps_in").value == 77
+    assert config.get_option("general:border_size").value == 3
+    assert config.files[0].is_dirty()
+
+    config.save_all()
+    assert "gaps_in = 77" in open(root).read()
+    return elapsed
+
+
+async def conflict_is_published(directory: str) -> None:
+    # Both changed the same option: an error event, and nothing is lost
+    root = os.path.join(directory, "conflict.conf")
+    write(root, "general {\n    gaps_in = 5\n}\n")
+    config = Config.load(root)
+    config.set_option("general:gaps_in", 77)
+
+    async with ConfigWatcher(config, debounce=0.05, poll_interval=0.05, inotify=False) as watcher:
+        changes = watcher.subscribe()
+        await asyncio.sleep(0.1)
+        write(root, "general {\n    gaps_in = 9\n}\n")
+        change = await asyncio.wait_for(changes.__anext__(), 5)
+
+    assert (change.kind, change.action) == ("error", "failed"), change
+    assert config.get_option("general:gaps_in").value == 77
+    assert config.files[0].is_dirty()
+
+
+async def main() -> None:
+    for inotify in (True, False):
+        with tempfile.TemporaryDirectory() as directory:
+            elapsed = await unsaved_edit_survives(directory, inotify)
+            print("{:<8} change to event: {:>8.2f} ms".format(
+                "inotify" if inotify else "polling", elapsed * 1000
+            ))
+    with tempfile.TemporaryDirectory() as directory:
+        await conflict_is_published(directory)
+    print("unsaved edits kept, conflicts published")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
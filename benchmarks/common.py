@@ -0,0 +1,59 @@
+import inspect
+import io
+import json
+import os
+import subprocess
+import sys
+import tarfile
+import tempfile
+import time
+from typing import Any, Callable, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def timed(func: Callable[[], object]) -> float:
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+
+def best_of(func: Callable[[], object], repeat: int) -> float:
+    return min(timed(func) for _ in range(max(1, repeat)))
+
+
+def baseline_revision() -> str:
+    return subprocess.check_output(
+        ["git", "rev-list", "--max-parents=0", "HEAD"], cwd=ROOT, text=True
+    ).split()[0]
+
+
+def run_baseline(script: str, payload: Any, revision: Optional[str] = None) -> Any:
+    # Run script against the package as of revision, the root commit by
+    # default. It finds payload as JSON in the file sys.argv[1], timed and
+    # best_of where `{timing}` is, and prints its result as JSON.
+    with tempfile.TemporaryDirectory() as directory:
+        archive = subprocess.check_output(
+            ["git", "archive", revision or baseline_revision(), "hyprparser"], cwd=ROOT
+        )
+        with tarfile.open(fileobj=io.BytesIO(archive)) as tar:
+            tar.extractall(directory)
+
+        # The baseline loads ~/.config/hypr/hyprland.conf when imported
+        hypr = os.path.join(directory, "home", ".config", "hypr")
+        os.makedirs(hypr)
+        with open(os.path.join(hypr, "hyprland.conf"), "w") as file:
+            file.write("general {\n    gaps_in = 5\n}\n")
+        path = os.path.join(directory, "payload.json")
+        with open(path, "w") as file:
+            json.dump(payload, file)
+
+        timing = inspect.getsource(timed) + "\n" + inspect.getsource(best_of)
+        env = dict(os.environ, PYTHONPATH=directory, HOME=os.path.join(directory, "home"))
+        output = subprocess.check_output(
+            [sys.executable, "-c", script.replace("{timing}", timing), path],
+            env=env,
+            text=True,
+            cwd=directory,
+        )
+    return json.loads(output)
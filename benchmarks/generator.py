@@ -0,0 +1,174 @@
+import os
+import random
+from dataclasses import dataclass, field
+from typing import List
+
+# Real option names first, so lookups hit paths a user would query
+SECTIONS = {
+    "general": ["gaps_in", "gaps_out", "border_size", "col.active_border", "layout"],
+    "decoration": ["rounding", "active_opacity", "drop_shadow", "col.shadow"],
+    "input": ["kb_layout", "follow_mouse", "sensitivity", "natural_scroll"],
+    "misc": ["disable_hyprland_logo", "vfr", "force_default_wallpaper"],
+    "dwindle": ["pseudotile", "preserve_split"],
+    "plugin": ["enabled"],
+}
+NESTED = ["blur", "touchpad", "shadow", "hyprbars", "buttons", "groupbar", "col"]
+MODS = ["$mainMod", "SUPER", "SUPER SHIFT", "ALT", "CTRL ALT", "SUPER CTRL"]
+KEYS = [*"QWERTYUIOPASDFGHJKLZXCVBNM1234567890", "left", "right", "up", "down"]
+DISPATCHERS = ["exec", "killactive", "workspace", "movetoworkspace", "movefocus"]
+BINDTYPES = ["bind", "bind", "bind", "binde", "bindm", "bindl", "bindr"]
+
+
+@dataclass
+class Generated:
+    root: str
+    files: List[str] = field(default_factory=list)
+    options: List[str] = field(default_factory=list)
+    lines: int = 0
+
+
+class Generator:
+    # Deterministic for a given seed and size: the same config on every
+    # machine and every commit, so timings can be compared across both
+    def __init__(
+        self, lines: int, sources: int = 8, depth: int = 4, seed: int = 0
+    ) -> None:
+        self.lines = lines
+        self.sources = sources
+        self.depth = depth
+        self.random = random.Random(seed)
+        self.counter = 0
+
+    def value(self) -> str:
+        rng = self.random
+        kind = rng.randrange(7)
+        if kind == 0:
+            return rng.choice(["true", "false", "yes", "off"])
+        if kind == 1:
+            return str(rng.randrange(-50, 500))
+        if kind == 2:
+            return "{:.2f}".format(rng.uniform(-1, 1))
+        if kind == 3:
+            return "rgba({:08x})".format(rng.getrandbits(32))
+        if kind == 4:
+            colors = " ".join(
+                "rgba({:08x})".format(rng.getrandbits(32))
+                for _ in range(rng.randint(2, 4))
+            )
+            return "{} {}deg".format(colors, rng.randrange(360))
+        if kind == 5:
+            return "$color{}".format(rng.randrange(16))
+        return "value-{}".format(rng.randrange(1000))
+
+    def section(
+        self, out: List[str], options: List[str], path: List[str], depth: int
+    ) -> None:
+        indent = "    " * len(path)
+        out.append("{}{} {{".format(indent[:-4] if path else "", path[-1]))
+        names = SECTIONS.get(path[0], []) if len(path) == 1 else []
+
+        for name in names:
+            out.append("{}{} = {}".format(indent, name, self.value()))
+            options.append(":".join([*path, name]))
+        for _ in range(self.random.randint(3, 12)):
+            self.counter += 1
+            name = "option_{}".format(self.counter)
+            out.append("{}{} = {}".format(indent, name, self.value()))
+            options.append(":".join([*path, name]))
+
+        if depth < self.depth and self.random.random() < 0.6:
+            self.counter += 1
+            child = "{}_{}".format(self.random.choice(NESTED), self.counter)
+            self.section(out, options, [*path, child], depth + 1)
+
+        out.append("{}}}".format(indent[:-4]))
+
+    def block(self, out: List[str], options: List[str]) -> None:
+        rng = self.random
+        kind = rng.randrange(10)
+
+        if kind < 3:
+            self.counter += 1
+            name = "{}_{}".format(rng.choice(list(SECTIONS)), self.counter)
+            # Either a well-known section, appended to, or a fresh one
+            self.section(out, options, [rng.choice([rng.choice(list(SECTIONS)), name])], 1)
+        elif kind < 6:
+            for _ in range(rng.randint(4, 16)):
+                out.append(
+                    "{} = {}, {}, {}, {}".format(
+                        rng.choice(BINDTYPES),
+                        rng.choice(MODS),
+                        rng.choice(KEYS),
+                        rng.choice(DISPATCHERS),
+                        rng.randrange(10),
+                    )
+                )
+        elif kind == 6:
+            for _ in range(rng.randint(2, 8)):
+                self.counter += 1
+                out.append("env = VAR_{},{}".format(self.counter, rng.randrange(100)))
+        elif kind == 7:
+            out.append("animations {")
+            for _ in range(rng.randint(1, 4)):
+                self.counter += 1
+                out.append(
+                    "    bezier = curve{}, {:.2f}, {:.2f}, {:.2f}, {:.2f}".format(
+                        self.counter, *(rng.random() for _ in range(4))
+                    )
+                )
+            out.append("}")
+        elif kind == 8:
+            out.append("exec-once = app-{}".format(rng.randrange(1000)))
+            out.append("windowrulev2 = float, class:^(app{})$".format(rng.randrange(100)))
+        else:
+            out.append("")
+            out.append("# section {}".format(self.counter))
+
+    def header(self) -> List[str]:
+        lines = ["monitor = DP-1, 2560x1440@144, 0x0, 1", "$mainMod = SUPER"]
+        for i in range(16):
+            color = self.random.getrandbits(32)
+            lines.append("$color{} = rgba({:08x})".format(i, color))
+        return lines
+
+    def write(self, directory: str) -> Generated:
+        os.makedirs(directory, exist_ok=True)
+        paths = [os.path.join(directory, "hyprland.conf")] + [
+            os.path.join(directory, "source-{}.conf".format(i))
+            for i in range(self.sources)
+        ]
+        generated = Generated(paths[0], paths)
+        per_file = max(1, self.lines // len(paths))
+
+        # Sections a file is sourced from inside of prefix all of its paths
+        prefix: List[str] = []
+        for i, path in enumerate(paths):
+            out = self.header() if i == 0 else []
+            options: List[str] = []
+            while len(out) < per_file:
+                self.block(out, options)
+            generated.options += [":".join([*prefix, option]) for option in options]
+
+            # The root sources the first half of the files; the rest form a
+            # chain, each sourcing the next, some from inside a section
+            half = (self.sources + 1) // 2
+            if i == 0:
+                out += ["source = {}".format(p) for p in paths[1 : half + 1]]
+            elif half <= i < self.sources:
+                if self.random.random() < 0.5:
+                    out += ["general {", "    source = {}".format(paths[i + 1]), "}"]
+                    prefix = [*prefix, "general"]
+                else:
+                    out.append("source = {}".format(paths[i + 1]))
+
+            with open(path, "w") as file:
+                file.write("\n".join(out) + "\n")
+            generated.lines += len(out)
+
+        return generated
+
+
+def generate(
+    directory: str, lines: int, sources: int = 8, depth: int = 4, seed: int = 0
+) -> Generated:
+    return Generator(lines, sources, depth, seed).write(directory)
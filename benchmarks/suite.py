@@ -0,0 +1,208 @@
+import gc
+import random
+import tempfile
+import tracemalloc
+from typing import Callable, Dict, List
+
+from hyprparser import Config, Setting
+from hyprparser.src.classes.parser import Helper
+
+from .common import best_of, timed
+from .generator import Generated, generate
+
+Metrics = Dict[str, float]
+
+# Operations per lookup/edit case, capped by what the config has
+OPS = 2_000
+
+
+def sample(generated: Generated, count: int, seed: int = 1) -> List[str]:
+    options = generated.options
+    return random.Random(seed).sample(options, min(count, len(options)))
+
+
+def per_op_ns(seconds: float, ops: int) -> float:
+    return seconds / max(1, ops) * 1e9
+
+
+def bench_load(generated: Generated, repeat: int) -> Metrics:
+    seconds = best_of(lambda: Config.load(generated.root), repeat)
+    return {"load_s": seconds, "lines_per_s": generated.lines / seconds}
+
+
+def bench_lookup(generated: Generated, repeat: int) -> Metrics:
+    config = Config.load(generated.root)
+    options = sample(generated, OPS * 5)
+
+    def get_option() -> None:
+        for option in options:
+            config.get_option(option)
+
+    def get_line_option() -> None:
+        for option in options:
+            Helper.get_line_option(option, config)
+
+    return {
+        "get_option_ns": per_op_ns(best_of(get_option, repeat), len(options)),
+        "get_line_option_ns": per_op_ns(best_of(get_line_option, repeat), len(options)),
+    }
+
+
+def bench_sections(generated: Generated, repeat: int) -> Metrics:
+    config = Config.load(generated.root)
+    sections = [option.rpartition(":")[0] for option in sample(generated, OPS)]
+    sections = [section for section in sections if section]
+
+    def get_section() -> None:
+        for section in sections:
+            config.get_section(section)
+
+    def scan() -> None:
+        # What the same query costs over the flat option dict
+        for section in sections:
+            prefix = section + ":"
+            {k: v for k, v in config.config.items() if k.startswith(prefix)}
+
+    def has_section() -> None:
+        for section in sections:
+            config.has_section(section)
+
+    return {
+        "get_section_ns": per_op_ns(best_of(get_section, repeat), len(sections)),
+        "prefix_scan_ns": per_op_ns(best_of(scan, 1), len(sections)),
+        "has_section_ns": per_op_ns(best_of(has_section, repeat), len(sections)),
+    }
+
+
+def bench_set_option(generated: Generated, repeat: int) -> Metrics:
+    options = sample(generated, OPS)
+    best = float("inf")
+
+    for _ in range(max(1, repeat)):
+        config = Config.load(generated.root)
+        best = min(
+            best, timed(lambda: [config.set_option(option, 1) for option in options])
+        )
+    return {"set_option_ns": per_op_ns(best, len(options))}
+
+
+def bench_new_option(generated: Generated, repeat: int) -> Metrics:
+    # Half land in sections that exist, half need new nested sections
+    sections = [option.rpartition(":")[0] or "general" for option in sample(generated, OPS)]
+    settings = [
+        "{}:bench_{}".format(section, i)
+        if i % 2
+        else "bench_{}:nested_{}:option".format(i % 50, i)
+        for i, section in enumerate(sections)
+    ]
+    best = float("inf")
+
+    for _ in range(max(1, repeat)):
+        config = Config.load(generated.root)
+        best = min(
+            best,
+            timed(lambda: [config.new_option(Setting(option, 1)) for option in settings]),
+        )
+    return {"new_option_ns": per_op_ns(best, len(settings))}
+
+
+def bench_save_all(generated: Generated, repeat: int) -> Metrics:
+    config = Config.load(generated.root)
+    clean = best_of(config.save_all, repeat)
+
+    best = float("inf")
+    for i in range(max(1, repeat)):
+        # Dirty every file, so every file is written
+        for file in config.files:
+            file.append("# edit {}".format(i))
+        best = min(best, timed(config.save_all))
+
+    written = sum(len(line) + 1 for file in config.files for line in file.content)
+    return {
+        "save_all_s": best,
+        "save_all_clean_s": clean,
+        "written_bytes": written,
+    }
+
+
+def bench_memory(generated: Generated, repeat: int) -> Metrics:
+    gc.collect()
+    tracemalloc.start()
+    config = Config.load(generated.root)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del config
+
+    return {
+        "retained_bytes": current,
+        "peak_bytes": peak,
+        "bytes_per_line": current / generated.lines,
+    }
+
+
+CASES: Dict[str, Callable[[Generated, int], Metrics]] = {
+    "load": bench_load,
+    "lookup": bench_lookup,
+    "sections": bench_sections,
+    "set_option": bench_set_option,
+    "new_option": bench_new_option,
+    "save_all": bench_save_all,
+    "memory": bench_memory,
+}
+
+
+def run(
+    sizes: List[int],
+    cases: List[str],
+    repeat: int = 3,
+    seed: int = 0,
+    sources: int = 8,
+    depth: int = 4,
+) -> List[Dict[str, object]]:
+    results: List[Dict[str, object]] = []
+
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as directory:
+            generated = generate(directory, size, sources, depth, seed)
+            # Big configs take seconds per run; one is enough there
+            runs = repeat if size <= 100_000 else 1
+
+            for case in cases:
+                result: Dict[str, object] = {
+                    "case": case,
+                    "size": size,
+                    "lines": generated.lines,
+                    "files": len(generated.files),
+                    "metrics": CASES[case](generated, runs),
+                }
+                print_result(result)
+                results.append(result)
+
+                if case == "save_all":
+                    # Put the files back as generated for the cases after it
+                    generated = generate(directory, size, sources, depth, seed)
+    return results
+
+
+def print_result(result: Dict[str, object]) -> None:
+    metrics = ", ".join(
+        "{}={}".format(name, format_metric(name, value))
+        for name, value in result["metrics"].items()  # type: ignore
+    )
+    print("{:<11} {:>8} lines  {}".format(result["case"], result["lines"], metrics))
+
+
+def format_metric(name: str, value: float) -> str:
+    if name.endswith("_per_s"):
+        return "{:,.0f}/s".format(value)
+    if name.endswith("_s"):
+        return "{:.2f}ms".format(value * 1000)
+    if name.endswith("_ns"):
+        return "{:.0f}ns".format(value)
+    if name.endswith("_bytes"):
+        return "{:.1f}MiB".format(value / 2**20)
+    return "{:.1f}".format(value)
+
+
+def higher_is_better(name: str) -> bool:
+    return name.endswith("_per_s")
@@ -2,6 +2,7 @@ from .src import (
     Bezier,
     Binding,
     Color,
+    Config,
     Env,
     Exec,
     Gradient,
@@ -9,6 +10,8 @@ from .src import (
     Monitor,
     Setting,
     Variable,
+    iter_entries,
+    parse_many,
 )
 
 
@@ -16,6 +19,7 @@ __all__ = [
     Bezier,
     Binding,
     Color,
+    Config,
     Env,
     Exec,
     Gradient,
@@ -23,4 +27,6 @@ __all__ = [
     Monitor,
     Setting,
     Variable,
+    iter_entries,
+    parse_many,
 ]
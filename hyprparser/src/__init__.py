@@ -1,2 +1,3 @@
-from .classes import (Bezier, Binding, Color, Env, Exec, Gradient, HyprData,
-                      Monitor, Setting, Variable)
+from .classes import (Bezier, Binding, Color, Config, Env, Exec, Gradient,
+                      HyprData, Monitor, Setting, Variable, iter_entries,
+                      parse_many)
@@ -1,3 +1,22 @@
-from .parser import HyprData
-from .structures import (Bezier, Binding, Color, Env, Exec, Gradient, Monitor,
-                         Setting, TypeParser, Variable)
+from .cache import ParseCache
+from .parser import Config, HyprData, Record, iter_entries, parse_many
+from .structures import (Bezier, Binding, Color, Env, Exec, Gradient,
+                         Layerrule, Monitor, Setting, TypeParser, Variable,
+                         Windowrule)
+from .variables import VariableCycleError, VariableResolver
+from .stats import FileStats, Stats
+from .snapshot import SnapshotError, SnapshotFile, open_snapshot
+from .ipc import IPCError, LiveApply, SocketTransport, Transport
+from .merge import Conflict, MergeConflict, MergeResult, merge3
+from .rules import RuleIndex
+from .sections import SectionTree
+
+
+def __getattr__(name: str):
+    # The watcher pulls in asyncio, which alone takes longer to import than
+    # the rest of the package, so it is only imported when asked for
+    if name in ("ConfigChange", "ConfigWatcher"):
+        from . import watcher
+
+        return getattr(watcher, name)
+    raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
@@ -0,0 +1,122 @@
+import contextlib
+import hashlib
+import os
+from typing import TYPE_CHECKING, List, Optional, Sequence
+
+if TYPE_CHECKING:
+    from .parser import Entry, File
+
+# Bump whenever Entry or the records it holds change shape
+CACHE_VERSION = 4
+
+
+class ParseCache:
+    def __init__(
+        self, directory: Optional[str] = None, max_size: int = 32 * 1024 * 1024
+    ) -> None:
+        if directory is None:
+            base = os.environ.get("XDG_CACHE_HOME") or os.path.join(
+                os.path.expanduser("~"), ".cache"
+            )
+            directory = os.path.join(base, "hyprparser")
+
+        self.directory = directory
+        self.max_size = max_size
+
+    @staticmethod
+    def realpath(file: "File") -> str:
+        return os.path.realpath(os.path.expandvars(file.path))
+
+    def entry_path(self, path: str, sections: Sequence[str]) -> str:
+        # A file sourced from inside a section parses differently, so the
+        # section it is read in is part of the key
+        key = "\0".join([path, *sections]).encode()
+        return os.path.join(
+            self.directory, hashlib.blake2b(key, digest_size=16).hexdigest()
+        )
+
+    def get(self, file: "File", sections: Sequence[str]) -> Optional[List["Entry"]]:
+        path = self.realpath(file)
+        entry_path = self.entry_path(path, sections)
+
+        import pickle
+
+        try:
+            st = os.stat(path)
+            with open(entry_path, "rb") as cached:
+                version, key, mtime, size, digest, entries = pickle.load(cached)
+        except (OSError, EOFError, pickle.UnpicklingError, ValueError, TypeError):
+            return None
+        except (AttributeError, ImportError):  # written by another version
+            return None
+
+        if (
+            version != CACHE_VERSION
+            or key != (path, tuple(sections))
+            or mtime != st.st_mtime_ns
+            or size != st.st_size
+            or digest != file.digest
+        ):
+            return None
+
+        # Touch the entry so eviction drops the least recently used first
+        with contextlib.suppress(OSError):
+            os.utime(entry_path)
+        return entries
+
+    def put(self, file: "File", sections: Sequence[str], entries: List["Entry"]) -> None:
+        import pickle
+
+        path = self.realpath(file)
+        entry_path = self.entry_path(path, sections)
+
+        try:
+            st = os.stat(path)
+            os.makedirs(self.directory, mode=0o700, exist_ok=True)
+
+            tmp = "{}.{}.tmp".format(entry_path, os.urandom(16).hex())
+            try:
+                with open(tmp, "wb") as cached:
+                    pickle.dump(
+                        (
+                            CACHE_VERSION,
+                            (path, tuple(sections)),
+                            st.st_mtime_ns,
+                            st.st_size,
+                            file.digest,
+                            entries,
+                        ),
+                        cached,
+                        pickle.HIGHEST_PROTOCOL,
+                    )
+                os.replace(tmp, entry_path)
+            except BaseException:
+                with contextlib.suppress(OSError):
+                    os.unlink(tmp)
+                raise
+        except OSError:
+            # The cache is an optimisation, never a reason to fail a load
+            return
+
+        self.evict()
+
+    def evict(self) -> None:
+        try:
+            with os.scandir(self.directory) as it:
+                entries = [(e.stat().st_mtime_ns, e.stat().st_size, e.path) for e in it]
+        except OSError:
+            return
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_size:
+                break
+            with contextlib.suppress(OSError):
+                os.unlink(path)
+            total -= size
+
+    def clear(self) -> None:
+        with contextlib.suppress(OSError), os.scandir(self.directory) as it:
+            for entry in it:
+                with contextlib.suppress(OSError):
+                    os.unlink(entry.path)
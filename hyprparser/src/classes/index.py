@@ -0,0 +1,181 @@
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Callable, Dict, FrozenSet, List, Tuple, Union
+
+if TYPE_CHECKING:
+    from .parser import File
+    from .structures import Binding
+
+
+@dataclass(eq=False)
+class Anchor:
+    file: "File"
+    line: int
+
+
+class NodeAnchor:
+    # Anchor into a LineRope-backed File; follows its line across edits
+    __slots__ = ("file", "node")
+
+    def __init__(self, file: "File", line_n: int) -> None:
+        self.file = file
+        self.node = file.content.node_at(line_n)  # type: ignore
+
+    @property
+    def line(self) -> int:
+        return self.file.content.index_of(self.node)  # type: ignore
+
+    @line.setter
+    def line(self, line_n: int) -> None:
+        # Only needed after the rope was rebuilt wholesale
+        self.node = self.file.content.node_at(line_n)  # type: ignore
+
+    def __repr__(self) -> str:
+        return "NodeAnchor(file={!r}, line={})".format(self.file.path, self.line)
+
+
+class LineIndex:
+    def __init__(self) -> None:
+        self.options: Dict[str, Anchor] = {}
+        self.envs: Dict[str, Anchor] = {}
+        self.beziers: Dict[str, Anchor] = {}
+        # The last `$name = ...` of each variable: the one in effect
+        self.variables: Dict[str, Anchor] = {}
+
+    def clear(self) -> None:
+        self.options.clear()
+        self.envs.clear()
+        self.beziers.clear()
+        self.variables.clear()
+
+    @staticmethod
+    def add(table: Dict[str, Anchor], name: str, file: "File", line_n: int) -> None:
+        # Like the old file scans, lookups resolve to the first occurrence
+        if name not in table:
+            table[name] = file.anchor(line_n)
+
+    @staticmethod
+    def replace(table: Dict[str, Anchor], name: str, file: "File", line_n: int) -> None:
+        table[name] = file.anchor(line_n)
+
+    @staticmethod
+    def find(
+        table: Dict[str, Anchor], name: Union[str, List[str]]
+    ) -> Tuple[int, Union["File", None]]:
+        if not isinstance(name, str):
+            name = ":".join(name)
+
+        anchor = table.get(name)
+        if anchor is None:
+            return (-1, None)
+        return anchor.line, anchor.file
+
+
+# Hyprland matches modifier names by substring, so "SUPER_SHIFT" and
+# "SUPERSHIFT" mean the same as "SUPER SHIFT"
+MODIFIERS: Dict[str, str] = {
+    "SHIFT": "SHIFT",
+    "CAPS": "CAPS",
+    "CTRL": "CTRL",
+    "CONTROL": "CTRL",
+    "ALT": "ALT",
+    "MOD1": "ALT",
+    "MOD2": "MOD2",
+    "MOD3": "MOD3",
+    "SUPER": "SUPER",
+    "WIN": "SUPER",
+    "LOGO": "SUPER",
+    "MOD4": "SUPER",
+    "MOD5": "MOD5",
+}
+
+Combo = Tuple[FrozenSet[str], str]
+
+
+class BindIndex:
+    def __init__(self, resolve: Callable[[str], str] = lambda v: v) -> None:
+        self.resolve = resolve
+        # modifier set -> key -> bind flags -> binds, in definition order
+        self.combos: Dict[FrozenSet[str], Dict[str, Dict[str, List["Binding"]]]] = {}
+        self.dispatchers: Dict[str, List["Binding"]] = {}
+        # used as an ordered set, so conflicts come out in definition order
+        self.duplicated: Dict[Tuple[FrozenSet[str], str, str], None] = {}
+
+    def clear(self) -> None:
+        self.combos.clear()
+        self.dispatchers.clear()
+        self.duplicated.clear()
+
+    def normalize_mods(self, mods: Union[str, List[str]]) -> FrozenSet[str]:
+        if isinstance(mods, str):
+            mods = mods.split()
+
+        mods = " ".join(map(self.resolve, mods)).upper()
+        return frozenset(
+            canonical for name, canonical in MODIFIERS.items() if name in mods
+        )
+
+    @staticmethod
+    def normalize_key(key: str) -> str:
+        return key.strip().lower()
+
+    @staticmethod
+    def flags(bindtype: str) -> str:
+        return "".join(sorted(bindtype.removeprefix("bind")))
+
+    def combo(self, bind: "Binding") -> Combo:
+        return self.normalize_mods(bind.mods), self.normalize_key(bind.key)
+
+    def add(self, bind: "Binding") -> None:
+        mods, key = self.combo(bind)
+        flags = self.flags(bind.bindtype)
+
+        binds = (
+            self.combos.setdefault(mods, {}).setdefault(key, {}).setdefault(flags, [])
+        )
+        binds.append(bind)
+        if len(binds) > 1:
+            self.duplicated[mods, key, flags] = None
+
+        self.dispatchers.setdefault(bind.dispatcher.lower(), []).append(bind)
+
+    def remove(self, bind: "Binding") -> None:
+        mods, key = self.combo(bind)
+        flags = self.flags(bind.bindtype)
+
+        binds = self.combos.get(mods, {}).get(key, {}).get(flags, [])
+        BindIndex.discard(binds, bind)
+        if len(binds) < 2:
+            self.duplicated.pop((mods, key, flags), None)
+
+        BindIndex.discard(self.dispatchers.get(bind.dispatcher.lower(), []), bind)
+
+    @staticmethod
+    def discard(binds: List["Binding"], bind: "Binding") -> None:
+        # Bindings compare by value; only drop this very object
+        for i, other in enumerate(binds):
+            if other is bind:
+                del binds[i]
+                return
+
+    def find(
+        self,
+        mods: Union[str, List[str]],
+        key: str,
+        bindtype: Union[str, None] = None,
+    ) -> List["Binding"]:
+        by_flags = self.combos.get(self.normalize_mods(mods), {}).get(
+            self.normalize_key(key), {}
+        )
+
+        if bindtype is not None:
+            return list(by_flags.get(self.flags(bindtype), []))
+        return [bind for binds in by_flags.values() for bind in binds]
+
+    def find_dispatcher(self, dispatcher: str) -> List["Binding"]:
+        return list(self.dispatchers.get(dispatcher.lower(), []))
+
+    def conflicts(self) -> List[List["Binding"]]:
+        return [
+            list(self.combos[mods][key][flags])
+            for mods, key, flags in self.duplicated
+        ]
@@ -0,0 +1,185 @@
+import os
+from abc import ABC, abstractmethod
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple, Union
+
+from .structures import Bezier, Binding, Env, Layerrule, Setting, Windowrule
+from .variables import VariableCycleError
+
+if TYPE_CHECKING:
+    from .parser import Config
+
+# Hyprland reads every command of a batch from one request, ';'-separated
+BATCH = "[[BATCH]]"
+
+
+class IPCError(RuntimeError):
+    def __init__(self, message: str, commands: List[str], reply: str = "") -> None:
+        super().__init__(message)
+        self.commands = commands
+        self.reply = reply
+
+
+def socket_path(signature: Optional[str] = None) -> str:
+    # $XDG_RUNTIME_DIR/hypr/<signature>/.socket.sock since Hyprland 0.40,
+    # /tmp/hypr/<signature>/.socket.sock before
+    signature = signature or os.environ.get("HYPRLAND_INSTANCE_SIGNATURE")
+    if not signature:
+        raise IPCError("HYPRLAND_INSTANCE_SIGNATURE is not set, is Hyprland running?", [])
+
+    runtime = os.environ.get("XDG_RUNTIME_DIR")
+    if runtime:
+        path = os.path.join(runtime, "hypr", signature, ".socket.sock")
+        if os.path.exists(path):
+            return path
+    return os.path.join("/tmp", "hypr", signature, ".socket.sock")
+
+
+class Transport(ABC):
+    # Sends one request and returns the reply; subclass to talk to something
+    # other than the Hyprland socket
+    @abstractmethod
+    def request(self, payload: str) -> str: ...
+
+    def close(self) -> None:
+        pass
+
+
+class SocketTransport(Transport):
+    def __init__(self, path: Optional[str] = None, timeout: float = 2.0) -> None:
+        self.path = path
+        self.timeout = timeout
+        self.requests = 0
+
+    def request(self, payload: str) -> str:
+        import socket
+
+        if self.path is None:
+            self.path = socket_path()
+
+        # Hyprland answers one request per connection and then closes it, so
+        # the reply is everything up to EOF
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(self.timeout)
+            sock.connect(self.path)
+            sock.sendall(payload.encode())
+
+            chunks = []
+            while True:
+                chunk = sock.recv(65536)
+                if not chunk:
+                    break
+                chunks.append(chunk)
+
+        self.requests += 1
+        return b"".join(chunks).decode(errors="replace")
+
+
+Record = Union[Setting, Env, Bezier, Binding, Windowrule, Layerrule]
+
+
+class LiveApply:
+    # Queues edits as `keyword` commands and sends them as one batch. A
+    # later edit of the same option, env or bezier replaces the queued one;
+    # binds and rules add up.
+
+    def __init__(self, config: "Config", transport: Optional[Transport] = None) -> None:
+        self.config = config
+        self.transport = transport if transport is not None else SocketTransport()
+        self.pending: Dict[Tuple[str, object], str] = {}
+        self.added = 0
+
+    def expand(self, text: str) -> str:
+        # The compositor knows nothing of the config's $variables
+        try:
+            return self.config.expand(text)
+        except VariableCycleError:
+            return text
+
+    def command(self, record: Record) -> Tuple[Tuple[str, object], str]:
+        match record:
+            case Setting():
+                _, _, value = record.format().partition(" = ")
+                key: Tuple[str, object] = ("option", record.option)
+                return key, "keyword {} {}".format(record.option, self.expand(str(value)))
+            case Env():
+                return ("env", record.name), "keyword env {},{}".format(
+                    record.name, self.expand(":".join(record.value))
+                )
+            case Bezier():
+                _, _, value = record.format().partition(" = ")
+                return ("bezier", record.name), "keyword bezier {}".format(value)
+            case Binding() | Windowrule() | Layerrule():
+                self.added += 1
+                keyword, _, value = record.format().partition(" = ")
+                return ("added", self.added), "keyword {} {}".format(
+                    keyword, self.expand(value)
+                )
+        raise TypeError("Cannot apply {!r} live".format(record))
+
+    def push(self, record: Record) -> None:
+        key, command = self.command(record)
+        # Re-queued at the end, after whatever it may now depend on
+        self.pending.pop(key, None)
+        self.pending[key] = command
+
+    def combo(self, bind: Binding) -> str:
+        # The mods and key as the compositor has them, which is what
+        # `unbind` takes
+        return "{}, {}".format(self.expand(" ".join(bind.mods)), self.expand(bind.key))
+
+    def unbind(self, combo: str) -> None:
+        self.pending.pop(("unbind", combo), None)
+        self.pending[("unbind", combo)] = "keyword unbind {}".format(combo)
+
+    def discard(self) -> None:
+        self.pending.clear()
+
+    def flush(self) -> str:
+        commands = list(self.pending.values())
+        self.pending.clear()
+        if not commands:
+            return ""
+
+        replies = []
+        # A ';' inside a value would split the batch, so such a command goes
+        # in a request of its own
+        for request in self.requests(commands):
+            try:
+                reply = self.transport.request(request)
+            except OSError as e:
+                raise IPCError(
+                    "Could not reach Hyprland: {}".format(e), commands
+                ) from e
+            replies.append(reply)
+            if reply.replace("ok", "").strip():
+                raise IPCError(
+                    "Hyprland rejected {!r}: {}".format(request, reply.strip()),
+                    commands,
+                    reply,
+                )
+        return "".join(replies)
+
+    @staticmethod
+    def requests(commands: List[str]) -> List[str]:
+        requests: List[str] = []
+        batch: List[str] = []
+        for command in commands:
+            if ";" in command:
+                if batch:
+                    requests.append(LiveApply.batch(batch))
+                    batch = []
+                requests.append(command)
+            else:
+                batch.append(command)
+        if batch:
+            requests.append(LiveApply.batch(batch))
+        return requests
+
+    @staticmethod
+    def batch(commands: List[str]) -> str:
+        if len(commands) == 1:
+            return commands[0]
+        return BATCH + ";".join(commands)
+
+    def close(self) -> None:
+        self.transport.close()
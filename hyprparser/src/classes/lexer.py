@@ -0,0 +1,89 @@
+from typing import Dict, Iterable, Iterator, NamedTuple, Optional, Tuple
+
+from .linetype import LineType
+
+KEYWORDS: Dict[str, LineType] = {
+    "monitor": "monitor",
+    "source": "source",
+    "env": "env",
+    "bezier": "bezier",
+    "windowrule": "windowrule",
+    "windowrulev2": "windowrulev2",
+    "layerrule": "layerrule",
+}
+
+
+class Token(NamedTuple):
+    kind: str  # a LineType, or "unknown" for lines that are not `key = value`
+    key: str
+    value: str
+    delta: int  # change in section depth
+    lineno: int
+    span: Tuple[int, int]
+
+
+class Lexer:
+    @staticmethod
+    def classify(key: str) -> LineType:
+        kind = KEYWORDS.get(key)
+        if kind:
+            return kind
+        elif key.startswith("$"):
+            return "variable"
+        elif key.startswith("bind"):
+            return "bind"
+        elif key.startswith("exec"):
+            return "exec"
+        return "setting"
+
+    @staticmethod
+    def tokenize(line: str, lineno: int = 0) -> Optional[Token]:
+        # `key = value`, `name {`, `}`, or anything else, each with an
+        # optional `# comment`. Plain string scans: a regex with this many
+        # optional parts backtracks badly on long runs of spaces.
+        text = line.lstrip()
+        if not text:
+            return None
+        start = len(line) - len(text)
+
+        body = text.partition("#")[0]
+        eq = body.find("=")
+        if eq >= 0:
+            key = body[:eq].rstrip()
+            value = body[eq + 1 :].strip()
+            if value:
+                end = start + len(body.rstrip())
+            else:
+                end = start + len(body)
+            return Token(Lexer.classify(key), key, value, 0, lineno, (start, end))
+
+        body = body.rstrip()
+        if not body:
+            return None
+
+        if body[-1] == "{":
+            section = body[:-1].rstrip()
+            if "{" not in section and "}" not in section:
+                return Token(
+                    "start-section",
+                    section,
+                    "",
+                    1,
+                    lineno,
+                    (start, start + len(section)),
+                )
+
+        if body[0] == "}" and not body.strip("}"):
+            return Token(
+                "end-section", "", "", -len(body), lineno, (start, start + len(body))
+            )
+
+        return Token("unknown", body, "", 0, lineno, (start, start + len(body)))
+
+    @staticmethod
+    def tokenize_lines(lines: Iterable[str], start: int = 0) -> Iterator[Token]:
+        tokenize = Lexer.tokenize
+        for lineno, line in enumerate(lines, start):
+            token = tokenize(line, lineno)
+            if token is not None:
+                yield token
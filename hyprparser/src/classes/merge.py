@@ -0,0 +1,348 @@
+from bisect import bisect_right
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from .lexer import Lexer
+
+
+class Hunk(NamedTuple):
+    # a[a_start:a_end] became b[b_start:b_end]
+    a_start: int
+    a_end: int
+    b_start: int
+    b_end: int
+
+
+class Change(NamedTuple):
+    # Replace lines[start:end] with `lines`; a patch is a list of these, in order
+    start: int
+    end: int
+    lines: List[str]
+
+
+@dataclass(slots=True)
+class Conflict:
+    path: str  # option path, or "env:NAME", "bezier:NAME", or the section of the line
+    base: Optional[str]
+    ours: Optional[str]
+    theirs: Optional[str]
+
+
+@dataclass(slots=True)
+class MergeResult:
+    lines: List[str]
+    conflicts: List[Conflict] = field(default_factory=list)
+
+
+class MergeConflict(RuntimeError):
+    def __init__(self, path: str, conflicts: List[Conflict]) -> None:
+        super().__init__(
+            "{} changed on disk; conflicting edits to {}".format(
+                path, ", ".join(conflict.path for conflict in conflicts)
+            )
+        )
+        self.path = path
+        self.conflicts = conflicts
+
+
+def diff_lines(a: Sequence[str], b: Sequence[str]) -> List[Hunk]:
+    # Shortest edit script (Myers, O((N+M)D)), after trimming the common ends,
+    # which is all most edits to a config leave over
+    n, m = len(a), len(b)
+    lo = 0
+    while lo < n and lo < m and a[lo] == b[lo]:
+        lo += 1
+    hi_a, hi_b = n, m
+    while hi_a > lo and hi_b > lo and a[hi_a - 1] == b[hi_b - 1]:
+        hi_a -= 1
+        hi_b -= 1
+
+    # Lines as ints, so the inner loop compares small ints
+    ids: Dict[str, int] = {}
+    xs = [ids.setdefault(line, len(ids)) for line in a[lo:hi_a]]
+    ys = [ids.setdefault(line, len(ids)) for line in b[lo:hi_b]]
+
+    matches = [(lo + x, lo + y) for x, y in _myers(xs, ys)]
+    matches.append((hi_a, hi_b))
+
+    hunks: List[Hunk] = []
+    x = y = lo
+    for mx, my in matches:
+        if mx > x or my > y:
+            hunks.append(Hunk(x, mx, y, my))
+        x, y = mx + 1, my + 1
+    return hunks
+
+
+def _myers(a: List[int], b: List[int]) -> List[Tuple[int, int]]:
+    # Pairs (i, j) of equal lines on a shortest edit path
+    n, m = len(a), len(b)
+    if not n or not m:
+        return []
+
+    offset = n + m + 1
+    v = [0] * (2 * offset + 1)
+    trace: List[List[int]] = []
+
+    for d in range(n + m + 1):
+        trace.append(v[offset - d - 1 : offset + d + 2])
+        for k in range(-d, d + 1, 2):
+            if k == -d or (k != d and v[offset + k - 1] < v[offset + k + 1]):
+                x = v[offset + k + 1]
+            else:
+                x = v[offset + k - 1] + 1
+            y = x - k
+            while x < n and y < m and a[x] == b[y]:
+                x += 1
+                y += 1
+            v[offset + k] = x
+            if x >= n and y >= m:
+                return _backtrack(trace, n, m)
+    return []
+
+
+def _backtrack(trace: List[List[int]], x: int, y: int) -> List[Tuple[int, int]]:
+    matches: List[Tuple[int, int]] = []
+    for d in range(len(trace) - 1, -1, -1):
+        # trace[d] holds v[-d-1 .. d+1] as it was before round d
+        v = trace[d]
+        k = x - y
+        if k == -d or (k != d and v[k - 1 + d + 1] < v[k + 1 + d + 1]):
+            prev_k = k + 1
+        else:
+            prev_k = k - 1
+        prev_x = v[prev_k + d + 1]
+        prev_y = prev_x - prev_k
+
+        while x > prev_x and y > prev_y:
+            x -= 1
+            y -= 1
+            matches.append((x, y))
+        if d:
+            x, y = prev_x, prev_y
+    matches.reverse()
+    return matches
+
+
+def line_map(hunks: List[Hunk]) -> Callable[[int], int]:
+    # Where line n of a ended up in b; a line that was replaced or removed
+    # maps to the start of what replaced it
+    starts = [hunk.a_start for hunk in hunks]
+
+    def position(n: int) -> int:
+        i = bisect_right(starts, n) - 1
+        if i < 0:
+            return n
+        hunk = hunks[i]
+        if n < hunk.a_end:
+            return hunk.b_start
+        return n - hunk.a_end + hunk.b_end
+
+    return position
+
+
+def make_patch(a: Sequence[str], b: Sequence[str]) -> List[Change]:
+    return [Change(h.a_start, h.a_end, list(b[h.b_start : h.b_end])) for h in diff_lines(a, b)]
+
+
+def apply_patch(lines: Sequence[str], patch: Sequence[Change]) -> List[str]:
+    out: List[str] = []
+    pos = 0
+    for change in patch:
+        out += lines[pos : change.start]
+        out += change.lines
+        pos = change.end
+    out += lines[pos:]
+    return out
+
+
+def line_keys(lines: Sequence[str], sections: Sequence[str] = ()) -> List[Tuple[str, str]]:
+    # (key, path) per line. Options, envs, beziers and variables are keyed by
+    # what they define, so a change to one is matched with the same option on
+    # the other side; any other line is keyed by its text.
+    keys = [("", "")] * len(lines)
+    sections = list(sections)
+    lineno = 0
+
+    for token in Lexer.tokenize_lines(lines):
+        for n in range(lineno, token.lineno):
+            keys[n] = ("line:" + lines[n], ":".join(sections))
+        lineno = token.lineno + 1
+
+        if token.kind == "end-section":
+            keys[token.lineno] = ("line:" + lines[token.lineno], ":".join(sections))
+            del sections[token.delta :]
+            continue
+
+        path = ":".join([*sections, token.key])
+        match token.kind:
+            case "setting" | "variable":
+                key = path
+            case "env" | "bezier":
+                name = token.value.split(",", 1)[0].strip()
+                key = "{}:{}".format(token.kind, name)
+            case "start-section":
+                sections.append(token.key)
+                key = "line:" + lines[token.lineno]
+            case _:
+                key = "line:" + lines[token.lineno]
+        keys[token.lineno] = (key, path)
+
+    for n in range(lineno, len(lines)):
+        keys[n] = ("line:" + lines[n], ":".join(sections))
+    return keys
+
+
+def _regions(
+    ours: List[Hunk], theirs: List[Hunk]
+) -> List[Tuple[int, int, List[Hunk], List[Hunk]]]:
+    # Groups of hunks from either side that touch the same base lines; two
+    # insertions at the same place overlap too
+    tagged = sorted(
+        [(h, 0) for h in ours] + [(h, 1) for h in theirs],
+        key=lambda item: (item[0].a_start, item[0].a_end),
+    )
+    regions: List[Tuple[int, int, List[Hunk], List[Hunk]]] = []
+
+    for hunk, side in tagged:
+        if regions:
+            start, end, o, t = regions[-1]
+            if hunk.a_start < end or (
+                hunk.a_start == end
+                and (hunk.a_start == hunk.a_end or start == end)
+            ):
+                (o if side == 0 else t).append(hunk)
+                regions[-1] = (start, max(end, hunk.a_end), o, t)
+                continue
+        regions.append(
+            (hunk.a_start, hunk.a_end, [hunk] if side == 0 else [], [hunk] if side else [])
+        )
+    return regions
+
+
+def merge3(
+    base: Sequence[str],
+    ours: Sequence[str],
+    theirs: Sequence[str],
+    sections: Sequence[str] = (),
+    prefer: Optional[str] = None,
+) -> MergeResult:
+    # Our edits (base -> ours) replayed onto theirs (base -> theirs). Regions
+    # only one side touched merge as they are; regions both touched are
+    # merged option by option, and only options both changed differently
+    # conflict. prefer="ours" or "theirs" settles those, otherwise the
+    # result keeps theirs and lists the conflicts.
+    if prefer not in (None, "ours", "theirs"):
+        raise ValueError("prefer must be None, 'ours' or 'theirs'")
+
+    result = MergeResult([])
+    ours_hunks, theirs_hunks = diff_lines(base, ours), diff_lines(base, theirs)
+    keys: List[List[Tuple[str, str]]] = []
+
+    pos = 0
+    # base line n is line n + offset on that side, outside of any hunk
+    ours_offset = theirs_offset = 0
+    for start, end, o, t in _regions(ours_hunks, theirs_hunks):
+        result.lines += base[pos:start]
+
+        o_start = start + ours_offset
+        t_start = start + theirs_offset
+        ours_offset += sum((h.b_end - h.b_start) - (h.a_end - h.a_start) for h in o)
+        theirs_offset += sum((h.b_end - h.b_start) - (h.a_end - h.a_start) for h in t)
+        o_end = end + ours_offset
+        t_end = end + theirs_offset
+
+        if not t:
+            result.lines += ours[o_start:o_end]
+        elif not o or ours[o_start:o_end] == theirs[t_start:t_end]:
+            result.lines += theirs[t_start:t_end]
+        else:
+            if not keys:
+                # Only needed once both sides touched the same lines
+                keys = [line_keys(lines, sections) for lines in (base, ours, theirs)]
+            _merge_region(
+                result,
+                (base, start, end, keys[0]),
+                (ours, o_start, o_end, keys[1]),
+                (theirs, t_start, t_end, keys[2]),
+                prefer,
+            )
+        pos = end
+
+    result.lines += base[pos:]
+    return result
+
+
+Span = Tuple[Sequence[str], int, int, List[Tuple[str, str]]]
+
+
+def _keyed(span: Span) -> Optional[Dict[str, Tuple[str, str]]]:
+    # key -> (line, path) over the span, or None if a key repeats
+    lines, start, end, keys = span
+    table: Dict[str, Tuple[str, str]] = {}
+    seen: Dict[str, int] = {}
+    for n in range(start, end):
+        key, path = keys[n]
+        if key.startswith("line:"):
+            # Blank lines, braces and binds repeat; number them in order
+            seen[key] = seen.get(key, 0) + 1
+            key = "{}#{}".format(key, seen[key])
+        elif key in table:
+            return None
+        table[key] = (lines[n], path)
+    return table
+
+
+def _merge_region(
+    result: MergeResult, base: Span, ours: Span, theirs: Span, prefer: Optional[str]
+) -> None:
+    b, o, t = _keyed(base), _keyed(ours), _keyed(theirs)
+
+    if b is None or o is None or t is None:
+        # Nothing to line the options up by: the whole region conflicts,
+        # reported once per option path in it
+        paths: Dict[str, None] = {}
+        for lines, start, end, keys in (ours, theirs):
+            for n in range(start, end):
+                paths.setdefault(keys[n][1])
+        for path in paths:
+            result.conflicts.append(
+                Conflict(
+                    path,
+                    "\n".join(base[0][base[1] : base[2]]),
+                    "\n".join(ours[0][ours[1] : ours[2]]),
+                    "\n".join(theirs[0][theirs[1] : theirs[2]]),
+                )
+            )
+        side = ours if prefer == "ours" else theirs
+        result.lines += side[0][side[1] : side[2]]
+        return
+
+    merged: Dict[str, Optional[str]] = {}
+    for key in [*t, *(k for k in o if k not in t), *(k for k in b if k not in t and k not in o)]:
+        base_line = b[key][0] if key in b else None
+        our_line = o[key][0] if key in o else None
+        their_line = t[key][0] if key in t else None
+
+        if our_line == base_line or our_line == their_line:
+            merged[key] = their_line
+        elif their_line == base_line:
+            merged[key] = our_line
+        else:
+            path = (t.get(key) or o.get(key) or b[key])[1]
+            if key.startswith(("env:", "bezier:")):
+                path = key
+            result.conflicts.append(Conflict(path, base_line, our_line, their_line))
+            merged[key] = our_line if prefer == "ours" else their_line
+
+    # Their order, with lines only we added placed after the line they
+    # followed on our side
+    order = [key for key in t if merged[key] is not None]
+    previous: Optional[str] = None
+    for key in o:
+        if key not in t and merged.get(key) is not None:
+            at = order.index(previous) + 1 if previous in order else 0
+            order.insert(at, key)
+        if key in order:
+            previous = key
+    result.lines += [merged[key] for key in order]  # type: ignore
@@ -1,21 +1,74 @@
+import contextlib
+import hashlib
 import os
-from dataclasses import dataclass
-from typing import Dict, List, Tuple, Union
+import stat
+import sys
+import time
+from bisect import bisect_left
+from dataclasses import dataclass, field
+from operator import attrgetter
+from typing import (TYPE_CHECKING, Any, Callable, Dict, Iterable, List,
+                    MutableSequence, Iterator, NamedTuple, Optional, Sequence,
+                    Set, Tuple, Union)
+
+from .cache import ParseCache
+from .index import Anchor, BindIndex, LineIndex, NodeAnchor
+from .ipc import LiveApply, Transport
+from .lexer import Lexer, Token
+from .merge import (Change, MergeConflict, MergeResult, diff_lines, line_map,
+                    make_patch, merge3)
+from .planner import EditPlan, SectionBlock
+from .rope import LineRope
+from .snapshot import write_snapshot
+from .splice import SpliceState, within
+from .stats import Stats
+from .rules import RuleIndex, split_props
+from .sections import SectionTree
+from .structures import (Bezier, Binding, Color, Env, Exec, Gradient,
+                         Layerrule, Monitor, Setting, TypeParser, Variable,
+                         Windowrule)
+from .transaction import Transaction
+from .variables import VariableCycleError, VariableResolver
+
+if TYPE_CHECKING:
+    # asyncio and concurrent.futures cost more to import than the rest of
+    # the package; they are imported where they are used
+    import asyncio
+    from concurrent.futures import Executor, Future
+
+DEFAULT_PATH = "$HOME/.config/hypr/hyprland.conf"
+
+# Sources nested deeper than this are left to the serial loader, which is
+# also what turns a file sourcing itself into an error instead of a hang
+MAX_PREFETCH_DEPTH = 64
+
+
+# Entry kinds that carry one of the structures records
+RECORD_KINDS = {
+    "setting",
+    "bind",
+    "variable",
+    "monitor",
+    "bezier",
+    "env",
+    "exec",
+    "windowrule",
+    "windowrulev2",
+    "layerrule",
+}
+
+
+class Entry(NamedTuple):
+    # One parsed line: what DataParser made of it and where it came from
+    kind: str
+    path: str  # section:subsection:key, as used by the line index
+    value: Any
+    lineno: int
 
-from .linetype import LineType, LineTypeList
-from .structures import (Bezier, Binding, Color, Env, Exec, Gradient, Monitor,
-                         Setting, TypeParser, Variable)
-
-last_section = []
-last_file = ""
 
 class Config:
-    _instance = None
-
-    def __new__(cls, *args, **kwargs):
-        if cls._instance is None:
-            cls._instance = super().__new__(cls)
-        return cls._instance
+    # The config behind HyprData; any number of others can be loaded alongside
+    _instance: Optional["Config"] = None
 
     def __init__(self, path: str) -> None:
         self.path = path
@@ -26,34 +79,437 @@ class Config:
         self.beziers: Dict[str, Bezier] = {}
         self.env: Dict[str, Env] = {}
         self.exec: List[Exec] = []
-        self.files: List[File] = [File(path, Helper.read_file(path))]
+        self.windowrules: List[Windowrule] = []
+        self.layerrules: List[Layerrule] = []
+        self.files: List[File] = []
+        self.index = LineIndex()
+        self.bind_index = BindIndex(self.expand_variable)
         self.insta_save: bool = False
+        # File.content backing store; LineRope trades load time for O(log n) edits
+        self.store: Callable[[List[str]], MutableSequence[str]] = list
+        # Opt-in on-disk cache of parsed files, see ParseCache
+        self.cache: Optional[ParseCache] = None
+        # Parse sourced files ahead of time in a pool of this many workers
+        self.workers: int = 0
+        # None means a ThreadPoolExecutor
+        self.pool: Optional[Callable[..., "Executor"]] = None
+        self._prefetched: Dict[Tuple[int, ...], File] = {}
+        # Files with unsaved edits a refresh() parses from memory, not disk
+        self._kept: Dict[Tuple[str, Tuple[str, ...]], File] = {}
+        # Opt-in load/lookup/save counters and callbacks, see Stats
+        self.stats: Optional[Stats] = None
         self.override_options:bool = False
+        self._transaction: Optional[Transaction] = None
+        # Incremental reloads splice per-file records into the model, which
+        # only holds while the model still matches the files as parsed
+        self._pristine = False
+        self._splice: Optional[SpliceState] = None
+        self._resolver: Optional[VariableResolver] = None
+        self._rules: Optional[RuleIndex] = None
+        # Filled in by a full parse, rebuilt from the entries after a splice
+        self._sections: Optional[SectionTree] = None
+        # A save merged someone else's edits into a file, see rebase_file
+        self._rebased = False
+        # Edits also sent to the running compositor, see live_apply
+        self.live: Optional[LiveApply] = None
+        # Orders the async loads and saves of this config, see areload
+        self._alock: Optional["asyncio.Lock"] = None
+
+    @classmethod
+    def load(
+        cls,
+        path: str = DEFAULT_PATH,
+        store: Callable[[List[str]], MutableSequence[str]] = list,
+        cache: Optional[ParseCache] = None,
+        workers: int = 0,
+        pool: Optional[Callable[..., "Executor"]] = None,
+        stats: Optional[Stats] = None,
+    ) -> "Config":
+        config = cls(path)
+        config.store = store
+        config.cache = cache
+        config.workers = workers
+        config.pool = pool
+        config.stats = stats
+        config.reload()
+        return config
+
+    @classmethod
+    async def aload(
+        cls,
+        path: str = DEFAULT_PATH,
+        store: Callable[[List[str]], MutableSequence[str]] = list,
+        cache: Optional[ParseCache] = None,
+        stats: Optional[Stats] = None,
+    ) -> "Config":
+        config = cls(path)
+        config.store = store
+        config.cache = cache
+        config.stats = stats
+        await config.areload()
+        return config
+
+    def reload(self, changed: Optional[Iterable[str]] = None) -> None:
+        if self.stats is None:
+            return self.reload_model(changed)
+
+        start = time.perf_counter()
+        self.reload_model(changed)
+        self.stats.reload(time.perf_counter() - start)
+
+    def reload_model(self, changed: Optional[Iterable[str]] = None) -> None:
+        if changed is not None and self.files and self._pristine:
+            return Helper.reload_files(self, changed)
+
+        self.monitors.clear()
+        self.binds.clear()
+        self.variables.clear()
+        self.config.clear()
+        self.beziers.clear()
+        self.env.clear()
+        self.exec.clear()
+        self.windowrules.clear()
+        self.layerrules.clear()
+        self._rules = None
+        self.index.clear()
+        self.bind_index.clear()
+
+        self.files = []
+        self._splice = None
+        self._sections = SectionTree()
+        # areload hands the files over already parsed
+        if self.workers > 1 and not self._prefetched:
+            self._prefetched = Helper.prefetch(self, self.path)
+        try:
+            Helper.load_file(self, self.path)
+        finally:
+            self._prefetched = {}
+        self.sync_variables()
+        self.reindex_binds()
+        self._pristine = True
+
+    def refresh(self, changed: Iterable[str], prefer: Optional[str] = None) -> None:
+        # reload(changed) for files someone else changed on disk, keeping our
+        # unsaved edits: a changed file we edited gets our edits merged onto
+        # its new content, and every other edited file keeps what it has.
+        # Raises MergeConflict, before anything is touched, when both sides
+        # changed the same option, unless prefer says whose wins.
+        dirty = [file for file in self.files if file.is_dirty()]
+        if not dirty:
+            return self.reload(changed)
+
+        targets = set(map(Helper.realpath, changed))
+        rebased = [file for file in dirty if Helper.realpath(file.path) in targets]
+        if prefer is None:
+            for file in rebased:
+                if file.disk_changed() and Helper.stat_file(file.path) is not None:
+                    conflicts = file.merge().conflicts
+                    if conflicts:
+                        raise MergeConflict(file.path, conflicts)
+        for file in rebased:
+            self.rebase_file(file, prefer)
+
+        self._kept = {(Helper.realpath(file.path), file.sections): file for file in dirty}
+        try:
+            self.reload()
+        finally:
+            self._kept = {}
+        self._rebased = False
+
+    def transaction(self, save: bool = True) -> Transaction:
+        if self._transaction is not None:
+            # Nested blocks join the outermost transaction
+            return contextlib.nullcontext(self._transaction)  # type: ignore
+        return Transaction(self, save)
+
+    def splice_state(self) -> SpliceState:
+        if self._splice is None:
+            self._splice = SpliceState(self.files)
+        return self._splice
+
+    def autosave(self, file: "File") -> None:
+        self._pristine = False
+        if self._transaction is not None:
+            return self._transaction.touch(file)
+        if self.insta_save:
+            self.save_file(file)
+            self.sync_rebased()
 
+    def live_apply(self, transport: Optional[Transport] = None) -> LiveApply:
+        # From now on edits are also applied to the running Hyprland, one
+        # batch per edit, or per apply() or transaction
+        self.live = LiveApply(self, transport)
+        return self.live
+
+    def push_live(self, record: Union[Setting, Env, Bezier, Binding]) -> None:
+        if self.live is None:
+            return
+        self.live.push(record)
+        if self._transaction is None:
+            self.live.flush()
+
+    def save_file(
+        self, file: "File", fsync: bool = False, prefer: Optional[str] = None
+    ) -> bool:
+        self.rebase_file(file, prefer)
+        if not file.save(fsync):
+            return False
+        if self.stats is not None:
+            self.stats.save(file)
+        return True
+
+    def rebase_file(self, file: "File", prefer: Optional[str] = None) -> None:
+        # Someone else wrote the file since we read it: merge our edits onto
+        # their version instead of overwriting it. Raises MergeConflict when
+        # both changed the same option, unless prefer says whose wins.
+        found = Helper.read_theirs(file)
+        if found is not None:
+            self.merge_theirs(file, *found, prefer)
+
+    def merge_theirs(
+        self,
+        file: "File",
+        theirs: List[str],
+        stat: Tuple[int, int],
+        prefer: Optional[str] = None,
+    ) -> None:
+        result = merge3(file.base, list(file.content), theirs, file.sections, prefer)
+        if result.conflicts and prefer is None:
+            raise MergeConflict(file.path, result.conflicts)
 
-    def reload(self) -> None:
-        return Helper.read_lines(Helper.read_file(self.path))
+        file.rebase(result.lines, theirs, stat)
+        # Their edits are in the file but not in the model yet
+        self._rebased = True
 
-    def save_all(self) -> None:
+    def sync_rebased(self) -> None:
+        # Reparse once every file is on disk, so no unsaved edit is lost
+        if self._rebased and not any(file.is_dirty() for file in self.files):
+            self._rebased = False
+            self.reload()
+
+    def save_all(self, fsync: bool = False, prefer: Optional[str] = None) -> None:
         for file in self.files:
-            file.save()
+            self.save_file(file, fsync, prefer)
+        self.sync_rebased()
+
+    @property
+    def alock(self) -> "asyncio.Lock":
+        import asyncio
+
+        if self._alock is None:
+            self._alock = asyncio.Lock()
+        return self._alock
+
+    async def areload(self, changed: Optional[Iterable[str]] = None) -> None:
+        # Files are read and parsed in worker threads, sourced files as soon
+        # as the file sourcing them is parsed. The model itself is only
+        # touched on the event loop, in one synchronous step at the end, so
+        # edits made while the files load never see it half built.
+        async with self.alock:
+            await self.areload_locked(changed)
+
+    async def areload_locked(self, changed: Optional[Iterable[str]] = None) -> None:
+        # areload for a caller already holding alock
+        if changed is not None and self.files and self._pristine:
+            changed = list(changed)
+            self._prefetched = await Helper.aprefetch_changed(self, changed)
+        else:
+            self._prefetched = await Helper.aprefetch(self, self.path)
+
+        try:
+            self.reload(changed)
+        finally:
+            self._prefetched = {}
+
+    async def asave_all(self, fsync: bool = False, prefer: Optional[str] = None) -> None:
+        # What is written is each file as it was once what others wrote to
+        # it was merged in. An edit made while the write is in flight keeps
+        # its file dirty, so the next save picks it up instead of it being
+        # marked as saved. Disk reads, writes and the reparse after a rebase
+        # run in worker threads; merges touch the model and run on the loop.
+        import asyncio
+
+        def write(path: str, content: List[str]) -> Optional[Tuple[int, int]]:
+            Helper.save_file(path, content, fsync)
+            return Helper.stat_file(path)
+
+        async with self.alock:
+            files = list(self.files)
+            found = await asyncio.gather(
+                *(asyncio.to_thread(Helper.read_theirs, file) for file in files)
+            )
+            for file, theirs in zip(files, found):
+                if theirs is not None:
+                    self.merge_theirs(file, *theirs, prefer)
+
+            pending = []
+            for file in self.files:
+                content = list(file.content)
+                digest = Helper.digest(content)
+                if digest != file.digest:
+                    pending.append((file, content, digest))
+
+            written = await asyncio.gather(
+                *(asyncio.to_thread(write, file.path, content) for file, content, _ in pending)
+            )
+            for (file, content, digest), stat in zip(pending, written):
+                file.saved(content, digest, stat)
+                if self.stats is not None:
+                    self.stats.save(file)
+
+            # sync_rebased, with the files read and parsed off the loop
+            if self._rebased and not any(file.is_dirty() for file in self.files):
+                self._rebased = False
+                await self.areload_locked()
+
+    def write_snapshot(self, path: str) -> None:
+        # Compile the model into a file other processes can mmap, see SnapshotFile
+        return write_snapshot(self, path)
 
     def new_option(
         self,
         new_option: Setting,
     ) -> None:
         sections = new_option.option.split(":")[:-1]
-        line_n, file = Helper.get_line_option(sections)
+        line_n, file = Helper.get_line_option(sections, self)
 
         if not file:
-            Helper.new_sections(sections)
-            return HyprData.new_option(new_option)
+            if sections:
+                Helper.new_sections(sections, self)
+                return self.new_option(new_option)
+            file = self.files[0]
+            line_n = len(file.content) - 1
 
-        indent = "    " * new_option.option.count(":")
-        file.content.insert(line_n + 1, indent + new_option.format())
+        indent = "    " * len(sections)
+        file.insert(line_n + 1, indent + new_option.format())
+        LineIndex.add(self.index.options, new_option.option, file, line_n + 1)
+        self.config[new_option.option] = new_option
+        # Right under the section's header, or at the end of the top level
+        self.sections.add_option(new_option.option, first=bool(sections))
 
-        if self.insta_save:
-            return file.save()
+        self.autosave(file)
+        return self.push_live(new_option)
+
+    def set_options(
+        self, options: Dict[str, Union[Gradient, Color, str, int, float, bool]]
+    ) -> None:
+        return self.apply([Setting(option, value) for option, value in options.items()])
+
+    def apply(self, edits: Iterable[Union[Setting, Env, Bezier, Binding]]) -> None:
+        plan = EditPlan()
+        blocks: Dict[str, SectionBlock] = {}
+        settings: Dict[str, Setting] = {}
+        applied: List[Union[Setting, Env, Bezier, Binding]] = []
+
+        for edit in edits:
+            applied.append(edit)
+            match edit:
+                case Setting():
+                    settings[edit.option] = edit
+                case Env():
+                    self.plan_env(plan, edit)
+                case Bezier():
+                    self.plan_bezier(plan, edit)
+                case Binding():
+                    self.plan_bind(plan, edit)
+                case _:
+                    raise TypeError("Cannot apply {!r}".format(edit))
+
+        for setting in settings.values():
+            self.plan_option(plan, blocks, setting)
+
+        for parent, block in blocks.items():
+            line_n, file = Helper.get_line_option(parent, self)
+            sections = parent.split(":") if parent else []
+            lines = block.render(self.index.options, sections, len(sections))
+            self.sections.insert_block(
+                parent,
+                [entry[1] for _, entry in lines if entry is not None],
+                settings,
+                first=file is not None,
+            )
+
+            for line, entry in lines:
+                if file:
+                    plan.insert(file, line_n + 1, line, entry)
+                else:
+                    plan.append(self.files[0], line, entry)
+
+        plan.apply()
+        for file in plan.files:
+            self.autosave(file)
+
+        if self.live is not None:
+            # The whole lot goes to the compositor as one batch
+            for edit in applied:
+                self.live.push(edit)
+            if self._transaction is None:
+                self.live.flush()
+
+    def plan_option(
+        self, plan: EditPlan, blocks: Dict[str, SectionBlock], setting: Setting
+    ) -> None:
+        line_n, file = Helper.get_line_option(setting.option, self)
+        obj_option = self.config.get(setting.option)
+
+        if file and obj_option:
+            obj_option.value = setting.value
+            indent = Helper.indent_of(file.content[line_n])
+            return plan.replace(file, line_n, indent + obj_option.format())
+
+        # Hang the option under its deepest existing section
+        sections = setting.option.split(":")[:-1]
+        depth = len(sections)
+        while depth and Helper.get_line_option(sections[:depth], self)[1] is None:
+            depth -= 1
+
+        block = blocks.setdefault(":".join(sections[:depth]), SectionBlock())
+        block.child(sections[depth:]).lines.append((setting.format(), setting.option))
+        self.config[setting.option] = setting
+
+    def plan_env(self, plan: EditPlan, env: Env) -> None:
+        obj_env = self.env.get(env.name)
+        line_n, file = Helper.get_line_env(env.name, self)
+
+        if obj_env and file:
+            obj_env.value = env.value
+            indent = Helper.indent_of(file.content[line_n])
+            return plan.replace(file, line_n, indent + obj_env.format())
+
+        line_n, file = Helper.get_line_option("env", self)
+        if file:
+            plan.insert(file, line_n, env.format(), (self.index.envs, env.name))
+        else:
+            plan.append(self.files[0], env.format(), (self.index.envs, env.name))
+        self.env[env.name] = env
+
+    def plan_bezier(self, plan: EditPlan, bezier: Bezier) -> None:
+        obj_bezier = self.beziers.get(bezier.name)
+        line_n, file = Helper.get_line_bezier(bezier.name, self)
+
+        if obj_bezier and file:
+            obj_bezier.transition = bezier.transition
+            indent = Helper.indent_of(file.content[line_n])
+            return plan.replace(file, line_n, indent + obj_bezier.format())
+
+        entry = (self.index.beziers, bezier.name)
+        line_n, file = Helper.get_line_option("animations:bezier", self)
+        if file:
+            indent = Helper.indent_of(file.content[line_n])
+            plan.insert(file, line_n + 1, indent + bezier.format(), entry)
+        else:
+            plan.append(self.files[0], bezier.format(), entry)
+        self.beziers[bezier.name] = bezier
+
+    def plan_bind(self, plan: EditPlan, bind: Binding) -> None:
+        line_n, file = Helper.get_line_option("bind", self)
+
+        if file:
+            plan.insert(file, line_n, bind.format())
+        else:
+            plan.append(self.files[0], bind.format(), (self.index.options, "bind"))
+        self.binds.append(bind)
+        self.bind_index.add(bind)
 
     def get_option(self, option: str) -> Union[Setting, None]:
         return self.config.get(option)
@@ -68,363 +524,1114 @@ class Config:
 
         obj_option.value = value
         new_line = obj_option.format()
-        line_n, file = Helper.get_line_option(option)
+        line_n, file = Helper.get_line_option(option, self)
 
         if not file:
-            file = HyprData.files[0]
-            line_n = len(file.content) - 1
+            file = self.files[0]
+            line_n = file.append("")
+            LineIndex.add(self.index.options, option, file, line_n)
+            self.sections.add_option(option)
+            new_line = obj_option.option + new_line.removeprefix(
+                option.split(":")[-1]
+            )
 
-        indent = "    " * obj_option.option.count(":")
-        file.content[line_n] = indent + new_line
+        file.replace(line_n, Helper.indent_of(file.content[line_n]) + new_line)
 
-        if HyprData.insta_save:
-            return file.save()
+        self.autosave(file)
+        return self.push_live(obj_option)
 
     def new_env(self, env: Env) -> None:
-        line_n, file = Helper.get_line_option("env")
+        line_n, file = Helper.get_line_option("env", self)
 
         if not file:
-            file = HyprData.files[0]
-            line_n = -1
-
-        if line_n == -1:
-            file.content.append(env.format())
+            file = self.files[0]
+            line_n = file.append(env.format())
         else:
-            file.content.insert(line_n, env.format())
+            file.insert(line_n, env.format())
 
-        HyprData.env[env.name] = env
-        if HyprData.insta_save:
-            return file.save()
+        LineIndex.add(self.index.envs, env.name, file, line_n)
+        LineIndex.add(self.index.options, "env", file, line_n)
+        self.env[env.name] = env
+        self.autosave(file)
+        return self.push_live(env)
 
     def get_env(self, env_name: str) -> Union[Env, None]:
         return self.env.get(env_name)
 
 
     def set_env(self, env_name: str, value: List[str]) -> None:
-        obj_env = HyprData.env.get(env_name)
+        obj_env = self.env.get(env_name)
         if not obj_env:
             return
 
         obj_env.value = value
-        line_n, file = Helper.get_line_env(env_name)
+        line_n, file = Helper.get_line_env(env_name, self)
 
         if not file:
-            file = HyprData.files[0]
-            line_n = len(file.content)
+            file = self.files[0]
+            line_n = file.append("")
+            LineIndex.add(self.index.envs, env_name, file, line_n)
 
-        file.content[line_n] = obj_env.format()
-        if HyprData.insta_save:
-            return file.save()
+        file.replace(line_n, Helper.indent_of(file.content[line_n]) + obj_env.format())
+        self.autosave(file)
+        return self.push_live(obj_env)
 
     def new_bezier(self, bezier:Bezier) -> None:
-        line_n, file = Helper.get_line_option("animations:bezier")
-        if not file:
-            file = HyprData.files[0]
-            line_n = -1
+        line_n, file = Helper.get_line_option("animations:bezier", self)
 
-        if line_n == -1:
-
-            file.content.insert(line_n, bezier.format())
+        if not file:
+            file = self.files[0]
+            line_n = file.append(bezier.format())
+        else:
+            indent = Helper.indent_of(file.content[line_n])
+            line_n += 1
+            file.insert(line_n, indent + bezier.format())
 
+        LineIndex.add(self.index.beziers, bezier.name, file, line_n)
+        self.beziers[bezier.name] = bezier
+        self.autosave(file)
+        return self.push_live(bezier)
 
     def get_bezier(self, bezier_name:str) -> Union[Bezier, None]:
         return self.beziers.get(bezier_name)
 
     def set_bezier(self, bezier_name: str, value: Tuple[float, float, float, float]) -> None:
-        obj_bezier= HyprData.beziers.get(bezier_name)
+        obj_bezier= self.beziers.get(bezier_name)
         if not obj_bezier:
             return
 
         obj_bezier.transition = value
-        line_n, file = Helper.get_line_bezier(obj_bezier.name)
+        line_n, file = Helper.get_line_bezier(obj_bezier.name, self)
 
         if not file:
-            file = HyprData.files[0]
-            line_n = len(file.content)
+            file = self.files[0]
+            line_n = file.append("")
+            LineIndex.add(self.index.beziers, bezier_name, file, line_n)
+
+        file.replace(
+            line_n, Helper.indent_of(file.content[line_n]) + obj_bezier.format()
+        )
+        self.autosave(file)
+        return self.push_live(obj_bezier)
+
+
+    def get_variable(self, variable_name: str) -> Union[Variable, None]:
+        for variable in reversed(self.variables):
+            if variable.name == variable_name:
+                return variable
+        return None
+
+    @property
+    def resolver(self) -> VariableResolver:
+        if self._resolver is None:
+            self._resolver = VariableResolver(self.variables)
+        return self._resolver
+
+    def sync_variables(self) -> Set[str]:
+        # Tell the resolver about changed variables, if it has been built;
+        # returns the names whose expanded value may have changed
+        if self._resolver is None:
+            return set()
+        return self._resolver.update(self.variables)
+
+    def expand(self, text: str) -> str:
+        # Raises VariableCycleError if a variable it uses refers to itself
+        return self.resolver.expand(text)
+
+    def expand_variable(self, word: str) -> str:
+        if word.startswith("$"):
+            try:
+                return self.expand(word)
+            except VariableCycleError:
+                pass
+        return word
+
+    def set_variable(self, variable_name: str, value: str) -> None:
+        variable = self.get_variable(variable_name)
+        if not variable:
+            return
 
-        file.content[line_n] = obj_bezier.format()
-        if HyprData.insta_save:
-            return file.save()
+        combos: Dict[int, str] = {}
+        if self.live is not None:
+            # What the compositor has bound now, to unbind if it changes
+            combos = {id(bind): self.live.combo(bind) for bind in self.binds}
 
+        variable.value = value
+        # The definition get_variable returned is the last one, not the
+        # first `$name` line the options index points at
+        line_n, file = Helper.get_line_variable(variable_name, self)
+
+        if not file:
+            file = self.files[0]
+            line_n = file.append("")
+            LineIndex.add(self.index.options, "$" + variable_name, file, line_n)
+            LineIndex.replace(self.index.variables, variable_name, file, line_n)
+
+        file.replace(line_n, Helper.indent_of(file.content[line_n]) + variable.format())
+
+        stale = self.sync_variables()
+        if stale:
+            self.reindex_binds()
+        self.autosave(file)
+
+        if self.live is not None and stale:
+            # Hyprland has no variables left at runtime; resend what uses them
+            def uses(text: str) -> bool:
+                return bool(self.resolver.references(text) & stale)
+
+            for setting in self.config.values():
+                if isinstance(setting.value, str) and uses(setting.value):
+                    self.live.push(setting)
+            for env in self.env.values():
+                if uses(":".join(env.value)):
+                    self.live.push(env)
+
+            # A bind sent again would be bound twice: unbind its old combo
+            # first, then bind everything that was on it
+            unbound = dict.fromkeys(
+                combos[id(bind)] for bind in self.binds if uses(bind.format())
+            )
+            for combo in unbound:
+                self.live.unbind(combo)
+            for bind in self.binds:
+                if combos[id(bind)] in unbound:
+                    self.live.push(bind)
+
+            # Rules cannot be taken back at runtime; the new ones are added
+            # after the old and win where they disagree
+            for rule in (*self.windowrules, *self.layerrules):
+                if uses(rule.format()):
+                    self.live.push(rule)
+
+            if self._transaction is None:
+                self.live.flush()
+
+    def get_expanded_option(self, option: str) -> Union[Setting, None]:
+        setting = self.config.get(option)
+        if not setting or not isinstance(setting.value, str) or "$" not in setting.value:
+            return setting
+        return Setting(setting.option, TypeParser.decode(self.expand(setting.value)))
+
+    def expanded_options(self) -> Dict[str, Setting]:
+        return {option: self.get_expanded_option(option) for option in self.config}  # type: ignore
+
+    def expanded_binds(self) -> List[Binding]:
+        expand = self.expand
+        return [
+            Binding(
+                expand(" ".join(bind.mods)).split(),
+                expand(bind.key),
+                expand(bind.dispatcher),
+                list(map(expand, bind.params)),
+                bind.bindtype,
+            )
+            for bind in self.binds
+        ]
+
+    @property
+    def sections(self) -> SectionTree:
+        if self._sections is None:
+            self._sections = SectionTree.build(self.files)
+        return self._sections
+
+    def has_section(self, section: Union[str, List[str]]) -> bool:
+        return section in self.sections
+
+    def get_section(self, section: Union[str, List[str]] = "") -> Dict[str, Setting]:
+        # Every option under the section, subsections included, in file order
+        return {
+            option: self.config[option]
+            for option in self.sections.options(section)
+            if option in self.config
+        }
+
+    def get_subsections(self, section: Union[str, List[str]] = "") -> List[str]:
+        node = self.sections.node(section)
+        if node is None:
+            return []
+        return [path for path, child in node.items() if child is not None]
+
+    @property
+    def rule_index(self) -> RuleIndex:
+        # Built on first query; anything that changes the rule lists drops it
+        if self._rules is None:
+            self._rules = RuleIndex(self.windowrules, self.layerrules)
+        return self._rules
+
+    def get_windowrules(
+        self, window_class: str = "", title: str = "", **props: Any
+    ) -> List[Windowrule]:
+        # Rules that apply to a window, in definition order. Other matched
+        # properties go in props: xwayland=1, floating=0, workspace="2", ...
+        window = {"class": window_class, "title": title}
+        window.update((name, str(int(v) if isinstance(v, bool) else v)) for name, v in props.items())
+        return self.rule_index.match(window)
+
+    def get_layerrules(self, namespace: str) -> List[Layerrule]:
+        return self.rule_index.match_layer(namespace)
+
+    def reindex_binds(self) -> None:
+        # Built once the whole tree is read, so `$mod` resolves to the
+        # variable's final value wherever it is defined
+        self.bind_index.clear()
+        for bind in self.binds:
+            self.bind_index.add(bind)
+
+    def get_binds(self, combo: str, bindtype: Optional[str] = None) -> List[Binding]:
+        mods, key, *_ = map(str.strip, combo.split(",") + [""])
+        return self.bind_index.find(mods, key, bindtype)
+
+    def get_dispatcher_binds(self, dispatcher: str) -> List[Binding]:
+        return self.bind_index.find_dispatcher(dispatcher)
+
+    def bind_conflicts(self) -> List[List[Binding]]:
+        return self.bind_index.conflicts()
 
     def new_bind(self, bind: Binding) -> None:
-        line_n, file = Helper.get_line_option("bind")
+        line_n, file = Helper.get_line_option("bind", self)
 
         if not file:
-            file = HyprData.files[0]
-            line_n = -1
-
-        if line_n == -1:
-            file.content.append(bind.format())
+            file = self.files[0]
+            line_n = file.append(bind.format())
+            LineIndex.add(self.index.options, "bind", file, line_n)
         else:
-            file.content.insert(line_n, bind.format())
+            file.insert(line_n, bind.format())
 
-        if HyprData.insta_save:
-            return file.save()
+        self.binds.append(bind)
+        self.bind_index.add(bind)
+        self.autosave(file)
+        return self.push_live(bind)
 
 
 @dataclass
 class File:
     path: str
-    content: List[str]
+    content: MutableSequence[str]
+    anchors: List[Union[Anchor, NodeAnchor]] = field(default_factory=list, repr=False, compare=False)
+    # digest of the content as last read from or written to disk
+    digest: Optional[str] = field(default=None, repr=False, compare=False)
+    # what the file parsed to, the section it was sourced in, and the line
+    # numbers of the `source` lines that lead to it from the root file
+    entries: List[Entry] = field(default_factory=list, repr=False, compare=False)
+    sections: Tuple[str, ...] = field(default=(), repr=False, compare=False)
+    origin: Tuple[int, ...] = field(default=(), repr=False, compare=False)
+    # (read seconds, parse seconds, parsed from cache) when read for Stats
+    timings: Optional[Tuple[float, float, bool]] = field(
+        default=None, repr=False, compare=False
+    )
+    # the content as last read from or written to disk, and the
+    # (st_mtime_ns, st_size) it had then: the base of a three-way merge
+    base: Tuple[str, ...] = field(default=(), repr=False, compare=False)
+    stat: Optional[Tuple[int, int]] = field(default=None, repr=False, compare=False)
+
+    @classmethod
+    def read(
+        cls, path: str, store: Callable[[List[str]], MutableSequence[str]] = list
+    ) -> "File":
+        # Stat first: a write landing after it changes the mtime we compare to
+        stat = Helper.stat_file(path)
+        lines = Helper.read_file(path)
+        file = cls(path, store(lines))
+        file.digest = Helper.digest(lines)
+        file.base = tuple(lines)
+        file.stat = stat
+        return file
+
+    def is_dirty(self) -> bool:
+        return Helper.digest(self.content) != self.digest
+
+    def disk_changed(self) -> bool:
+        # Cheap when nothing happened: one stat. Only a changed mtime or size
+        # reads the file, and a rewrite with the same content is not a change.
+        stat = Helper.stat_file(self.path)
+        if stat == self.stat:
+            return False
+        if stat is None:
+            return True
+
+        if Helper.digest(Helper.read_file(self.path)) == Helper.digest(self.base):
+            self.stat = stat
+            return False
+        return True
+
+    def changes(self) -> List[Change]:
+        # Our edits since the file was read or saved, as a minimal patch
+        return make_patch(self.base, list(self.content))
+
+    def merge(self, prefer: Optional[str] = None) -> MergeResult:
+        # Our edits replayed onto the file as it is on disk now
+        return merge3(
+            self.base, list(self.content), Helper.read_file(self.path), self.sections, prefer
+        )
+
+    def rebase(self, lines: List[str], base: Sequence[str], stat: Optional[Tuple[int, int]]) -> None:
+        # Take merged content, with `base` as what is on disk; anchors follow
+        # their lines through the change
+        position = line_map(diff_lines(list(self.content), lines))
+        moved = [position(anchor.line) for anchor in self.anchors]
+        self.content[:] = lines
+        for anchor, line_n in zip(self.anchors, moved):
+            anchor.line = min(line_n, max(len(lines) - 1, 0))
+
+        self.base = tuple(base)
+        self.digest = Helper.digest(base)
+        self.stat = stat
+
+    def saved(
+        self,
+        content: Sequence[str],
+        digest: str,
+        stat: Optional[Tuple[int, int]] = None,
+    ) -> None:
+        # stat: what the file had right after the write, if already known
+        self.base = tuple(content)
+        self.digest = digest
+        self.stat = Helper.stat_file(self.path) if stat is None else stat
+
+    def save(self, fsync: bool = False) -> bool:
+        digest = Helper.digest(self.content)
+        if digest == self.digest:
+            return False
+
+        content = list(self.content)
+        Helper.save_file(self.path, content, fsync)
+        self.saved(content, digest)
+        return True
+
+    def anchor(self, line_n: int) -> Union[Anchor, NodeAnchor]:
+        if isinstance(self.content, LineRope):
+            anchor = NodeAnchor(self, line_n)
+            self.anchors.append(anchor)
+            return anchor
+
+        anchor = Anchor(self, line_n)
+        if not self.anchors or self.anchors[-1].line <= line_n:
+            self.anchors.append(anchor)
+        else:
+            self.anchors.insert(
+                bisect_left(self.anchors, line_n, key=attrgetter("line")), anchor
+            )
+        return anchor
+
+    def insert(self, line_n: int, line: str) -> None:
+        self.content.insert(line_n, line)
+        if isinstance(self.content, LineRope):
+            return
+
+        for anchor in self.anchors[
+            bisect_left(self.anchors, line_n, key=attrgetter("line")):
+        ]:
+            anchor.line += 1
+
+    def replace(self, line_n: int, line: str) -> None:
+        self.content[line_n] = line
 
-    def save(self) -> None:
-        return Helper.save_file(self.path, self.content)
+    def append(self, line: str) -> int:
+        self.content.append(line)
+        return len(self.content) - 1
 
 
 class Helper:
     @staticmethod
     def read_file(path: str) -> List[str]:
-        global last_file
-        last_file = os.path.expandvars(path)
-        with open(last_file) as file:
+        with open(os.path.expandvars(path)) as file:
             return file.read().splitlines()
 
     @staticmethod
-    def save_file(path: str, content: List[str]) -> None:
-        with open(os.path.expandvars(path), "w+") as file:
-            return file.writelines(map(lambda v: v + "\n", content))
+    def read_theirs(file: "File") -> Optional[Tuple[List[str], Tuple[int, int]]]:
+        # What someone else wrote to the file since we read it, and its stat;
+        # None if nothing changed. Sets nothing but file.stat, so it can run
+        # in a worker thread.
+        if not file.disk_changed():
+            return None
+        stat = Helper.stat_file(file.path)
+        if stat is None:
+            # Deleted under us; saving puts our version back
+            return None
+        return Helper.read_file(file.path), stat
 
     @staticmethod
-    def new_sections(sections: List[str]) -> None:
-        if not sections:
-            return
+    def stat_file(path: str) -> Optional[Tuple[int, int]]:
+        try:
+            st = os.stat(os.path.expandvars(path))
+        except FileNotFoundError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    @staticmethod
+    def digest(content: Iterable[str]) -> str:
+        return hashlib.blake2b(
+            "\n".join(content).encode(), digest_size=16
+        ).hexdigest()
 
+    @staticmethod
+    def save_file(path: str, content: Iterable[str], fsync: bool = False) -> None:
+        # Write a sibling temp file and rename it over the target, so readers
+        # (and Hyprland's watcher) only ever see the old or the new config.
+        # realpath keeps symlinked dotfiles pointing where they did.
+        path = os.path.realpath(os.path.expandvars(path))
+        directory, name = os.path.split(path)
+        tmp = os.path.join(directory, ".{}.{}.tmp".format(name, os.urandom(16).hex()))
+
+        fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666)
+        try:
+            with os.fdopen(fd, "w") as file:
+                file.write("".join([line + "\n" for line in content]))
+                if fsync:
+                    file.flush()
+                    os.fsync(file.fileno())
+
+            try:
+                os.chmod(tmp, stat.S_IMODE(os.stat(path).st_mode))
+            except FileNotFoundError:
+                pass
+
+            os.replace(tmp, path)
+        except BaseException:
+            with contextlib.suppress(FileNotFoundError):
+                os.unlink(tmp)
+            raise
+
+        if fsync:
+            dir_fd = os.open(directory, os.O_RDONLY)
+            try:
+                os.fsync(dir_fd)
+            finally:
+                os.close(dir_fd)
+
+    @staticmethod
+    def indent_of(line: str) -> str:
+        return line[: len(line) - len(line.lstrip())]
+
+    @staticmethod
+    def new_sections(sections: List[str], config: Optional["Config"] = None) -> None:
+        config = HyprData if config is None else config
         depth = []
 
         for i, section in enumerate(sections, 0):
             depth += [section]
-            _, file = Helper.get_line_option(depth)
+            _, file = Helper.get_line_option(depth, config)
 
-            if not file:
-                line_n, file = Helper.get_line_option(depth[:-1])
+            if file:
+                continue
 
-                if not file:
+            line_n, file = Helper.get_line_option(depth[:-1], config)
+
+            if not file:
+                if i:
                     continue
-                indent = "    " * i
-                file.content.insert(line_n + 1, indent + section + " {")
-                file.content.insert(line_n + 2, indent + "}")
-                if i + 1 == len(sections):
-                    return file.save()
+                file = config.files[0]
+                line_n = len(file.content) - 1
+
+            indent = "    " * i
+            file.insert(line_n + 1, indent + section + " {")
+            file.insert(line_n + 2, indent + "}")
+            LineIndex.add(config.index.options, ":".join(depth), file, line_n + 1)
+            config.sections.add_section(depth, first=bool(i))
+
+    @staticmethod
+    def realpath(path: str) -> str:
+        return os.path.realpath(os.path.expandvars(path))
+
+    @staticmethod
+    def parse_file(config: "Config", path: str, sections: Sequence[str] = ()) -> File:
+        stats = config.stats
+        file = Helper.parse_source(path, sections, config.cache, stats is not None)
+        if stats is not None:
+            stats.file(file)
+        if config.store is not list:
+            file.content = config.store(file.content)
+        return file
+
+    @staticmethod
+    def parse_source(
+        path: str,
+        sections: Sequence[str] = (),
+        cache: Optional[ParseCache] = None,
+        timed: bool = False,
+    ) -> File:
+        # Touches no Config state, so it can run in a worker thread or process;
+        # timings travel back on the File for the same reason
+        start = time.perf_counter() if timed else 0.0
+        file = File.read(path)
+        file.sections = tuple(sections)
+        read = time.perf_counter() if timed else 0.0
+
+        entries = cache.get(file, sections) if cache else None
+        cached = entries is not None
+        if entries is None:
+            entries = DataParser.parse_lines(file.content, sections)
+            if cache:
+                cache.put(file, sections, entries)
+
+        file.entries = entries
+        if timed:
+            file.timings = (read - start, time.perf_counter() - read, cached)
+        return file
+
+    @staticmethod
+    def prefetch(config: "Config", path: str) -> Dict[Tuple[int, ...], File]:
+        # Parse the whole source tree up front, submitting each file as soon
+        # as its parent is parsed. Nothing is applied here: load_file picks
+        # the results up by origin, so they still land in declaration order.
+        from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+        parsed: Dict[Tuple[int, ...], File] = {}
+        cache = config.cache
+        timed = config.stats is not None
+        pool = config.pool or ThreadPoolExecutor
+
+        with pool(max_workers=config.workers) as executor:
+            pending: Dict["Future", Tuple[int, ...]] = {
+                executor.submit(Helper.parse_source, path, (), cache, timed): ()
+            }
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    origin = pending.pop(future)
+                    try:
+                        file = future.result()
+                    except Exception:
+                        # load_file parses it again and raises in order
+                        continue
+
+                    parsed[origin] = file
+                    if len(origin) >= MAX_PREFETCH_DEPTH:
+                        continue
+                    for entry in file.entries:
+                        if entry.kind == "source":
+                            source, sections = entry.value
+                            future = executor.submit(
+                                Helper.parse_source, source, sections, cache, timed
+                            )
+                            pending[future] = origin + (entry.lineno,)
+        return parsed
+
+    @staticmethod
+    async def aprefetch(config: "Config", path: str) -> Dict[Tuple[int, ...], File]:
+        # prefetch, on the default executor of the running loop
+        import asyncio
+
+        parsed: Dict[Tuple[int, ...], File] = {}
+        cache = config.cache
+        timed = config.stats is not None
+
+        async def visit(path: str, sections: Sequence[str], origin: Tuple[int, ...]) -> None:
+            try:
+                file = await asyncio.to_thread(
+                    Helper.parse_source, path, sections, cache, timed
+                )
+            except Exception:
+                # load_file parses it again and raises in order
+                return
+
+            parsed[origin] = file
+            if len(origin) < MAX_PREFETCH_DEPTH:
+                sources = [
+                    (entry.value, entry.lineno)
+                    for entry in file.entries
+                    if entry.kind == "source"
+                ]
+                await asyncio.gather(
+                    *(
+                        visit(source, sections, origin + (lineno,))
+                        for (source, sections), lineno in sources
+                    )
+                )
+
+        await visit(path, (), ())
+        return parsed
+
+    @staticmethod
+    async def aprefetch_changed(
+        config: "Config", changed: Iterable[str]
+    ) -> Dict[Tuple[int, ...], File]:
+        # The changed files of an incremental reload, parsed concurrently,
+        # and the files they newly source. Files already loaded are reused
+        # by reload_subtree and not read again.
+        import asyncio
+
+        targets = set(map(Helper.realpath, changed))
+        files = [file for file in config.files if Helper.realpath(file.path) in targets]
+        if any(not file.origin for file in files):
+            # The root changed: reload_files reloads everything
+            return await Helper.aprefetch(config, config.path)
+
+        loaded = {(Helper.realpath(file.path), file.sections) for file in config.files}
+        parsed: Dict[Tuple[int, ...], File] = {}
+        timed = config.stats is not None
+
+        async def visit(path: str, sections: Sequence[str], origin: Tuple[int, ...]) -> None:
+            try:
+                file = await asyncio.to_thread(
+                    Helper.parse_source, path, sections, config.cache, timed
+                )
+            except Exception:
+                # reload_subtree parses it again and raises in order
+                return
+
+            parsed[origin] = file
+            if len(origin) < MAX_PREFETCH_DEPTH:
+                sources = [
+                    (entry.value, entry.lineno)
+                    for entry in file.entries
+                    if entry.kind == "source"
+                ]
+                await asyncio.gather(
+                    *(
+                        visit(source, sections, origin + (lineno,))
+                        for (source, sections), lineno in sources
+                        if (Helper.realpath(source), tuple(sections)) not in loaded
+                    )
+                )
+
+        await asyncio.gather(*(visit(file.path, file.sections, file.origin) for file in files))
+        return parsed
+
+    @staticmethod
+    def take_prefetched(
+        config: "Config", path: str, sections: Sequence[str], origin: Tuple[int, ...]
+    ) -> Optional[File]:
+        file = config._prefetched.pop(origin, None)
+        # Origins are line numbers; after an edit one may lead somewhere else
+        if file is None or (file.path, file.sections) != (path, tuple(sections)):
+            return None
+
+        if config.stats is not None:
+            config.stats.file(file)
+        if config.store is not list:
+            file.content = config.store(file.content)
+        return file
+
+    @staticmethod
+    def take_kept(config: "Config", path: str, sections: Sequence[str]) -> Optional[File]:
+        # The same File, reparsed from what it holds now; apply_entries
+        # anchors its lines again
+        file = config._kept.pop((Helper.realpath(path), tuple(sections)), None)
+        if file is None:
+            return None
+        file.anchors.clear()
+        file.entries = DataParser.parse_lines(file.content, sections)
+        return file
+
+    @staticmethod
+    def load_file(
+        config: "Config",
+        path: str,
+        sections: Sequence[str] = (),
+        origin: Tuple[int, ...] = (),
+    ) -> File:
+        file = Helper.take_kept(config, path, sections)
+        if file is None:
+            file = Helper.take_prefetched(config, path, sections, origin)
+        if file is None:
+            file = Helper.parse_file(config, path, sections)
+        file.origin = origin
+
+        config.files.append(file)
+        Helper.apply_entries(config, file.entries, file)
+        return file
 
     @staticmethod
-    def read_lines(lines: List[str]):
-        for line in lines:
-            if LineParser.skip(line):
+    def reload_files(config: "Config", changed: Iterable[str]) -> None:
+        targets = set(map(Helper.realpath, changed))
+        roots: List[File] = []
+
+        for file in config.files:
+            if Helper.realpath(file.path) not in targets:
                 continue
+            # A changed file inside another changed file is reloaded with it
+            if not any(within(file.origin, root.origin) for root in roots):
+                roots.append(file)
 
-            line = LineParser.format_line(line)
+        if any(not root.origin for root in roots):
+            return config.reload()
 
-            match LineParser.get_linetype(line):
-                case "start-section":
-                    LineParser.add_section(line)
-                case "end-section":
-                    LineParser.del_section(line)
+        for root in roots:
+            Helper.splice_file(config, root, targets)
+
+    @staticmethod
+    def splice_file(config: "Config", root: File, targets: Set[str]) -> None:
+        files = config.files
+        start = next(i for i, file in enumerate(files) if file is root)
+        end = start + 1
+        while end < len(files) and within(files[end].origin, root.origin):
+            end += 1
+
+        reusable: Dict[Tuple[str, Tuple[str, ...]], List[File]] = {}
+        for file in files[start + 1 : end]:
+            key = (Helper.realpath(file.path), file.sections)
+            reusable.setdefault(key, []).append(file)
+
+        state = config.splice_state()
+        old = files[start:end]
+        new: List[File] = []
+        Helper.reload_subtree(
+            config, root.path, root.sections, root.origin, targets, reusable, new
+        )
+        files[start:end] = new
+
+        changed = state.splice(config, root.origin, old, new)
+        config._sections = None
+        if "variables" in changed:
+            config.sync_variables()
+        if changed & {"binds", "variables"}:
+            config.reindex_binds()
+        if changed & {"windowrules", "layerrules"}:
+            config._rules = None
+
+    @staticmethod
+    def reload_subtree(
+        config: "Config",
+        path: str,
+        sections: Tuple[str, ...],
+        origin: Tuple[int, ...],
+        targets: Set[str],
+        reusable: Dict[Tuple[str, Tuple[str, ...]], List[File]],
+        files: List[File],
+    ) -> None:
+        realpath = Helper.realpath(path)
+        pool = reusable.get((realpath, sections))
+
+        prefetched = Helper.take_prefetched(config, path, sections, origin)
+        if realpath not in targets and pool:
+            file = pool.pop(0)
+        elif prefetched is not None:
+            file = prefetched
+        else:
+            file = Helper.parse_file(config, path, sections)
+        file.origin = origin
+        files.append(file)
+
+        for entry in file.entries:
+            if entry.kind == "source":
+                source, source_sections = entry.value
+                Helper.reload_subtree(
+                    config,
+                    source,
+                    source_sections,
+                    origin + (entry.lineno,),
+                    targets,
+                    reusable,
+                    files,
+                )
+
+    @staticmethod
+    def read_lines(
+        lines: Sequence[str],
+        file: Optional[File] = None,
+        config: Optional["Config"] = None,
+    ):
+        config = HyprData if config is None else config
+        return Helper.apply_entries(config, DataParser.parse_lines(lines), file)
+
+    @staticmethod
+    def apply_entries(
+        config: "Config", entries: Iterable[Entry], file: Optional[File] = None
+    ):
+        index = config.index
+        tree = config._sections
+
+        for entry in entries:
+            if file is not None:
+                LineIndex.add(index.options, entry.path, file, entry.lineno)
+
+            match entry.kind:
                 case "setting":
-                    DataParser.parse_setting(line)
+                    config.config[entry.value.option] = entry.value
+                    if tree is not None:
+                        tree.add_option(entry.path)
+                case "start-section":
+                    if tree is not None:
+                        tree.add_section(entry.path)
                 case "bind":
-                    DataParser.parse_bind(line)
+                    config.binds.append(entry.value)
                 case "variable":
-                    DataParser.parse_variable(line)
+                    config.variables.append(entry.value)
+                    if file is not None:
+                        name = entry.value.name
+                        LineIndex.replace(index.variables, name, file, entry.lineno)
                 case "source":
-                    DataParser.parse_source(line)
+                    path, sections = entry.value
+                    origin = file.origin if file is not None else ()
+                    Helper.load_file(config, path, sections, origin + (entry.lineno,))
                 case "monitor":
-                    DataParser.parse_monitor(line)
+                    config.monitors.append(entry.value)
                 case "bezier":
-                    DataParser.parse_bezier(line)
+                    config.beziers[entry.value.name] = entry.value
+                    if file is not None:
+                        LineIndex.add(index.beziers, entry.value.name, file, entry.lineno)
                 case "env":
-                    DataParser.parse_env(line)
+                    config.env[entry.value.name] = entry.value
+                    if file is not None:
+                        LineIndex.add(index.envs, entry.value.name, file, entry.lineno)
                 case "exec":
-                    DataParser.parse_exec(line)
-                case "windowrule":
-                    pass
-                case "windowrulev2":
-                    pass
+                    config.exec.append(entry.value)
+                case "windowrule" | "windowrulev2":
+                    config.windowrules.append(entry.value)
+                    config._rules = None
                 case "layerrule":
-                    pass
-                case _:
-                    print(line)
+                    config.layerrules.append(entry.value)
+                    config._rules = None
+                case "unknown":
+                    if config.stats is not None:
+                        config.stats.unknown(file, entry)
 
     @staticmethod
-    def get_line_option(option: Union[str, List[str]]) -> Tuple[int, Union[File, None]]:
-        if isinstance(option, str):
-            section_depth = option.split(":")
-        else:
-            section_depth = option
-
-        for file in HyprData.files:
-            depth = []
-            for i, line in enumerate(file.content):
-                if LineParser.skip(line):
-                    continue
-
-                line = LineParser.format_line(line)
+    def get_line_option(
+        option: Union[str, List[str]], config: Optional["Config"] = None
+    ) -> Tuple[int, Union[File, None]]:
+        config = HyprData if config is None else config
+        found = LineIndex.find(config.index.options, option)
+        if config.stats is not None:
+            config.stats.lookup("options", option, found[1] is not None)
+        return found
 
-                match LineParser.get_linetype(line):
-                    case "start-section":
-                        section_name, _ = map(str.strip, line.split("{"))
-                        depth += [section_name]
-                        if depth == section_depth:
-                            return i, file
+    @staticmethod
+    def get_line_env(
+        env_name: str, config: Optional["Config"] = None
+    ) -> Tuple[int, Union[File, None]]:
+        config = HyprData if config is None else config
+        found = LineIndex.find(config.index.envs, env_name)
+        if config.stats is not None:
+            config.stats.lookup("envs", env_name, found[1] is not None)
+        return found
 
-                    case "end-section":
-                        depth.pop(-line.count("}"))
-                    case _:
-                        section_name, _ = line.split(" = ")
-                        depth += [section_name]
-                        if depth == section_depth:
-                            return i, file
-                        depth.pop(-1)
+    @staticmethod
+    def get_line_variable(
+        variable_name: str, config: Optional["Config"] = None
+    ) -> Tuple[int, Union[File, None]]:
+        config = HyprData if config is None else config
+        found = LineIndex.find(config.index.variables, variable_name)
+        if config.stats is not None:
+            config.stats.lookup("variables", variable_name, found[1] is not None)
+        return found
 
-        return (-1, None)
+    @staticmethod
+    def get_line_bezier(
+        bezier_name: str, config: Optional["Config"] = None
+    ) -> Tuple[int, Union[File, None]]:
+        config = HyprData if config is None else config
+        found = LineIndex.find(config.index.beziers, bezier_name)
+        if config.stats is not None:
+            config.stats.lookup("beziers", bezier_name, found[1] is not None)
+        return found
 
+class LineParser:
     @staticmethod
-    def get_line_env(env_name: str) -> Tuple[int, Union[File, None]]:
-        for file in HyprData.files:
-            for i, line in enumerate(file.content):
-                if LineParser.skip(line):
-                    continue
+    def add_section(sections: List[str], token: Token) -> None:
+        sections += [sys.intern(token.key)]
 
-                line = LineParser.format_line(line)
-                match LineParser.get_linetype(line):
-                    case "env":
-                        _, env = line.split(" = ")
-                        name, *_ = env.split(",")
-                        if env_name == name:
-                            return i, file
-        return (-1, None)
-    @staticmethod
-    def get_line_bezier(bezier_name:str) -> Tuple[int, Union[File, None]]:
-        for file in HyprData.files:
-            for i, line in enumerate(file.content):
-                if LineParser.skip(line):
-                    continue
-                line = LineParser.format_line(line)
+    @staticmethod
+    def del_section(sections: List[str], token: Token) -> None:
+        del sections[token.delta:]
 
-                match LineParser.get_linetype(line):
-                    case "bezier":
-                        _, bezier = line.split(" = ")
-                        name, *_ = bezier.split(",")
-                        if bezier_name == name.strip():
-                            return i, file
-        return (-1, None)
 
-class LineParser:
+class DataParser:
     @staticmethod
-    def add_section(line: str) -> None:
-        global last_section
-        section_name, _ = map(str.strip, line.split("{"))
-        last_section += [section_name]
+    def parse_lines(
+        lines: Iterable[str], sections: Sequence[str] = ()
+    ) -> List[Entry]:
+        # Pure: the result only depends on the lines and the section they are
+        # read in, which is what makes it cacheable per file
+        return list(DataParser.iter_lines(lines, sections))
 
     @staticmethod
-    def del_section(line: str) -> None:
-        global last_section
-        last_section.pop(-line.count("}"))
+    def iter_lines(
+        lines: Iterable[str], sections: Sequence[str] = ()
+    ) -> Iterator[Entry]:
+        sections = list(sections)
+
+        for token in Lexer.tokenize_lines(lines):
+            if token.kind == "end-section":
+                LineParser.del_section(sections, token)
+                continue
 
-    @staticmethod
-    def format_line(line: str) -> str:
-        line = line.split("#", 1)[0].strip()
+            # Interned: the same few hundred paths repeat across every file
+            path = sys.intern(":".join([*sections, token.key]))
 
-        try:
-            name, value = line.split("=", 1)
-            return "{} = {}".format(name.strip(), value.strip())
-        except ValueError:
-            if line:
-                return line
-        except Exception as e:
-            print(e)
-        return ""
-
-    @staticmethod
-    def get_linetype(line: str) -> LineType:
-        line = LineParser.format_line(line)
-        if "{" in line:
-            return "start-section"
-        elif "}" in line:
-            return "end-section"
-        elif line.startswith("$"):
-            return "variable"
-        else:
-            for linetype in LineTypeList:
-                if line.startswith(linetype):
-                    return linetype
-            return "setting"
+            match token.kind:
+                case "start-section":
+                    LineParser.add_section(sections, token)
+                    value = None
+                case "setting":
+                    value = DataParser.parse_setting(token, sections)
+                case "bind":
+                    value = DataParser.parse_bind(token)
+                case "variable":
+                    value = DataParser.parse_variable(token)
+                case "source":
+                    value = (DataParser.parse_source(token), tuple(sections))
+                case "monitor":
+                    value = DataParser.parse_monitor(token)
+                case "bezier":
+                    value = DataParser.parse_bezier(token)
+                case "env":
+                    value = DataParser.parse_env(token)
+                case "exec":
+                    value = DataParser.parse_exec(token)
+                case "windowrule" | "windowrulev2":
+                    value = DataParser.parse_windowrule(token)
+                case "layerrule":
+                    value = DataParser.parse_layerrule(token)
+                case _:
+                    value = token.key
+
+            yield Entry(token.kind, path, value, token.lineno)
 
     @staticmethod
-    def skip(line: str) -> bool:
-        tmp = LineParser.format_line(line)
-        if tmp.startswith("#") or not tmp:
-            return True
-        return False
+    def parse_monitor(token: Token) -> Monitor:
+        name, res, pos, scale = map(str.strip, token.value.split(","))
 
+        return Monitor(name, res, pos, scale)
 
-class DataParser:
     @staticmethod
-    def parse_monitor(line: str) -> None:
-        _, monitor = line.split(" = ")
-        name, res, pos, scale = map(str.strip, monitor.split(","))
-
-        return HyprData.monitors.append(Monitor(name, res, pos, scale))
+    def parse_variable(token: Token) -> Variable:
+        return Variable(token.key[1:], token.value)
 
     @staticmethod
-    def parse_variable(line: str) -> None:
-        return HyprData.variables.append(Variable(*line[1:].split(" = ")))
+    def parse_setting(token: Token, sections: Sequence[str] = ()) -> Setting:
+        section = sys.intern(":".join([*sections, token.key]))  # section:subsection:name
+        return Setting(section, TypeParser.decode(token.value))
 
     @staticmethod
-    def parse_setting(line: str) -> None:
-        name, value = line.split(" = ")
-        section = ":".join(last_section) + ":" + name  # section:subsection:name
+    def parse_windowrule(token: Token) -> Windowrule:
+        rule, _, window = map(str.strip, token.value.partition(","))
+        rule, _, rule_args = rule.partition(" ")
 
-        if TypeParser.is_bool(value):
-            value = TypeParser.to_bool(value)
-        elif TypeParser.is_int(value):
-            value = TypeParser.to_int(value)
-        elif TypeParser.is_float(value):
-            value = TypeParser.to_float(value)
-        elif TypeParser.is_color(value):
-            value = TypeParser.to_color(value)
-        elif TypeParser.is_gradient(value):
-            value = TypeParser.to_gradient(value)
+        if token.kind == "windowrulev2":
+            return Windowrule(rule, window, rule_args.strip(), split_props(window), True)
 
-        HyprData.config[section] = Setting(section, value)
+        # windowrule = RULE, WINDOW: a class regex, or title:/class: one
+        prop, colon, value = window.partition(":")
+        if colon and prop in ("class", "title"):
+            props = {prop: value}
+        else:
+            props = {"class": window}
+        return Windowrule(rule, window, rule_args.strip(), props)
 
     @staticmethod
-    def parse_exec(line: str) -> None:
-        exectype, cmd = line.split(" = ")
+    def parse_layerrule(token: Token) -> Layerrule:
+        rule, _, namespace = map(str.strip, token.value.partition(","))
+        rule, _, rule_args = rule.partition(" ")
+        return Layerrule(rule, namespace, rule_args.strip())
 
-        if exectype == "exec-once":
-            return HyprData.exec.append(Exec(cmd, True))
-        return HyprData.exec.append(Exec(cmd))
+    @staticmethod
+    def parse_exec(token: Token) -> Exec:
+        if token.key == "exec-once":
+            return Exec(token.value, True)
+        return Exec(token.value)
 
     @staticmethod
-    def parse_bezier(line: str) -> None:
-        _, bezier = line.split(" = ")
-        name, *curve = map(str.strip, bezier.split(",", 4))
+    def parse_bezier(token: Token) -> Bezier:
+        name, *curve = map(str.strip, token.value.split(",", 4))
         curve = tuple(map(float, curve))
-        HyprData.beziers[name] = Bezier(name, curve)  # type: ignore
+        return Bezier(name, curve)  # type: ignore
 
     @staticmethod
-    def parse_bind(line: str) -> None:
-        bindtype, keys = line.split(" = ")
-        mods, key, dispatcher, *params = map(str.strip, keys.split(",", 4))
+    def parse_bind(token: Token) -> Binding:
+        mods, key, dispatcher, *params = map(str.strip, token.value.split(",", 4))
         mods = mods.split() if mods else []
-        return HyprData.binds.append(Binding(mods, key, dispatcher, params, bindtype))
+        return Binding(mods, key, dispatcher, params, token.key)
 
     @staticmethod
-    def parse_source(line: str) -> None:
-        _, path = line.split(" = ")
+    def parse_source(token: Token) -> str:
+        return token.value
 
-        content = Helper.read_file(path)
+    @staticmethod
+    def parse_env(token: Token) -> Env:
+        var_env, *value = map(str.strip, token.value.split(",", 1))
+
+        return Env(var_env, value)
+
+
+class Record(NamedTuple):
+    # What iter_entries yields: a parsed record and where it was read
+    kind: str
+    value: Union[
+        Setting, Binding, Variable, Monitor, Bezier, Env, Exec, Windowrule, Layerrule
+    ]
+    path: str  # section:subsection:key
+    file: str
+    lineno: int  # 1-based, as editors and error messages count lines
+
+    @property
+    def section(self) -> str:
+        return self.path.rpartition(":")[0]
+
+
+def iter_entries(
+    path: str = DEFAULT_PATH,
+    follow_sources: bool = True,
+    sections: Sequence[str] = (),
+) -> Iterator[Record]:
+    # Stream the records of a config in the order Config applies them,
+    # reading one line at a time. Nothing is kept once yielded, so every
+    # occurrence comes out: the last `setting` for a path is the one
+    # Config.get_option returns.
+    path = os.path.expandvars(path)
+
+    with open(path) as file:
+        lines = (line.rstrip("\r\n") for line in file)
+        for entry in DataParser.iter_lines(lines, sections):
+            if entry.kind in RECORD_KINDS:
+                yield Record(entry.kind, entry.value, entry.path, path, entry.lineno + 1)
+            elif entry.kind == "source" and follow_sources:
+                source, source_sections = entry.value
+                yield from iter_entries(source, True, source_sections)
+
+
+def parse_many(
+    paths: Iterable[str],
+    workers: Optional[int] = None,
+    return_exceptions: bool = False,
+    **options: Any,
+) -> List[Union[Config, BaseException]]:
+    # Load independent configs in a process pool; the models come back in
+    # the order of `paths`. `options` are passed on to Config.load.
+    from concurrent.futures import ProcessPoolExecutor
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(Config.load, path, **options) for path in paths]
+
+        results: List[Union[Config, BaseException]] = []
+        for future in futures:
+            try:
+                results.append(future.result())
+            except Exception as e:
+                if not return_exceptions:
+                    raise
+                results.append(e)
+        return results
+
+
+class LazyConfig:
+    def __init__(self, path: str) -> None:
+        object.__setattr__(self, "_path", path)
 
-        HyprData.files.append(File(path, content))
-        return Helper.read_lines(content)
+    def _resolve(self) -> Config:
+        if Config._instance is None:
+            Config._instance = Config.load(self._path)
+        return Config._instance
 
-    @staticmethod
-    def parse_env(line: str) -> None:
-        _, env = line.split(" = ")
-        var_env, *value = map(str.strip, env.split(",", 1))
+    def use(self, config: Config) -> None:
+        # Point HyprData at an already loaded config
+        Config._instance = config
+
+    @property
+    def loaded(self) -> bool:
+        return Config._instance is not None
+
+    def __getattr__(self, name: str):
+        return getattr(self._resolve(), name)
+
+    def __setattr__(self, name: str, value) -> None:
+        setattr(self._resolve(), name, value)
+
+    def __repr__(self) -> str:
+        if not self.loaded:
+            return "<HyprData (not loaded): {}>".format(self._path)
+        return repr(self._resolve())
 
-        HyprData.env[var_env] = Env(var_env, value)
 
-HyprData: Config = Config("$HOME/.config/hypr/hyprland.conf")
-HyprData.reload()
+HyprData: Config = LazyConfig(DEFAULT_PATH)  # type: ignore
@@ -0,0 +1,109 @@
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+from .index import LineIndex
+
+if TYPE_CHECKING:
+    from .index import Anchor
+    from .parser import File
+
+# (index table, name) to register for an inserted line
+IndexEntry = Tuple[Dict[str, "Anchor"], str]
+
+
+class FileEdits:
+    def __init__(self, file: "File") -> None:
+        self.file = file
+        self.replaced: Dict[int, str] = {}
+        # old line number -> lines to insert before it, in order
+        self.inserted: Dict[int, List[Tuple[str, Optional[IndexEntry]]]] = {}
+
+    def apply(self) -> None:
+        old = self.file.content
+        new: List[str] = []
+        registered: List[Tuple[IndexEntry, int]] = []
+        # new position of every old line, for moving the anchors
+        moved: List[int] = []
+
+        for line_n in range(len(old) + 1):
+            for line, entry in self.inserted.get(line_n, ()):
+                if entry is not None:
+                    registered.append((entry, len(new)))
+                new.append(line)
+
+            if line_n == len(old):
+                break
+
+            moved.append(len(new))
+            new.append(self.replaced.get(line_n, old[line_n]))
+
+        lines = [moved[anchor.line] for anchor in self.file.anchors]
+        self.file.content[:] = new
+        for anchor, line_n in zip(self.file.anchors, lines):
+            anchor.line = line_n
+        for (table, name), line_n in registered:
+            LineIndex.add(table, name, self.file, line_n)
+
+
+class EditPlan:
+    def __init__(self) -> None:
+        self.edits: Dict[int, FileEdits] = {}
+
+    def of(self, file: "File") -> FileEdits:
+        edits = self.edits.get(id(file))
+        if edits is None:
+            edits = self.edits[id(file)] = FileEdits(file)
+        return edits
+
+    def replace(self, file: "File", line_n: int, line: str) -> None:
+        self.of(file).replaced[line_n] = line
+
+    def insert(
+        self,
+        file: "File",
+        line_n: int,
+        line: str,
+        entry: Optional[IndexEntry] = None,
+    ) -> None:
+        # Inserts before the current line `line_n`, like list.insert
+        self.of(file).inserted.setdefault(line_n, []).append((line, entry))
+
+    def append(
+        self, file: "File", line: str, entry: Optional[IndexEntry] = None
+    ) -> None:
+        return self.insert(file, len(file.content), line, entry)
+
+    @property
+    def files(self) -> List["File"]:
+        return [edits.file for edits in self.edits.values()]
+
+    def apply(self) -> None:
+        for edits in self.edits.values():
+            edits.apply()
+
+
+class SectionBlock:
+    # Sections that do not exist yet, rendered in one go under their parent
+    def __init__(self) -> None:
+        self.lines: List[Tuple[str, str]] = []
+        self.children: Dict[str, SectionBlock] = {}
+
+    def child(self, sections: List[str]) -> "SectionBlock":
+        block = self
+        for section in sections:
+            block = block.children.setdefault(section, SectionBlock())
+        return block
+
+    def render(
+        self, table: Dict[str, "Anchor"], sections: List[str], depth: int
+    ) -> List[Tuple[str, Optional[IndexEntry]]]:
+        indent = "    " * depth
+        lines: List[Tuple[str, Optional[IndexEntry]]] = [
+            (indent + line, (table, path)) for line, path in self.lines
+        ]
+
+        for name, child in self.children.items():
+            path = [*sections, name]
+            lines.append((indent + name + " {", (table, ":".join(path))))
+            lines += child.render(table, path, depth + 1)
+            lines.append((indent + "}", None))
+        return lines
@@ -0,0 +1,200 @@
+import random
+from typing import (Iterable, Iterator, List, MutableSequence, Optional, Tuple,
+                    Union, overload)
+
+
+class Node:
+    __slots__ = ("value", "priority", "size", "left", "right", "parent")
+
+    def __init__(self, value: str) -> None:
+        self.value = value
+        self.priority = random.random()
+        self.size = 1
+        self.left: Optional[Node] = None
+        self.right: Optional[Node] = None
+        self.parent: Optional[Node] = None
+
+
+def _size(node: Optional[Node]) -> int:
+    return node.size if node else 0
+
+
+def _update(node: Node) -> Node:
+    node.size = 1 + _size(node.left) + _size(node.right)
+    if node.left:
+        node.left.parent = node
+    if node.right:
+        node.right.parent = node
+    return node
+
+
+def _split(node: Optional[Node], k: int) -> Tuple[Optional[Node], Optional[Node]]:
+    # first k lines go left
+    if node is None:
+        return None, None
+
+    if _size(node.left) >= k:
+        left, node.left = _split(node.left, k)
+        if left:
+            left.parent = None
+        return left, _update(node)
+
+    node.right, right = _split(node.right, k - _size(node.left) - 1)
+    if right:
+        right.parent = None
+    return _update(node), right
+
+
+def _merge(left: Optional[Node], right: Optional[Node]) -> Optional[Node]:
+    if left is None:
+        return right
+    if right is None:
+        return left
+
+    if left.priority > right.priority:
+        left.right = _merge(left.right, right)
+        return _update(left)
+
+    right.left = _merge(left, right.left)
+    return _update(right)
+
+
+class LineRope(MutableSequence[str]):
+    # Lines kept in an implicit treap: insert, delete and lookup by line number
+    # are O(log n), and every line is a Node that keeps its identity across
+    # edits, so a Node works as a stable anchor (see index_of)
+
+    def __init__(self, lines: Iterable[str] = ()) -> None:
+        self.root: Optional[Node] = None
+        self.build(lines)
+
+    def build(self, lines: Iterable[str]) -> None:
+        # Cartesian tree construction, O(n)
+        stack: List[Node] = []
+        for line in lines:
+            node = Node(line)
+            last = None
+            while stack and stack[-1].priority < node.priority:
+                last = stack.pop()
+            node.left = last
+            if stack:
+                stack[-1].right = node
+            stack.append(node)
+
+        self.root = stack[0] if stack else None
+        if self.root is None:
+            return
+
+        self.root.parent = None
+        # Post-order pass to fill in sizes and parents
+        order: List[Node] = []
+        pending = [self.root]
+        while pending:
+            node = pending.pop()
+            order.append(node)
+            if node.left:
+                pending.append(node.left)
+            if node.right:
+                pending.append(node.right)
+        for node in reversed(order):
+            _update(node)
+
+    def node_at(self, index: int) -> Node:
+        size = _size(self.root)
+        if index < 0:
+            index += size
+        if not 0 <= index < size:
+            raise IndexError("line index out of range")
+
+        node = self.root
+        while node:
+            left = _size(node.left)
+            if index < left:
+                node = node.left
+            elif index == left:
+                return node
+            else:
+                index -= left + 1
+                node = node.right
+        raise IndexError("line index out of range")
+
+    def index_of(self, node: Node) -> int:
+        index = _size(node.left)
+        while node.parent:
+            if node is node.parent.right:
+                index += _size(node.parent.left) + 1
+            node = node.parent
+
+        if node is not self.root:
+            raise ValueError("node is not in this rope")
+        return index
+
+    def __len__(self) -> int:
+        return _size(self.root)
+
+    def __iter__(self) -> Iterator[str]:
+        stack: List[Node] = []
+        node = self.root
+        while stack or node:
+            while node:
+                stack.append(node)
+                node = node.left
+            node = stack.pop()
+            yield node.value
+            node = node.right
+
+    @overload
+    def __getitem__(self, index: int) -> str: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> List[str]: ...
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[str, List[str]]:
+        if isinstance(index, slice):
+            return list(self)[index]
+        return self.node_at(index).value
+
+    def __setitem__(self, index, value) -> None:
+        if isinstance(index, slice):
+            lines = list(self)
+            lines[index] = value
+            return self.build(lines)
+        self.node_at(index).value = value
+
+    def __delitem__(self, index) -> None:
+        if isinstance(index, slice):
+            lines = list(self)
+            del lines[index]
+            return self.build(lines)
+
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("line index out of range")
+
+        left, rest = _split(self.root, index)
+        _, right = _split(rest, 1)
+        self.root = _merge(left, right)
+        if self.root:
+            self.root.parent = None
+
+    def insert(self, index: int, value: str) -> None:
+        size = len(self)
+        if index < 0:
+            index = max(0, index + size)
+        index = min(index, size)
+
+        left, right = _split(self.root, index)
+        self.root = _merge(_merge(left, Node(value)), right)
+        if self.root:
+            self.root.parent = None
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, (LineRope, list)):
+            return len(self) == len(other) and all(
+                a == b for a, b in zip(self, other)
+            )
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return "LineRope({!r})".format(list(self))
@@ -0,0 +1,276 @@
+import re
+from bisect import insort
+from typing import Dict, Iterable, List, Optional, Pattern, Tuple
+
+from .structures import Layerrule, Windowrule
+
+# windowrulev2 fields; anything else after a comma belongs to the previous
+# field's value, since regexes may contain commas
+WINDOW_PROPS = (
+    "class",
+    "title",
+    "initialClass",
+    "initialTitle",
+    "tag",
+    "xwayland",
+    "floating",
+    "fullscreen",
+    "fullscreenstate",
+    "pinned",
+    "focus",
+    "group",
+    "workspace",
+    "onworkspace",
+    "content",
+    "xdgTag",
+)
+# Matched as regexes; the rest compare as plain values
+REGEX_PROPS = {
+    "class", "title", "initialClass", "initialTitle", "tag", "xdgTag", "namespace"
+}
+# Where a window does not say otherwise
+DEFAULTS = {"initialClass": "class", "initialTitle": "title"}
+NEGATIVE = "negative:"
+
+META = set(".^$*+?{}[]|()\\")
+QUANTIFIERS = set("*+?{")
+
+
+def split_props(fields: str) -> Dict[str, str]:
+    props: Dict[str, str] = {}
+    last: Optional[str] = None
+    for part in fields.split(","):
+        name, colon, value = part.strip().partition(":")
+        if colon and name in WINDOW_PROPS:
+            last = name
+            props[name] = value.strip()
+        elif last is not None:
+            props[last] += "," + part
+    return props
+
+
+def split_top(pattern: str, start: int = 0, end: Optional[int] = None) -> List[str]:
+    # Alternatives of pattern[start:end] at nesting depth 0
+    end = len(pattern) if end is None else end
+    parts: List[str] = []
+    depth = 0
+    i = last = start
+    while i < end:
+        char = pattern[i]
+        if char == "\\":
+            i += 1
+        elif char == "[":
+            # no alternation inside a class; skip to its end
+            i = pattern.find("]", i + 2)
+            if i < 0:
+                return [pattern[start:end]]
+        elif char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+        elif char == "|" and depth == 0:
+            parts.append(pattern[last:i])
+            last = i + 1
+        i += 1
+    parts.append(pattern[last:end])
+    return parts
+
+
+def group_end(pattern: str, start: int) -> int:
+    # Index of the ')' closing the group opened at pattern[start]
+    depth = 0
+    i = start
+    while i < len(pattern):
+        char = pattern[i]
+        if char == "\\":
+            i += 1
+        elif char == "[":
+            i = pattern.find("]", i + 2)
+            if i < 0:
+                return -1
+        elif char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+            if not depth:
+                return i
+        i += 1
+    return -1
+
+
+def literal_prefixes(pattern: str, anchored: bool = False) -> Optional[List[str]]:
+    # Literal text every match of pattern starts with, one per alternative:
+    # "^(kitty|foot)$" -> ["kitty", "foot"]. None when some alternative can
+    # start with anything, which leaves the rule to the unindexed list.
+    # `anchored` says the pattern is matched from the start anyway.
+    if pattern.startswith("(?"):  # flags such as (?i) change what matches
+        return None
+
+    prefixes: List[str] = []
+    for alternative in split_top(pattern):
+        if alternative.startswith("^"):
+            alternative = alternative[1:]
+        elif not anchored:
+            return None
+
+        found = alternative_prefixes(alternative)
+        if not found:
+            return None
+        prefixes += found
+    return prefixes
+
+
+def alternative_prefixes(text: str) -> Optional[List[str]]:
+    literal: List[str] = []
+    i = 0
+    while i < len(text):
+        char = text[i]
+        if char == "\\" and i + 1 < len(text) and not text[i + 1].isalnum():
+            char, width = text[i + 1], 2
+        elif char in META:
+            break
+        else:
+            width = 1
+
+        if i + width < len(text) and text[i + width] in QUANTIFIERS:
+            # optional or repeated: the prefix stops before it
+            return ["".join(literal)] if literal else None
+        literal.append(char)
+        i += width
+
+    prefix = "".join(literal)
+    if i < len(text) and text[i] == "(" and not text.startswith("(?", i):
+        end = group_end(text, i)
+        if end < 0 or (end + 1 < len(text) and text[end + 1] in QUANTIFIERS):
+            return [prefix] if prefix else None
+        inner = [
+            alternative_prefixes(part) for part in split_top(text, i + 1, end)
+        ]
+        if any(not part for part in inner):
+            return [prefix] if prefix else None
+        return [prefix + p for part in inner for p in part]  # type: ignore
+
+    return [prefix] if prefix else None
+
+
+class Matcher:
+    # One compiled property of a rule
+    __slots__ = ("prop", "negative", "pattern", "value")
+
+    def __init__(self, prop: str, value: str, compile) -> None:
+        self.prop = prop
+        self.negative = value.startswith(NEGATIVE)
+        if self.negative:
+            value = value[len(NEGATIVE) :]
+        self.value = value
+        self.pattern: Optional[Pattern[str]] = (
+            compile(value) if prop in REGEX_PROPS else None
+        )
+
+    def test(self, window: Dict[str, str]) -> bool:
+        value = window.get(self.prop)
+        if value is None:
+            value = window.get(DEFAULTS.get(self.prop, ""), None)
+        if value is None:
+            return False
+
+        if self.pattern is None:
+            hit = str(value) == self.value
+        else:
+            hit = self.pattern.fullmatch(value) is not None
+        return hit != self.negative
+
+
+class PrefixTable:
+    # Rules by a literal prefix of one property, looked up with every prefix
+    # of the window's value that some rule uses
+    def __init__(self, prop: str) -> None:
+        self.prop = prop
+        self.table: Dict[str, List[int]] = {}
+        self.lengths: List[int] = []
+
+    def add(self, prefix: str, n: int) -> None:
+        if prefix not in self.table:
+            self.table[prefix] = []
+            if len(prefix) not in self.lengths:
+                insort(self.lengths, len(prefix))
+        self.table[prefix].append(n)
+
+    def candidates(self, value: str, found: set) -> None:
+        for length in self.lengths:
+            if length > len(value):
+                break
+            found.update(self.table.get(value[:length], ()))
+
+
+class RuleIndex:
+    # Window rules with their regexes compiled once and indexed on literal
+    # class or title prefixes, so a query only tests the rules whose prefix
+    # the window has, plus the ones with no usable prefix. Regexes are fully
+    # matched, as Hyprland does with RE2 since 0.41.
+
+    def __init__(
+        self,
+        windowrules: Iterable[Windowrule] = (),
+        layerrules: Iterable[Layerrule] = (),
+    ) -> None:
+        self.patterns: Dict[str, Pattern[str]] = {}
+        self.windowrules: List[Tuple[Windowrule, List[Matcher]]] = []
+        self.tables = {prop: PrefixTable(prop) for prop in ("class", "title")}
+        self.unindexed: List[int] = []
+        self.layerrules: List[Tuple[Layerrule, Matcher]] = []
+
+        for rule in windowrules:
+            self.add(rule)
+        for layerrule in layerrules:
+            self.layerrules.append(
+                (layerrule, Matcher("namespace", layerrule.namespace, self.compile))
+            )
+
+    def compile(self, pattern: str) -> Pattern[str]:
+        compiled = self.patterns.get(pattern)
+        if compiled is None:
+            try:
+                compiled = re.compile(pattern)
+            except re.error:
+                # Not valid here (Hyprland's RE2 is not Python's re): literal
+                compiled = re.compile(re.escape(pattern))
+            self.patterns[pattern] = compiled
+        return compiled
+
+    def add(self, rule: Windowrule) -> None:
+        n = len(self.windowrules)
+        matchers = [Matcher(prop, value, self.compile) for prop, value in rule.props.items()]
+        self.windowrules.append((rule, matchers))
+
+        for prop, table in self.tables.items():
+            matcher = next((m for m in matchers if m.prop == prop), None)
+            if matcher is None or matcher.negative:
+                continue
+            prefixes = literal_prefixes(matcher.value, anchored=True)
+            if prefixes:
+                for prefix in set(prefixes):
+                    table.add(prefix, n)
+                return
+        self.unindexed.append(n)
+
+    def candidates(self, window: Dict[str, str]) -> List[int]:
+        found = set(self.unindexed)
+        for prop, table in self.tables.items():
+            value = window.get(prop)
+            if value is not None:
+                table.candidates(value, found)
+        return sorted(found)
+
+    def match(self, window: Dict[str, str]) -> List[Windowrule]:
+        # Rules that apply to the window, in the order they are defined
+        rules = []
+        for n in self.candidates(window):
+            rule, matchers = self.windowrules[n]
+            if all(matcher.test(window) for matcher in matchers):
+                rules.append(rule)
+        return rules
+
+    def match_layer(self, namespace: str) -> List[Layerrule]:
+        window = {"namespace": namespace}
+        return [rule for rule, matcher in self.layerrules if matcher.test(window)]
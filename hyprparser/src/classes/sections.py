@@ -0,0 +1,190 @@
+from typing import (TYPE_CHECKING, Container, Dict, Iterable, Iterator, List,
+                    Optional, Sequence, Tuple, Union)
+
+if TYPE_CHECKING:
+    from .parser import Entry, File
+
+Path = Union[str, Sequence[str]]
+
+
+class SectionNode:
+    __slots__ = ("name", "path", "children", "entries", "front")
+
+    def __init__(self, name: str, path: str) -> None:
+        self.name = name
+        self.path = path  # section:subsection, "" for the top level
+        self.children: Dict[str, SectionNode] = {}
+        # Options and subsections by full path, in file order; a subsection
+        # maps to its node, an option to None
+        self.entries: Dict[str, Optional[SectionNode]] = {}
+        # Put in ahead of entries since, newest last
+        self.front: Dict[str, Optional[SectionNode]] = {}
+
+    def __contains__(self, path: str) -> bool:
+        return path in self.entries or path in self.front
+
+    def items(self) -> Iterator[Tuple[str, Optional["SectionNode"]]]:
+        yield from reversed(self.front.items())
+        yield from self.entries.items()
+
+    def __repr__(self) -> str:
+        return "SectionNode({!r}, {} entries)".format(
+            self.path, len(self.entries) + len(self.front)
+        )
+
+
+class SectionTree:
+    # Sections as they nest in the files, each holding its options and
+    # subsections in file order. A section exists once a `name {` block or
+    # an option under it (`name:option = ...`) does. Finding a section costs
+    # one dict lookup per level, walking it costs what it holds.
+
+    def __init__(self) -> None:
+        self.root = SectionNode("", "")
+        # Every node by path, so the parse adds an option with one lookup
+        self.nodes: Dict[str, SectionNode] = {"": self.root}
+
+    @staticmethod
+    def split(path: Path) -> List[str]:
+        if isinstance(path, str):
+            return path.split(":") if path else []
+        return list(path)
+
+    def node(self, path: Path) -> Optional[SectionNode]:
+        if isinstance(path, str):
+            return self.nodes.get(path)
+        node: Optional[SectionNode] = self.root
+        for name in self.split(path):
+            node = node.children.get(name)  # type: ignore
+            if node is None:
+                return None
+        return node
+
+    def __contains__(self, path: Path) -> bool:
+        return self.node(path) is not None
+
+    def add_section(self, path: Path, first: bool = False) -> SectionNode:
+        # Creates whatever is missing along the way; `first` puts a new
+        # section before everything already in its parent
+        node = self.nodes.get(path) if isinstance(path, str) else None
+        if node is not None:
+            return node
+
+        node = self.root
+        for name in self.split(path):
+            child = node.children.get(name)
+            if child is None:
+                child = SectionNode(name, name if not node.path else node.path + ":" + name)
+                node.children[name] = child
+                self.nodes[child.path] = child
+                SectionTree.place(node, child.path, child, first)
+            node = child
+        return node
+
+    def add_option(self, option: str, first: bool = False) -> None:
+        section, _, _ = option.rpartition(":")
+        node = self.nodes.get(section) or self.add_section(section, first)
+        if option not in node:
+            SectionTree.place(node, option, None, first)
+
+    @staticmethod
+    def place(
+        node: SectionNode, path: str, value: Optional[SectionNode], first: bool
+    ) -> None:
+        if first:
+            node.front[path] = value
+        else:
+            node.entries[path] = value
+
+    def insert_block(
+        self, section: str, paths: Sequence[str], options: Container[str], first: bool
+    ) -> None:
+        # Paths of a block of new lines, in order, put in just under the
+        # section's header (`first`) or at its end
+        direct = [path for path in paths if path.rpartition(":")[0] == section]
+        for path in reversed(direct) if first else direct:
+            if path in options:
+                self.add_option(path, first)
+            else:
+                self.add_section(path, first)
+        for path in paths:
+            if path in options:
+                self.add_option(path)
+            else:
+                self.add_section(path)
+
+    def add(self, entry: "Entry") -> None:
+        match entry.kind:
+            case "start-section":
+                self.add_section(entry.path)
+            case "setting":
+                self.add_option(entry.path)
+
+    @classmethod
+    def build(cls, files: Iterable["File"]) -> "SectionTree":
+        # From the parsed entries, in the order a full parse applies them:
+        # a sourced file's sections come in at its `source` line
+        tree = cls()
+        sourced: Dict[Tuple[int, ...], List["File"]] = {}
+        roots: List["File"] = []
+        for file in files:
+            (sourced.setdefault(file.origin, []) if file.origin else roots).append(file)
+
+        def visit(file: "File") -> None:
+            for entry in file.entries:
+                if entry.kind == "source":
+                    for child in sourced.get(file.origin + (entry.lineno,), ()):
+                        visit(child)
+                else:
+                    tree.add(entry)
+
+        for root in roots:
+            visit(root)
+        return tree
+
+    def options(self, path: Path = "") -> Iterator[str]:
+        # Every option under the section, subsections included, in file order
+        node = self.node(path)
+        if node is None:
+            return
+        stack = [node.items()]
+        while stack:
+            for entry, child in stack[-1]:
+                if child is None:
+                    yield entry
+                else:
+                    stack.append(child.items())
+                    break
+            else:
+                stack.pop()
+
+    def sections(self, path: Path = "") -> Iterator[str]:
+        # The section and every section below it, in file order
+        node = self.node(path)
+        if node is None:
+            return
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            if node.path:
+                yield node.path
+            stack += reversed([child for _, child in node.items() if child is not None])
+
+    def copy(self) -> "SectionTree":
+        tree = SectionTree()
+
+        def clone(node: SectionNode) -> SectionNode:
+            new = SectionNode(node.name, node.path)
+            for old, copied in ((node.entries, new.entries), (node.front, new.front)):
+                for path, child in old.items():
+                    copied[path] = None if child is None else clone(child)
+            new.children = {
+                child.name: child
+                for child in [*new.entries.values(), *new.front.values()]
+                if child is not None
+            }
+            tree.nodes[new.path] = new
+            return new
+
+        tree.root = clone(self.root)
+        return tree
@@ -0,0 +1,401 @@
+import contextlib
+import mmap
+import os
+import struct
+from typing import TYPE_CHECKING, Dict, Iterator, List, Optional, Tuple, Union
+
+from .index import BindIndex
+from .structures import Binding, Color, Env, Gradient, Setting
+
+if TYPE_CHECKING:
+    from .parser import Config
+
+# A compiled, read-only copy of a Config that other processes mmap and query
+# in place. Little-endian throughout:
+#
+#   header   magic, version, then (offset, count) of every table below
+#   blob     utf-8 strings and gradient color arrays, referenced by offset
+#   sources  every file of the tree with the mtime and size it was read at
+#   options  fixed-size records sorted by name, found by binary search
+#   envs     sorted by name, like options
+#   binds    in definition order
+#   combos   "MODS\0key" -> bind number, sorted, for get_binds
+#   dispatchers  dispatcher -> bind number, sorted
+#
+# Strings are (offset, length) pairs into the blob, so a lookup only decodes
+# the records it visits.
+
+MAGIC = b"HYPRSNAP"
+# Bump whenever the layout below changes
+SNAPSHOT_VERSION = 3
+
+TABLES = ("blob", "sources", "options", "envs", "binds", "combos", "dispatchers")
+HEADER = struct.Struct("<8sHH4x" + "QQ" * len(TABLES))
+
+SOURCE = struct.Struct("<IIqq")  # path, st_mtime_ns, st_size
+# name, kind, then a kind-specific payload: a (i32), b (u32), c (i64)
+OPTION = struct.Struct("<IIB3xiIq")
+ENV = struct.Struct("<IIII")  # name, value items
+BIND = struct.Struct("<" + "II" * 5)  # bindtype, mods, key, dispatcher, params
+KEY = struct.Struct("<III")  # key string, bind number
+COLOR = struct.Struct("<I")
+DOUBLE = struct.Struct("<d")
+INT64 = struct.Struct("<q")
+
+# bigint: an int outside int64, kept as its decimal text
+KINDS = ("bool", "int", "float", "color", "gradient", "str", "bigint")
+# Bind params and env values may hold commas and colons, so each item is
+# prefixed with a unit separator instead: no items and one empty item
+# encode differently
+ITEM_SEP = "\x1f"
+
+
+def join_items(items: List[str]) -> str:
+    return "".join(ITEM_SEP + item for item in items)
+
+
+def split_items(text: str) -> List[str]:
+    return text.split(ITEM_SEP)[1:]
+
+
+class SnapshotError(ValueError):
+    pass
+
+
+class SnapshotWriter:
+    def __init__(self) -> None:
+        self.blob = bytearray()
+        self.strings: Dict[str, Tuple[int, int]] = {}
+
+    def string(self, text: str) -> Tuple[int, int]:
+        ref = self.strings.get(text)
+        if ref is None:
+            data = text.encode()
+            ref = self.strings[text] = (len(self.blob), len(data))
+            self.blob += data
+        return ref
+
+    def option(self, setting: Setting) -> bytes:
+        value = setting.value
+        name = self.string(setting.option)
+
+        if isinstance(value, bool):
+            return OPTION.pack(*name, 0, 0, 0, value)
+        if isinstance(value, int):
+            if -(2**63) <= value < 2**63:
+                return OPTION.pack(*name, 1, 0, 0, value)
+            offset, length = self.string(str(value))
+            return OPTION.pack(*name, 6, 0, length, offset)
+        if isinstance(value, float):
+            return OPTION.pack(*name, 2, 0, 0, *INT64.unpack(DOUBLE.pack(value)))
+        if isinstance(value, Color):
+            return OPTION.pack(*name, 3, 0, 0, value.rgba)
+        if isinstance(value, Gradient):
+            offset = len(self.blob)
+            for color in value.colors:
+                self.blob += COLOR.pack(color.rgba)
+            return OPTION.pack(*name, 4, value.angle, len(value.colors), offset)
+
+        offset, length = self.string(str(value))
+        return OPTION.pack(*name, 5, 0, length, offset)
+
+    def keys(self, keys: List[Tuple[str, int]]) -> bytes:
+        # Sorted as the reader compares them: by utf-8 bytes, then bind number
+        encoded = sorted((key.encode(), key, n) for key, n in keys)
+        return b"".join(KEY.pack(*self.string(key), n) for _, key, n in encoded)
+
+    def build(self, config: "Config") -> bytes:
+        sources: Dict[str, None] = {}
+        for file in config.files:
+            sources.setdefault(os.path.realpath(os.path.expandvars(file.path)))
+
+        tables: Dict[str, Tuple[bytes, int]] = {}
+        records = []
+        for path in sources:
+            try:
+                st = os.stat(path)
+                mtime, size = st.st_mtime_ns, st.st_size
+            except OSError:
+                mtime, size = -1, -1
+            records.append(SOURCE.pack(*self.string(path), mtime, size))
+        tables["sources"] = (b"".join(records), len(records))
+
+        settings = sorted(config.config.values(), key=lambda s: s.option.encode())
+        tables["options"] = (b"".join(map(self.option, settings)), len(settings))
+
+        envs = sorted(config.env.values(), key=lambda e: e.name.encode())
+        tables["envs"] = (
+            b"".join(
+                ENV.pack(*self.string(env.name), *self.string(join_items(env.value)))
+                for env in envs
+            ),
+            len(envs),
+        )
+
+        combos: List[Tuple[str, int]] = []
+        dispatchers: List[Tuple[str, int]] = []
+        records = []
+        for n, bind in enumerate(config.binds):
+            records.append(
+                BIND.pack(
+                    *self.string(bind.bindtype),
+                    *self.string(" ".join(bind.mods)),
+                    *self.string(bind.key),
+                    *self.string(bind.dispatcher),
+                    *self.string(join_items(bind.params)),
+                )
+            )
+            # Modifiers resolved through the config's variables, as get_binds does
+            combos.append((combo_key(*config.bind_index.combo(bind)), n))
+            dispatchers.append((bind.dispatcher.lower(), n))
+        tables["binds"] = (b"".join(records), len(records))
+        tables["combos"] = (self.keys(combos), len(combos))
+        tables["dispatchers"] = (self.keys(dispatchers), len(dispatchers))
+
+        # The blob is complete only now, and goes first
+        tables = {"blob": (bytes(self.blob), len(self.blob)), **tables}
+
+        layout: List[int] = []
+        offset = HEADER.size
+        for name in TABLES:
+            data, count = tables[name]
+            layout += [offset, count]
+            offset += len(data)
+
+        return b"".join(
+            [
+                HEADER.pack(MAGIC, SNAPSHOT_VERSION, 0, *layout),
+                *(tables[name][0] for name in TABLES),
+            ]
+        )
+
+
+def combo_key(mods, key: str) -> str:
+    return "{}\0{}".format(" ".join(sorted(mods)), key)
+
+
+def write_snapshot(config: "Config", path: str) -> None:
+    # Readers either keep the old file mapped or open the new one, never a
+    # half-written one: write a sibling and rename it over the target
+    data = SnapshotWriter().build(config)
+    path = os.path.realpath(os.path.expandvars(path))
+    tmp = "{}.{}.tmp".format(path, os.urandom(16).hex())
+
+    try:
+        with open(tmp, "wb") as file:
+            file.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.unlink(tmp)
+        raise
+
+
+class SnapshotFile:
+    def __init__(self, path: str) -> None:
+        self.path = os.path.realpath(os.path.expandvars(path))
+        self.mm: Optional[mmap.mmap] = None
+        self.open()
+
+    def open(self) -> None:
+        with open(self.path, "rb") as file:
+            self.stat = os.fstat(file.fileno())
+            if self.stat.st_size < HEADER.size:
+                raise SnapshotError("Not a snapshot: {}".format(self.path))
+            mm = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, _, *layout = HEADER.unpack_from(mm)
+        if magic != MAGIC or version != SNAPSHOT_VERSION:
+            mm.close()
+            raise SnapshotError(
+                "Unsupported snapshot {}: version {}".format(self.path, version)
+            )
+
+        self.close()
+        self.mm = mm
+        self.tables = {
+            name: (layout[2 * i], layout[2 * i + 1]) for i, name in enumerate(TABLES)
+        }
+        self.blob = self.tables["blob"][0]
+
+    def close(self) -> None:
+        if self.mm is not None:
+            self.mm.close()
+            self.mm = None
+
+    def __enter__(self) -> "SnapshotFile":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+
+    def reopen(self) -> bool:
+        # Map the current file if it was regenerated since it was opened
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return False
+        if (st.st_ino, st.st_mtime_ns) == (self.stat.st_ino, self.stat.st_mtime_ns):
+            return False
+        self.open()
+        return True
+
+    def record(self, table: str, fmt: struct.Struct, n: int) -> Tuple:
+        offset, _ = self.tables[table]
+        return fmt.unpack_from(self.mm, offset + n * fmt.size)  # type: ignore
+
+    def count(self, table: str) -> int:
+        return self.tables[table][1]
+
+    def text(self, offset: int, length: int) -> str:
+        start = self.blob + offset
+        return self.mm[start : start + length].decode()  # type: ignore
+
+    def raw(self, offset: int, length: int) -> bytes:
+        start = self.blob + offset
+        return self.mm[start : start + length]  # type: ignore
+
+    def search(self, table: str, fmt: struct.Struct, key: bytes) -> int:
+        # Leftmost record whose name (its first string) is not below key
+        lo, hi = 0, self.count(table)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            offset, length = self.record(table, fmt, mid)[:2]
+            if self.raw(offset, length) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def find(self, table: str, fmt: struct.Struct, name: str) -> Optional[Tuple]:
+        key = name.encode()
+        n = self.search(table, fmt, key)
+        if n < self.count(table):
+            record = self.record(table, fmt, n)
+            if self.raw(*record[:2]) == key:
+                return record
+        return None
+
+    def sources(self) -> List[Tuple[str, int, int]]:
+        return [
+            (self.text(offset, length), mtime, size)
+            for offset, length, mtime, size in (
+                self.record("sources", SOURCE, n) for n in range(self.count("sources"))
+            )
+        ]
+
+    def stale(self) -> bool:
+        # True once any file the snapshot was compiled from changed on disk
+        for path, mtime, size in self.sources():
+            try:
+                st = os.stat(path)
+            except OSError:
+                return True
+            if (st.st_mtime_ns, st.st_size) != (mtime, size):
+                return True
+        return False
+
+    def decode(self, record: Tuple) -> Union[Gradient, Color, str, int, float, bool]:
+        _, _, kind, a, b, c = record
+        match KINDS[kind]:
+            case "bool":
+                return bool(c)
+            case "int":
+                return c
+            case "float":
+                return DOUBLE.unpack(INT64.pack(c))[0]
+            case "color":
+                return Color.from_int(c)
+            case "gradient":
+                start = self.blob + c
+                colors = struct.unpack_from("<{}I".format(b), self.mm, start)  # type: ignore
+                return Gradient(a, list(map(Color.from_int, colors)))
+            case "bigint":
+                return int(self.text(c, b))
+        return self.text(c, b)
+
+    def get_option(self, option: str) -> Optional[Setting]:
+        record = self.find("options", OPTION, option)
+        if record is None:
+            return None
+        return Setting(option, self.decode(record))
+
+    def options(self) -> Iterator[str]:
+        for n in range(self.count("options")):
+            yield self.text(*self.record("options", OPTION, n)[:2])
+
+    def get_env(self, env_name: str) -> Optional[Env]:
+        record = self.find("envs", ENV, env_name)
+        if record is None:
+            return None
+        return Env(env_name, split_items(self.text(*record[2:])))
+
+    def envs(self) -> Iterator[str]:
+        for n in range(self.count("envs")):
+            yield self.text(*self.record("envs", ENV, n)[:2])
+
+    def bind(self, n: int) -> Binding:
+        refs = self.record("binds", BIND, n)
+        bindtype, mods, key, dispatcher, params = (
+            self.text(refs[i], refs[i + 1]) for i in range(0, len(refs), 2)
+        )
+        return Binding(
+            mods.split(),
+            key,
+            dispatcher,
+            split_items(params),
+            bindtype,
+        )
+
+    def binds(self) -> Iterator[Binding]:
+        for n in range(self.count("binds")):
+            yield self.bind(n)
+
+    def lookup(self, table: str, key: str) -> List[int]:
+        encoded = key.encode()
+        found = []
+        n = self.search(table, KEY, encoded)
+        while n < self.count(table):
+            offset, length, bind = self.record(table, KEY, n)
+            if self.raw(offset, length) != encoded:
+                break
+            found.append(bind)
+            n += 1
+        return found
+
+    def get_binds(self, combo: str, bindtype: Optional[str] = None) -> List[Binding]:
+        # Same "MODS, key" form as Config.get_binds; `$variables` in mods are
+        # not resolved here, the snapshot keeps no variables
+        mods, key, *_ = map(str.strip, combo.split(",") + [""])
+        index = BindIndex()
+        binds = map(
+            self.bind,
+            self.lookup(
+                "combos", combo_key(index.normalize_mods(mods), index.normalize_key(key))
+            ),
+        )
+        # Grouped by flags in first-seen order, as BindIndex.find returns them
+        groups: Dict[str, List[Binding]] = {}
+        for bind in binds:
+            groups.setdefault(BindIndex.flags(bind.bindtype), []).append(bind)
+        if bindtype is None:
+            return [bind for group in groups.values() for bind in group]
+        return groups.get(BindIndex.flags(bindtype), [])
+
+    def get_dispatcher_binds(self, dispatcher: str) -> List[Binding]:
+        return list(map(self.bind, self.lookup("dispatchers", dispatcher.lower())))
+
+
+def open_snapshot(path: str, config_path: Optional[str] = None) -> SnapshotFile:
+    # Map the snapshot at path, first compiling it from the config at
+    # config_path if it is missing, unreadable or older than its sources
+    from .parser import DEFAULT_PATH, Config
+
+    with contextlib.suppress(OSError, SnapshotError):
+        snapshot = SnapshotFile(path)
+        if not snapshot.stale():
+            return snapshot
+        snapshot.close()
+
+    write_snapshot(Config.load(config_path or DEFAULT_PATH), path)
+    return SnapshotFile(path)
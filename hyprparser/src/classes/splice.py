@@ -0,0 +1,205 @@
+from bisect import bisect_left, insort
+from operator import itemgetter
+from typing import (TYPE_CHECKING, Any, Dict, Iterator, List, Optional, Set,
+                    Tuple)
+
+if TYPE_CHECKING:
+    from .parser import Config, File
+
+# Where a record sits in evaluation order: the line numbers of the `source`
+# lines leading to its file, then its own line. Comparing these tuples gives
+# the order a full parse would have applied them in.
+Order = Tuple[float, ...]
+
+END = float("inf")
+
+LISTS = {
+    "bind": "binds",
+    "variable": "variables",
+    "exec": "exec",
+    "monitor": "monitors",
+    "windowrule": "windowrules",
+    "windowrulev2": "windowrules",
+    "layerrule": "layerrules",
+}
+
+
+def within(order: Order, origin: Order) -> bool:
+    # Strictly inside: the `source` line at `origin` itself belongs to the parent
+    return len(order) > len(origin) and order[: len(origin)] == origin
+
+
+class OrderedList:
+    # Order keys kept side by side with one of the Config list models
+    def __init__(self, items: List[Tuple[Order, Any]]) -> None:
+        items.sort(key=itemgetter(0))
+        self.orders: List[Order] = [order for order, _ in items]
+
+    def splice(
+        self, model: List[Any], origin: Order, items: List[Tuple[Order, Any]]
+    ) -> bool:
+        lo = bisect_left(self.orders, origin)
+        hi = bisect_left(self.orders, origin + (END,))
+
+        items.sort(key=itemgetter(0))
+        self.orders[lo:hi] = [order for order, _ in items]
+        model[lo:hi] = [value for _, value in items]
+        return hi > lo or bool(items)
+
+
+class Definers:
+    # Every definition of every key, in evaluation order
+    def __init__(self) -> None:
+        self.table: Dict[str, List[Tuple[Order, Any]]] = {}
+
+    def add(self, key: str, order: Order, value: Any) -> None:
+        insort(self.table.setdefault(key, []), (order, value), key=itemgetter(0))
+
+    def drop(self, key: str, origin: Order) -> None:
+        definers = self.table.get(key, [])
+        definers[:] = [item for item in definers if not within(item[0], origin)]
+        if not definers:
+            self.table.pop(key, None)
+
+    def first_order(self, key: str) -> Optional[Order]:
+        definers = self.table.get(key)
+        return definers[0][0] if definers else None
+
+    def first(self, key: str) -> Optional[Any]:
+        definers = self.table.get(key)
+        return definers[0][1] if definers else None
+
+    def last(self, key: str) -> Optional[Any]:
+        definers = self.table.get(key)
+        return definers[-1][1] if definers else None
+
+
+def contributions(file: "File") -> Iterator[Tuple[str, str, Order, Any]]:
+    for entry in file.entries:
+        order = file.origin + (entry.lineno,)
+        yield "options", entry.path, order, (file, entry.lineno)
+
+        match entry.kind:
+            case "setting":
+                yield "config", entry.value.option, order, entry.value
+            case "env":
+                yield "env", entry.value.name, order, entry.value
+                yield "envs", entry.value.name, order, (file, entry.lineno)
+            case "bezier":
+                yield "beziers", entry.value.name, order, entry.value
+                yield "bezier_lines", entry.value.name, order, (file, entry.lineno)
+            case "variable":
+                yield "variables", "", order, entry.value
+                yield "variable_lines", entry.value.name, order, (file, entry.lineno)
+            case kind if kind in LISTS:
+                yield LISTS[kind], "", order, entry.value
+
+
+class SpliceState:
+    # Last-wins model dicts, first-wins line index tables but for the
+    # variables one, which points at the definition in effect
+    MODELS = ("config", "env", "beziers")
+    INDEXES = {
+        "options": "options",
+        "envs": "envs",
+        "bezier_lines": "beziers",
+        "variable_lines": "variables",
+    }
+    LAST_WINS = {"variable_lines"}
+
+    def __init__(self, files: List["File"]) -> None:
+        self.definers = {
+            table: Definers() for table in [*self.MODELS, *self.INDEXES]
+        }
+        items: Dict[str, List[Tuple[Order, Any]]] = {
+            attr: [] for attr in set(LISTS.values())
+        }
+
+        for file in files:
+            for table, key, order, value in contributions(file):
+                if table in items:
+                    items[table].append((order, value))
+                else:
+                    self.definers[table].add(key, order, value)
+
+        self.lists = {attr: OrderedList(values) for attr, values in items.items()}
+
+    def splice(
+        self,
+        config: "Config",
+        origin: Order,
+        old: List["File"],
+        new: List["File"],
+    ) -> Set[str]:
+        # Swap the records of the files in `old` for those in `new`, all of
+        # them under `origin`; returns the names of the lists that changed
+        touched: Dict[str, Set[str]] = {table: set() for table in self.definers}
+        items: Dict[str, List[Tuple[Order, Any]]] = {attr: [] for attr in self.lists}
+
+        for file in old:
+            for table, key, _, _ in contributions(file):
+                if table in touched:
+                    touched[table].add(key)
+        added: List[Tuple[str, str, Order, Any]] = []
+        for file in new:
+            for table, key, order, value in contributions(file):
+                if table in items:
+                    items[table].append((order, value))
+                else:
+                    added.append((table, key, order, value))
+                    touched[table].add(key)
+
+        # Where each key's first definition was, to tell if it moved
+        firsts = {
+            table: {key: self.definers[table].first_order(key) for key in touched[table]}
+            for table in self.MODELS
+        }
+        for table, keys in touched.items():
+            for key in keys:
+                self.definers[table].drop(key, origin)
+        for table, key, order, value in added:
+            self.definers[table].add(key, order, value)
+
+        changed = {
+            attr
+            for attr, ordered in self.lists.items()
+            if ordered.splice(getattr(config, attr), origin, items[attr])
+        }
+
+        for table in self.MODELS:
+            model = getattr(config, table)
+            moved = False
+            for key in touched[table]:
+                value = self.definers[table].last(key)
+                if value is None:
+                    model.pop(key, None)
+                else:
+                    model[key] = value
+                    moved |= self.definers[table].first_order(key) != firsts[table][key]
+            if moved:
+                self.reorder(model, self.definers[table])
+
+        for table, name in self.INDEXES.items():
+            index = getattr(config.index, name)
+            for key in touched[table]:
+                definers = self.definers[table]
+                winner = definers.last(key) if table in self.LAST_WINS else definers.first(key)
+                if winner is None:
+                    index.pop(key, None)
+                    continue
+
+                file, line_n = winner
+                anchor = index.get(key)
+                if anchor is None or anchor.file is not file or anchor.line != line_n:
+                    index[key] = file.anchor(line_n)
+
+        return changed
+
+    @staticmethod
+    def reorder(model: Dict[str, Any], definers: Definers) -> None:
+        # A full parse leaves each key where its first definition put it; a
+        # key that gained an earlier one, or is new, moves to match
+        keys = sorted(model, key=lambda key: definers.first_order(key) or (END,))
+        values = [model[key] for key in keys]
+        model.clear()
+        model.update(zip(keys, values))
@@ -0,0 +1,123 @@
+from collections import Counter
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Union
+
+if TYPE_CHECKING:
+    from .parser import Entry, File
+
+# Events callbacks can be registered for, and what they are called with:
+#   file     FileStats           a file was read and parsed (or taken from cache)
+#   unknown  File | None, Entry  a line that is none of the known line types
+#   lookup   str, str, bool      table, name, whether the index had it
+#   save     str, int            path, bytes written
+#   reload   float               seconds a full or incremental reload took
+EVENTS = ("file", "unknown", "lookup", "save", "reload")
+
+
+@dataclass(slots=True)
+class FileStats:
+    path: str
+    read_s: float
+    parse_s: float
+    lines: int
+    entries: int
+    cached: bool
+
+
+class Stats:
+    # Opt-in: Config.stats is None unless one is passed in, and every hook
+    # in the parser is a single `is not None` check in that case
+
+    def __init__(self) -> None:
+        self.files: List[FileStats] = []
+        # entries per LineType ("unknown" included); lines that made no
+        # entry, such as comments, blank lines and closing braces, are "skipped"
+        self.lines: Counter = Counter()
+        # setting values by what they decoded to: bool, int, float, color, ...
+        self.decodes: Counter = Counter()
+        # index lookups per table, and the ones that found nothing
+        self.lookups: Counter = Counter()
+        self.misses: Counter = Counter()
+        self.saves = 0
+        self.saved_bytes = 0
+        self.reloads: List[float] = []
+        self.callbacks: Dict[str, List[Callable[..., Any]]] = {e: [] for e in EVENTS}
+
+    def on(self, event: str, callback: Callable[..., Any]) -> Callable[..., Any]:
+        if event not in self.callbacks:
+            raise ValueError(
+                "Unknown event {!r}, expected one of {}".format(event, ", ".join(EVENTS))
+            )
+        self.callbacks[event].append(callback)
+        return callback
+
+    def off(self, event: str, callback: Callable[..., Any]) -> None:
+        self.callbacks[event].remove(callback)
+
+    def emit(self, event: str, *args: Any) -> None:
+        for callback in self.callbacks[event]:
+            callback(*args)
+
+    def reset(self) -> None:
+        callbacks = self.callbacks
+        self.__init__()
+        self.callbacks = callbacks
+
+    def file(self, file: "File") -> None:
+        read_s, parse_s, cached = file.timings or (0.0, 0.0, False)
+        stats = FileStats(
+            file.path, read_s, parse_s, len(file.content), len(file.entries), cached
+        )
+        self.files.append(stats)
+
+        for entry in file.entries:
+            self.lines[entry.kind] += 1
+            if entry.kind == "setting":
+                self.decodes[type(entry.value.value).__name__.lower()] += 1
+        self.lines["skipped"] += stats.lines - stats.entries
+        self.emit("file", stats)
+
+    def unknown(self, file: Optional["File"], entry: "Entry") -> None:
+        self.emit("unknown", file, entry)
+
+    def lookup(self, table: str, name: Union[str, List[str]], found: bool) -> None:
+        self.lookups[table] += 1
+        if not found:
+            self.misses[table] += 1
+        if self.callbacks["lookup"]:
+            if not isinstance(name, str):
+                name = ":".join(name)
+            self.emit("lookup", table, name, found)
+
+    def save(self, file: "File") -> None:
+        size = len("".join([line + "\n" for line in file.content]).encode())
+        self.saves += 1
+        self.saved_bytes += size
+        self.emit("save", file.path, size)
+
+    def reload(self, seconds: float) -> None:
+        self.reloads.append(seconds)
+        self.emit("reload", seconds)
+
+    @property
+    def read_s(self) -> float:
+        return sum(file.read_s for file in self.files)
+
+    @property
+    def parse_s(self) -> float:
+        return sum(file.parse_s for file in self.files)
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "files": len(self.files),
+            "read_s": self.read_s,
+            "parse_s": self.parse_s,
+            "cached": sum(file.cached for file in self.files),
+            "reloads": list(self.reloads),
+            "lines": dict(self.lines),
+            "decodes": dict(self.decodes),
+            "lookups": dict(self.lookups),
+            "misses": dict(self.misses),
+            "saves": self.saves,
+            "saved_bytes": self.saved_bytes,
+        }
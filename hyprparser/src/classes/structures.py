@@ -1,8 +1,42 @@
-from dataclasses import dataclass
-from typing import Any, Dict, List, Tuple, Union
-
-
-@dataclass
+import re
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Any, Dict, List, Match, Optional, Tuple, Union
+
+BOOLS = {
+    'on': True,
+    'yes': True,
+    'true': True,
+    'off': False,
+    'no': False,
+    'false': False,
+}
+
+INT = re.compile(r'-?\d+')
+FLOAT = re.compile(r'-?(?:\d+\.\d*|\.\d+)')
+# rgba(RRGGBBAA), rgb(RRGGBB) or the legacy 0xAARRGGBB
+COLOR = re.compile(
+    r'rgba?\((?P<rgba>[0-9a-fA-F]{8}|[0-9a-fA-F]{6})\)'
+    r'|0x(?P<argb>[0-9a-fA-F]{8}|[0-9a-fA-F]{6})'
+)
+ANY_COLOR = re.sub(r'\(\?P<\w+>', '(?:', COLOR.pattern)
+# One color, or a gradient: colors and an optional angle
+COLORS = re.compile(
+    r'(?:{color})(?:\s+(?:{color}))*(?:\s+(?P<angle>-?\d+)deg)?'.format(color=ANY_COLOR)
+)
+# Every type decode tells apart, in one pattern: the group that matched
+# names it. A gradient's colors are converted from its text afterwards,
+# so it needs no second pass to find them.
+VALUE = re.compile(
+    r'(?P<int>{})|(?P<float>{})|(?P<color>{})|(?P<gradient>{})'.format(
+        INT.pattern, FLOAT.pattern, COLOR.pattern, COLORS.pattern
+    )
+)
+# What a value VALUE can match starts with, besides other Unicode digits
+VALUE_STARTS = frozenset('0123456789-.r')
+
+
+@dataclass(slots=True)
 class Setting:
     option: str
     value: Union['Gradient', 'Color', str, int, float, bool]
@@ -29,7 +63,7 @@ class Setting:
         }
 
 
-@dataclass
+@dataclass(slots=True)
 class Exec:
     cmd: str
     exec_once: bool = False
@@ -43,19 +77,52 @@ class Exec:
         return {'cmd': self.cmd, 'exec-once': self.exec_once}
 
 
-@dataclass
+@dataclass(slots=True)
 class Windowrule:
     rule: str
     window: str
     rule_args: str = ''
+    # What the rule matches on, e.g. {'class': '^(kitty)$', 'floating': '1'};
+    # a windowrule's plain regex is its 'class'
+    props: Dict[str, str] = field(default_factory=dict)
+    v2: bool = False
+
+    def format(self) -> str:
+        return '{} = {}, {}'.format(
+            'windowrulev2' if self.v2 else 'windowrule',
+            ' '.join(filter(None, [self.rule, str(self.rule_args)])),
+            self.window,
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'rule': self.rule,
+            'rule_args': self.rule_args,
+            'window': self.window,
+            'props': self.props,
+        }
+
+
+@dataclass(slots=True)
+class Layerrule:
+    rule: str
+    namespace: str
+    rule_args: str = ''
 
     def format(self) -> str:
-        return 'windowrule = {}, {}'.format(
-            ' '.join([self.rule, str(self.rule_args)]), self.window
+        return 'layerrule = {}, {}'.format(
+            ' '.join(filter(None, [self.rule, str(self.rule_args)])), self.namespace
         )
 
+    def to_dict(self) -> Dict[str, str]:
+        return {
+            'rule': self.rule,
+            'rule_args': self.rule_args,
+            'namespace': self.namespace,
+        }
 
-@dataclass
+
+@dataclass(slots=True)
 class Bezier:
     name: str
     transition: Tuple[float, float, float, float]
@@ -69,16 +136,45 @@ class Bezier:
         return {'name': self.name, 'transition': self.transition}
 
 
-@dataclass
+class Channel:
+    # One byte of Color.rgba, read and written as two hex digits
+    def __init__(self, shift: int) -> None:
+        self.shift = shift
+
+    def __get__(self, color: Optional['Color'], owner: Any = None) -> Any:
+        if color is None:
+            return self
+        return '{:02x}'.format((color.rgba >> self.shift) & 0xFF)
+
+    def __set__(self, color: 'Color', value: str) -> None:
+        byte = int(value, 16)
+        if not 0 <= byte <= 0xFF:
+            raise ValueError('Invalid color channel: {!r}'.format(value))
+        color.rgba = (color.rgba & ~(0xFF << self.shift)) | (byte << self.shift)
+
+
+@dataclass(slots=True, init=False, repr=False)
 class Color:
-    r: str
-    g: str
-    b: str
-    a: str = 'ff'
+    rgba: int  # 0xRRGGBBAA
+
+    r = Channel(24)
+    g = Channel(16)
+    b = Channel(8)
+    a = Channel(0)
+
+    def __init__(self, r: str, g: str, b: str, a: str = 'ff') -> None:
+        self.rgba = 0
+        self.r, self.g, self.b, self.a = r, g, b, a or 'ff'
+
+    @classmethod
+    def from_int(cls, rgba: int) -> 'Color':
+        color = cls.__new__(cls)
+        color.rgba = rgba & 0xFFFFFFFF
+        return color
 
     @property
     def hex(self) -> str:
-        return '{}{}{}{}'.format(self.r, self.g, self.b, self.a)
+        return '{:08x}'.format(self.rgba)
 
     def format(self) -> str:
         return 'rgba({})'.format(self.hex)
@@ -87,7 +183,7 @@ class Color:
         return self.format()
 
 
-@dataclass
+@dataclass(slots=True)
 class Gradient:
     angle: int
     colors: List[Color]
@@ -115,7 +211,7 @@ class Gradient:
         )
 
 
-@dataclass
+@dataclass(slots=True)
 class Variable:
     name: str = ''
     value: str = ''
@@ -130,7 +226,7 @@ class Variable:
         }
 
 
-@dataclass
+@dataclass(slots=True)
 class Env:
     name: str
     value: List[str]
@@ -142,7 +238,7 @@ class Env:
         return {'name': self.name, 'value': self.value}
 
 
-@dataclass
+@dataclass(slots=True)
 class Monitor:
     name: str = ''
     resolution: str = 'preferred'
@@ -163,13 +259,13 @@ class Monitor:
         }
 
 
-@dataclass
+@dataclass(slots=True)
 class Binding:
     mods: List[str]
     key: str
     dispatcher: str
     params: List[str]
-    bindtype: str = 'e'
+    bindtype: str = 'bind'
 
     def format(self) -> str:
         return '{} = {}'.format(
@@ -197,34 +293,25 @@ class Binding:
 class TypeParser:
     @staticmethod
     def is_bool(value: str) -> bool:
-        if value in ['on', 'yes', 'true', 'off', 'no', 'false']:
-            return True
-        return False
+        return value in BOOLS
 
     @staticmethod
     def to_bool(value: str) -> bool:
-        if value in ['on', 'yes', 'true']:
-            return True
-        elif value in ['off', 'no', 'false']:
-            return False
+        if value in BOOLS:
+            return BOOLS[value]
         raise Exception('Invalid Data-type')
 
-    #! TODO: Use regex to check if a str can be a int
     @staticmethod
     def is_int(value: str) -> bool:
-        if value.startswith('-'):
-            return TypeParser.is_int(value[1:])
-        return value.isdecimal()
+        return INT.fullmatch(value) is not None
 
     @staticmethod
     def to_int(value: str) -> int:
         return int(value)
 
-    #! TODO: Use regex to check if a str can be a float
-    # https://www.geeksforgeeks.org/python-check-for-float-string/
     @staticmethod
     def is_float(value: str) -> bool:
-        return TypeParser.is_int(value.replace('.', ''))
+        return FLOAT.fullmatch(value) is not None or TypeParser.is_int(value)
 
     @staticmethod
     def to_float(value: str) -> float:
@@ -232,43 +319,102 @@ class TypeParser:
 
     @staticmethod
     def is_color(value: str) -> bool:
-        if len(value.split()) != 1:
-            return False
-
-        if any(map(value.startswith, ['rgba', 'rgb', '0x'])):
-            return True
-
-        return False
+        return COLOR.fullmatch(value) is not None
 
     @staticmethod
     def to_color(value: str) -> Color:
-        for p in ['rgba(', 'rgb', '0x', '#']:
-            value = value.removeprefix(p)
-        value = value.removesuffix(')')
-        r = value[0:2]
-        g = value[2:4]
-        b = value[4:6]
-        a = value[6:8]
-        return Color(r, g, b, a)
+        match = COLOR.fullmatch(value)
+        if match is None:
+            raise ValueError('Invalid color: {!r}'.format(value))
+        return Color.from_int(TypeParser.color_int(match))
 
     @staticmethod
-    def is_gradient(value: str) -> bool:
-        gradients = value.split()
+    def color_int(match: Match[str]) -> int:
+        rgba, argb = match.group('rgba', 'argb')
+        if rgba is not None:
+            return int(rgba, 16) if len(rgba) == 8 else int(rgba, 16) << 8 | 0xFF
+        if len(argb) == 6:
+            return int(argb, 16) << 8 | 0xFF
+        # 0xAARRGGBB
+        value = int(argb, 16)
+        return (value & 0xFFFFFF) << 8 | value >> 24
 
-        if not gradients:
-            return False
-        if gradients[-1].endswith('deg'):
-            gradients = gradients[:-1]
+    @staticmethod
+    def token_int(token: str) -> int:
+        # One color of a gradient VALUE has already accepted
+        if token[0] == '0':
+            digits = token[2:]
+            if len(digits) == 6:
+                return int(digits, 16) << 8 | 0xFF
+            # 0xAARRGGBB
+            argb = int(digits, 16)
+            return (argb & 0xFFFFFF) << 8 | argb >> 24
+        digits = token[token.index('(') + 1 : -1]
+        return int(digits, 16) if len(digits) == 8 else int(digits, 16) << 8 | 0xFF
 
-        return all(map(TypeParser.is_color, gradients))
+    @staticmethod
+    def is_gradient(value: str) -> bool:
+        return COLORS.fullmatch(value) is not None
 
     @staticmethod
     def to_gradient(value: str) -> Gradient:
-        gradients = value.split()
+        kind, data = TypeParser.classify(value)
+        if kind not in ('color', 'gradient'):
+            raise ValueError('Invalid gradient: {!r}'.format(value))
+        angle, colors = data
+        return Gradient(angle, list(map(Color.from_int, colors)))
 
-        if gradients[-1].endswith('deg'):
-            angle = TypeParser.to_int(gradients.pop(-1).removesuffix('deg'))
-        else:
-            angle = 0
+    @staticmethod
+    def decode(value: str) -> Union['Gradient', 'Color', str, int, float, bool]:
+        # Bools and plain numbers take less to check with str methods than
+        # to look up in the cache or match; the rest is one cached match
+        if value in BOOLS:
+            return BOOLS[value]
+        digits = value[1:] if value[:1] == '-' else value
+        if digits.isdecimal():
+            return int(value)
+        whole, dot, fraction = digits.partition('.')
+        if dot and (whole + fraction).isdecimal():
+            return float(value)
+        if not TypeParser.may_match(value):
+            return value
+
+        kind, data = TypeParser.classify(value)
+
+        match kind:
+            case 'color':
+                return Color.from_int(data[1][0])
+            case 'gradient':
+                angle, colors = data
+                return Gradient(angle, list(map(Color.from_int, colors)))
+        return data
+
+    @staticmethod
+    def may_match(value: str) -> bool:
+        # Whether VALUE can match at all: a number, rgb(a)( or 0x
+        first = value[:1]
+        return first in VALUE_STARTS or first.isdecimal()
 
-        return Gradient(angle, list(map(TypeParser.to_color, gradients)))
+    @staticmethod
+    @lru_cache(maxsize=4096)
+    def classify(value: str) -> Tuple[str, Any]:
+        # Cached per literal, so only immutable results: colors are kept as
+        # packed ints and turned into fresh objects by decode. Bools and
+        # plain numbers rarely get here: decode answers those itself
+        match = VALUE.fullmatch(value)
+        if match is None:
+            return 'str', value
+
+        kind = match.lastgroup
+        if kind == 'int':
+            return 'int', int(value)
+        if kind == 'float':
+            return 'float', float(value)
+        if kind == 'color':
+            return 'color', (0, (TypeParser.color_int(match),))
+
+        angle = match.group('angle')
+        tokens = value.split()
+        if angle is not None:
+            tokens.pop()
+        return 'gradient', (int(angle or 0), tuple(map(TypeParser.token_int, tokens)))
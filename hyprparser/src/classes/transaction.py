@@ -0,0 +1,113 @@
+from typing import TYPE_CHECKING, Dict, List
+
+if TYPE_CHECKING:
+    from .parser import Config, File
+
+
+class Snapshot:
+    def __init__(self, config: "Config") -> None:
+        self.files = list(config.files)
+        self.contents = [list(file.content) for file in config.files]
+        self.anchors = [
+            [(anchor, anchor.line) for anchor in file.anchors] for file in config.files
+        ]
+
+        self.monitors = list(config.monitors)
+        self.binds = list(config.binds)
+        self.variables = [(v, v.value) for v in config.variables]
+        self.exec = list(config.exec)
+        self.windowrules = list(config.windowrules)
+        self.layerrules = list(config.layerrules)
+        self.sections = config._sections.copy() if config._sections is not None else None
+
+        # Setters mutate these records in place, so keep their values too
+        self.config = {k: (v, v.value) for k, v in config.config.items()}
+        self.env = {k: (v, list(v.value)) for k, v in config.env.items()}
+        self.beziers = {k: (v, v.transition) for k, v in config.beziers.items()}
+
+        self.index = {
+            name: dict(table)
+            for name, table in vars(config.index).items()
+            if isinstance(table, dict)
+        }
+
+    def restore(self, config: "Config") -> None:
+        config.files[:] = self.files
+        for file, content, anchors in zip(self.files, self.contents, self.anchors):
+            file.content[:] = content
+            file.anchors[:] = [anchor for anchor, _ in anchors]
+            for anchor, line in anchors:
+                anchor.line = line
+
+        config.monitors[:] = self.monitors
+        config.binds[:] = self.binds
+        config.variables[:] = [variable for variable, _ in self.variables]
+        for variable, text in self.variables:
+            variable.value = text
+        config.sync_variables()
+        config.exec[:] = self.exec
+        config.windowrules[:] = self.windowrules
+        config.layerrules[:] = self.layerrules
+        config._rules = None
+        config._sections = self.sections
+
+        config.config.clear()
+        for name, (setting, value) in self.config.items():
+            setting.value = value
+            config.config[name] = setting
+
+        config.env.clear()
+        for name, (env, values) in self.env.items():
+            env.value = values
+            config.env[name] = env
+
+        config.beziers.clear()
+        for name, (bezier, transition) in self.beziers.items():
+            bezier.transition = transition
+            config.beziers[name] = bezier
+
+        for name, table in self.index.items():
+            getattr(config.index, name).clear()
+            getattr(config.index, name).update(table)
+
+        config.bind_index.clear()
+        for bind in config.binds:
+            config.bind_index.add(bind)
+
+
+class Transaction:
+    def __init__(self, config: "Config", save: bool = True) -> None:
+        self.config = config
+        self.save = save
+        self.touched: Dict[int, "File"] = {}
+        self.writes = 0
+
+    def touch(self, file: "File") -> None:
+        self.touched.setdefault(id(file), file)
+
+    @property
+    def files(self) -> List["File"]:
+        return [file for file in self.config.files if id(file) in self.touched]
+
+    def __enter__(self) -> "Transaction":
+        self.snapshot = Snapshot(self.config)
+        self.config._transaction = self
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.config._transaction = None
+
+        live = self.config.live
+        if exc_type is not None:
+            self.snapshot.restore(self.config)
+            if live is not None:
+                live.discard()
+            return
+
+        if self.save:
+            for file in self.files:
+                if self.config.save_file(file):
+                    self.writes += 1
+            self.config.sync_rebased()
+        if live is not None:
+            live.flush()
@@ -0,0 +1,160 @@
+import re
+from typing import Dict, Iterable, List, Optional, Pattern, Set, Tuple
+
+from .structures import Variable
+
+
+class VariableCycleError(ValueError):
+    def __init__(self, cycle: List[str]) -> None:
+        super().__init__(
+            "Variable cycle: {}".format(" -> ".join("$" + name for name in cycle))
+        )
+        self.cycle = cycle
+
+
+class VariableResolver:
+    # `$name` references, resolved through a dependency graph of the
+    # variables. Expanded values are memoized, and changing a variable only
+    # drops the memos that (transitively) depend on it.
+
+    def __init__(self, variables: Iterable[Variable] = ()) -> None:
+        self.raw: Dict[str, str] = {}
+        self.pattern: Optional[Pattern[str]] = None
+        # name -> names its value references, and the reverse
+        self.deps: Dict[str, Set[str]] = {}
+        self.dependents: Dict[str, Set[str]] = {}
+        # memos: expanded variables, expanded texts and who used what
+        self.values: Dict[str, str] = {}
+        self.texts: Dict[str, str] = {}
+        self.users: Dict[str, Set[str]] = {}
+        self.update(variables)
+
+    def update(self, variables: Iterable[Variable]) -> Set[str]:
+        # Sync with the model, last definition wins like Config.get_variable;
+        # returns the names whose expanded value may have changed
+        raw = {variable.name: variable.value for variable in variables}
+
+        if raw.keys() != self.raw.keys():
+            # A name appearing or going away changes what every text matches
+            self.raw = raw
+            self.rebuild()
+            return set(raw)
+
+        return self.redefine(
+            {name: value for name, value in raw.items() if self.raw[name] != value}
+        )
+
+    def rebuild(self) -> None:
+        # Longest names first, so `$modkey` is never read as `$mod` + "key"
+        names = sorted(self.raw, key=len, reverse=True)
+        self.pattern = (
+            re.compile(r"\$({})".format("|".join(map(re.escape, names))))
+            if names
+            else None
+        )
+
+        self.deps = {name: self.references(value) for name, value in self.raw.items()}
+        self.dependents = {name: set() for name in self.raw}
+        for name, deps in self.deps.items():
+            for dep in deps:
+                self.dependents[dep].add(name)
+
+        self.values.clear()
+        self.texts.clear()
+        self.users.clear()
+
+    def references(self, text: str) -> Set[str]:
+        if self.pattern is None or "$" not in text:
+            return set()
+        return set(self.pattern.findall(text))
+
+    def define(self, name: str, value: str) -> Set[str]:
+        if name not in self.raw:
+            self.raw[name] = value
+            self.rebuild()
+            return set(self.raw)
+        return self.redefine({name: value})
+
+    def redefine(self, values: Dict[str, str]) -> Set[str]:
+        for name, value in values.items():
+            for dep in self.deps[name]:
+                self.dependents[dep].discard(name)
+            self.raw[name] = value
+            self.deps[name] = self.references(value)
+            for dep in self.deps[name]:
+                self.dependents[dep].add(name)
+
+        stale = self.affected(values)
+        for name in stale:
+            self.values.pop(name, None)
+            for text in self.users.pop(name, ()):
+                self.texts.pop(text, None)
+        return stale
+
+    def affected(self, names: Iterable[str]) -> Set[str]:
+        seen: Set[str] = set()
+        pending = list(names)
+        while pending:
+            name = pending.pop()
+            if name not in seen:
+                seen.add(name)
+                pending += self.dependents.get(name, ())
+        return seen
+
+    def value(self, name: str, stack: Tuple[str, ...] = ()) -> str:
+        if name in self.values:
+            return self.values[name]
+        if name in stack:
+            raise VariableCycleError([*stack[stack.index(name) :], name])
+
+        value = self.substitute(self.raw[name], stack + (name,))
+        self.values[name] = value
+        return value
+
+    def substitute(self, text: str, stack: Tuple[str, ...] = ()) -> str:
+        if self.pattern is None or "$" not in text:
+            return text
+        return self.pattern.sub(lambda match: self.value(match.group(1), stack), text)
+
+    def expand(self, text: str) -> str:
+        if text in self.texts:
+            return self.texts[text]
+
+        expanded = self.substitute(text)
+        self.texts[text] = expanded
+        for name in self.references(text):
+            self.users.setdefault(name, set()).add(text)
+        return expanded
+
+    def cycles(self) -> List[List[str]]:
+        # Strongly connected components that loop (Tarjan)
+        index: Dict[str, int] = {}
+        low: Dict[str, int] = {}
+        stack: List[str] = []
+        cycles: List[List[str]] = []
+
+        def visit(name: str) -> None:
+            index[name] = low[name] = len(index)
+            stack.append(name)
+
+            for dep in self.deps[name]:
+                if dep not in index:
+                    visit(dep)
+                    low[name] = min(low[name], low[dep])
+                elif dep in stack:
+                    low[name] = min(low[name], index[dep])
+
+            if low[name] == index[name]:
+                component = []
+                while True:
+                    member = stack.pop()
+                    component.append(member)
+                    if member == name:
+                        break
+                if len(component) > 1 or name in self.deps[name]:
+                    cycles.append(sorted(component))
+
+        for name in self.raw:
+            if name not in index:
+                visit(name)
+        return cycles
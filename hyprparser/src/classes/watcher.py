@@ -0,0 +1,308 @@
+import asyncio
+import os
+import struct
+import sys
+from collections import Counter
+from dataclasses import dataclass
+from typing import (TYPE_CHECKING, Any, Dict, Iterable, List, Optional, Set,
+                    Tuple)
+
+if TYPE_CHECKING:
+    from .parser import Config
+
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+# Editors usually write a temp file and rename it over the original, which
+# drops any watch on the file itself, so watch the directories instead
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_MODIFY
+
+EVENT = struct.Struct("iIII")
+
+
+@dataclass
+class ConfigChange:
+    kind: str  # option, bind, env, bezier, variable, exec, monitor or error
+    action: str  # added, removed, changed or failed
+    name: str  # option path, "<kind>:<name>", or just the kind for binds and execs
+    old: Any = None
+    new: Any = None
+
+    def __str__(self) -> str:
+        match self.action:
+            case "changed":
+                return "{} `{}` changed from {} to {}".format(
+                    self.kind,
+                    self.name,
+                    ConfigChange.show(self.old),
+                    ConfigChange.show(self.new),
+                )
+            case "added" if self.kind in ("bind", "exec"):
+                return "{} added: {}".format(self.kind, self.new)
+            case "removed" if self.kind in ("bind", "exec"):
+                return "{} removed: {}".format(self.kind, self.old)
+        return "{} `{}` {}".format(self.kind, self.name, self.action)
+
+    @staticmethod
+    def show(value: Any) -> str:
+        return value.format() if hasattr(value, "format") else str(value)
+
+
+class ModelView:
+    # What the watcher compares across a reload
+    def __init__(self, config: "Config") -> None:
+        self.config = {k: v.value for k, v in config.config.items()}
+        self.env = {k: list(v.value) for k, v in config.env.items()}
+        self.beziers = {k: v.transition for k, v in config.beziers.items()}
+        self.variables = {v.name: v.value for v in config.variables}
+        self.monitors = {m.name: m.format() for m in config.monitors}
+        self.binds = Counter(b.format() for b in config.binds)
+        self.exec = Counter(e.format() for e in config.exec)
+
+    def diff(self, other: "ModelView") -> List[ConfigChange]:
+        changes: List[ConfigChange] = []
+
+        for kind, attr, prefix in [
+            ("option", "config", ""),
+            ("env", "env", "env:"),
+            ("bezier", "beziers", "bezier:"),
+            ("variable", "variables", "variable:"),
+            ("monitor", "monitors", "monitor:"),
+        ]:
+            old, new = getattr(self, attr), getattr(other, attr)
+            for name in old.keys() | new.keys():
+                if name not in new:
+                    changes.append(ConfigChange(kind, "removed", prefix + name, old[name]))
+                elif name not in old:
+                    changes.append(ConfigChange(kind, "added", prefix + name, None, new[name]))
+                elif old[name] != new[name]:
+                    changes.append(
+                        ConfigChange(kind, "changed", prefix + name, old[name], new[name])
+                    )
+
+        for kind, attr in [("bind", "binds"), ("exec", "exec")]:
+            old, new = getattr(self, attr), getattr(other, attr)
+            for line in (old - new).elements():
+                changes.append(ConfigChange(kind, "removed", kind, line))
+            for line in (new - old).elements():
+                changes.append(ConfigChange(kind, "added", kind, None, line))
+
+        return sorted(changes, key=lambda change: change.name)
+
+
+class Subscription:
+    def __init__(self, watcher: "ConfigWatcher", prefixes: Tuple[str, ...]) -> None:
+        self.watcher = watcher
+        self.prefixes = prefixes
+        self.queue: "asyncio.Queue[ConfigChange]" = asyncio.Queue()
+
+    def __aiter__(self) -> "Subscription":
+        return self
+
+    async def __anext__(self) -> ConfigChange:
+        return await self.queue.get()
+
+    def close(self) -> None:
+        self.watcher.unsubscribe(self)
+
+
+class Inotify:
+    def __init__(self) -> None:
+        import ctypes
+        import ctypes.util
+
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self.add_watch = libc.inotify_add_watch
+        self.rm_watch = libc.inotify_rm_watch
+        self.get_errno = ctypes.get_errno
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.watches: Dict[int, str] = {}
+
+    def watch(self, directory: str) -> None:
+        if directory in self.watches.values():
+            return
+        wd = self.add_watch(self.fd, os.fsencode(directory), WATCH_MASK)
+        if wd < 0:
+            raise OSError(self.get_errno(), "inotify_add_watch failed", directory)
+        self.watches[wd] = directory
+
+    def unwatch(self, directory: str) -> None:
+        for wd, watched in list(self.watches.items()):
+            if watched == directory:
+                self.rm_watch(self.fd, wd)
+                del self.watches[wd]
+
+    def read(self) -> List[str]:
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+
+        paths, offset = [], 0
+        while offset + EVENT.size <= len(data):
+            wd, _, _, length = EVENT.unpack_from(data, offset)
+            offset += EVENT.size
+            name = data[offset : offset + length].rstrip(b"\0")
+            offset += length
+            if wd in self.watches and name:
+                paths.append(os.path.join(self.watches[wd], os.fsdecode(name)))
+        return paths
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+
+class ConfigWatcher:
+    def __init__(
+        self,
+        config: "Config",
+        debounce: float = 0.2,
+        poll_interval: float = 1.0,
+        inotify: Optional[bool] = None,
+    ) -> None:
+        self.config = config
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        self.use_inotify = sys.platform.startswith("linux") if inotify is None else inotify
+
+        self.subscriptions: Dict[str, List[Subscription]] = {}
+        self.paths: Set[str] = set()
+        self.pending: Set[str] = set()
+        self.stats: Dict[str, Tuple[int, int]] = {}
+
+        self.inotify: Optional[Inotify] = None
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.flush_handle: Optional[asyncio.TimerHandle] = None
+        self.poller: Optional["asyncio.Task[None]"] = None
+
+    def subscribe(self, *prefixes: str) -> Subscription:
+        # Prefixes match whole path segments: "decoration" covers
+        # "decoration:blur:size"; "env" covers every env. None means everything.
+        subscription = Subscription(self, prefixes or ("",))
+        for prefix in subscription.prefixes:
+            self.subscriptions.setdefault(prefix, []).append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        for prefix in subscription.prefixes:
+            subscribers = self.subscriptions.get(prefix, [])
+            if subscription in subscribers:
+                subscribers.remove(subscription)
+
+    def __aiter__(self) -> Subscription:
+        return self.subscribe()
+
+    async def __aenter__(self) -> "ConfigWatcher":
+        await self.start()
+        return self
+
+    async def __aexit__(self, *_) -> None:
+        self.close()
+
+    async def start(self) -> None:
+        self.loop = asyncio.get_running_loop()
+
+        if self.use_inotify:
+            try:
+                self.inotify = Inotify()
+            except (OSError, AttributeError):
+                self.inotify = None
+
+        if self.inotify is not None:
+            self.loop.add_reader(self.inotify.fd, self.on_inotify)
+        else:
+            self.poller = self.loop.create_task(self.poll())
+        self.refresh_paths()
+
+    def close(self) -> None:
+        if self.flush_handle is not None:
+            self.flush_handle.cancel()
+        if self.poller is not None:
+            self.poller.cancel()
+        if self.inotify is not None and self.loop is not None:
+            self.loop.remove_reader(self.inotify.fd)
+            self.inotify.close()
+            self.inotify = None
+
+    def refresh_paths(self) -> None:
+        paths = {os.path.realpath(os.path.expandvars(f.path)) for f in self.config.files}
+        directories = {os.path.dirname(path) for path in paths}
+
+        if self.inotify is not None:
+            for directory in {os.path.dirname(p) for p in self.paths} - directories:
+                self.inotify.unwatch(directory)
+            for directory in directories:
+                self.inotify.watch(directory)
+
+        self.paths = paths
+        self.stats = {path: self.stat(path) for path in paths}
+
+    @staticmethod
+    def stat(path: str) -> Tuple[int, int]:
+        try:
+            st = os.stat(path)
+        except OSError:
+            return (0, -1)
+        return (st.st_mtime_ns, st.st_size)
+
+    def on_inotify(self) -> None:
+        assert self.inotify is not None
+        self.changed(path for path in self.inotify.read() if path in self.paths)
+
+    async def poll(self) -> None:
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            changed = []
+            for path, st in self.stats.items():
+                current = self.stat(path)
+                if current != st:
+                    self.stats[path] = current
+                    changed.append(path)
+            self.changed(changed)
+
+    def changed(self, paths: Iterable[str]) -> None:
+        paths = set(paths)
+        if not paths or self.loop is None:
+            return
+        self.pending |= paths
+
+        # Debounce: wait until writes have been quiet for `debounce` seconds
+        if self.flush_handle is not None:
+            self.flush_handle.cancel()
+        self.flush_handle = self.loop.call_later(self.debounce, self.flush)
+
+    def flush(self) -> None:
+        self.flush_handle = None
+        changed, self.pending = self.pending, set()
+
+        before = ModelView(self.config)
+        try:
+            # Not reload(): that would drop edits not saved yet
+            self.config.refresh(changed)
+        except Exception as e:
+            for path in sorted(changed):
+                self.publish(ConfigChange("error", "failed", path, None, e))
+            return
+        finally:
+            self.refresh_paths()
+
+        for change in before.diff(ModelView(self.config)):
+            self.publish(change)
+
+    def publish(self, change: ConfigChange) -> None:
+        segments = change.name.split(":")
+        woken: Set[int] = set()
+
+        for depth in range(len(segments) + 1):
+            prefix = ":".join(segments[:depth])
+            for subscription in self.subscriptions.get(prefix, ()):
+                if id(subscription) not in woken:
+                    woken.add(id(subscription))
+                    subscription.queue.put_nowait(change)
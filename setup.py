@@ -12,6 +12,6 @@ setup(
         "Homepage": "https://github.com/T0kyoB0y/hyprparser-py",
         "Bug Tracker": "https://github.com/T0kyoB0y/hyprparser-py/issues",
     },
-    packages=find_packages(),
+    packages=find_packages(exclude=["benchmarks", "benchmarks.*"]),
     python_requires=">=3.10",
 )